@@ -10,7 +10,7 @@ from langchain_google_cloud_sql_pg import PostgresVectorStore
 from langchain_google_vertexai import VertexAIEmbeddings
 from sklearn.metrics.pairwise import cosine_similarity
 from lib.metadata import extract_focus_area
-from lib.config import TABLE_NAME
+from lib.config import TABLE_NAME, VERTEX_EMBEDDING_MODEL
 from lib.transformer import split_pdfs
 from lib.cloud_SQL import (
     create_cloud_sql_database_connection,
@@ -18,9 +18,12 @@ from lib.cloud_SQL import (
 )
 from lib.embedding import (
     get_embeddings,
+    get_embedding_dimension,
+    get_embedding_model_id,
     load_documents_from_local,
     generate_batches,
 )
+from src.chatbot.lib.database import get_index_embedding_model
 
 DATA_DIRECTORY = r"C:\Users\MSI\Projet_GenAI\Data"
 
@@ -40,7 +43,6 @@ async def main():
     try:
         logger.info("Connecting to the Cloud SQL database...")
         engine = create_cloud_sql_database_connection()
-        # await create_table_if_not_exists(engine)
     except Exception as e:
         logger.error(f"Error while connecting to the database: {e}")
         return
@@ -49,10 +51,25 @@ async def main():
     try:
         logger.info("Initializing VertexAI embedder...")
         embeddings = get_embeddings(logger)
+        # The vector size of the table depends on the embedding model
+        # await create_table_if_not_exists(engine, get_embedding_dimension(embeddings))
     except Exception as e:
         logger.error(f"Error while initializing the embedder: {e}")
         return
 
+    # Never mix embedding models in the table: the chatbot only checks one chunk at startup
+    try:
+        index_model = get_index_embedding_model(engine, "MI_RAG", f"vertex:{VERTEX_EMBEDDING_MODEL}")
+    except Exception as e:
+        logger.error(f"Error while reading the embedding model of the index: {e}")
+        return
+    if index_model is not None and index_model != get_embedding_model_id():
+        logger.error(
+            f"❌ The table MI_RAG was built with {index_model}, not {get_embedding_model_id()}. "
+            "Use another table or re-embed all chunks."
+        )
+        return
+
     # Step 3: Load documents from the DATA directory
     documents = load_documents_from_local(r'C:\Users\MSI\Projet_GenAI\Data', logger)
     if not documents:
@@ -103,7 +120,8 @@ async def main():
                 metadata = splitted_documents[i].metadata
                 langchain_metadata = {
                     "source": metadata.get("source", "unknown"),
-                    "focus_area": focus_area
+                    "focus_area": focus_area,
+                    "embedding_model": get_embedding_model_id()
                 }
 
                 # Create a Document object
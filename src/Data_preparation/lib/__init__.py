@@ -1 +1,9 @@
 #__init__.py
+import os
+import sys
+
+# The local embedding model and the index model lookup are shared with the chatbot (src/chatbot/lib),
+# imported as `src.chatbot.lib.*` from the root of the repository
+_REPOSITORY_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+if _REPOSITORY_ROOT not in sys.path:
+    sys.path.append(_REPOSITORY_ROOT)
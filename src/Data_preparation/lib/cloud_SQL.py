@@ -54,15 +54,16 @@ def create_cloud_sql_database_connection() -> PostgresEngine:
         raise
 
 
-async def create_table_if_not_exists(engine: PostgresEngine) -> None:
+async def create_table_if_not_exists(engine: PostgresEngine, vector_size: int) -> None:
     """
     Creates the table `MI_RAG` in the database if it does not exist.
     Uses the `init_vectorstore_table` method from PostgresEngine.
+    The vector size must match the embedding model (see `get_embedding_dimension`).
     """
     try:
         await engine.ainit_vectorstore_table(
             table_name="MI_RAG",
-            vector_size=768,
+            vector_size=vector_size,
         )
     except ProgrammingError:
         print("Table already created")
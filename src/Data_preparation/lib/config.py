@@ -13,4 +13,12 @@ INSTANCE = os.environ['INSTANCE']
 DATABASE = os.environ['DATABASE']
 DB_PASSWORD = os.environ['DB_PASSWORD']
 TABLE_NAME = os.environ['TABLE_NAME']
-DB_USER = os.environ['DB_USER']
\ No newline at end of file
+DB_USER = os.environ['DB_USER']
+
+# Embedding provider: 'vertex' (Vertex AI) or 'local' (sentence-transformers on CPU)
+EMBEDDING_PROVIDER = os.environ.get('EMBEDDING_PROVIDER', 'vertex')
+VERTEX_EMBEDDING_MODEL = os.environ.get('VERTEX_EMBEDDING_MODEL', 'textembedding-gecko@latest')
+LOCAL_EMBEDDING_MODEL = os.environ.get('LOCAL_EMBEDDING_MODEL', 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.environ.get('LOCAL_EMBEDDING_BATCH_SIZE', 32))
+LOCAL_EMBEDDING_THREADS = int(os.environ.get('LOCAL_EMBEDDING_THREADS', 0)) or None
+LOCAL_EMBEDDING_BACKEND = os.environ.get('LOCAL_EMBEDDING_BACKEND', 'torch')
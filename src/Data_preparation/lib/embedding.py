@@ -5,7 +5,17 @@ import logging
 import numpy as np
 import functools
 from PyPDF2 import PdfReader
-from .config import PROJECT_ID
+from .config import (
+    PROJECT_ID,
+    EMBEDDING_PROVIDER,
+    VERTEX_EMBEDDING_MODEL,
+    LOCAL_EMBEDDING_MODEL,
+    LOCAL_EMBEDDING_BATCH_SIZE,
+    LOCAL_EMBEDDING_THREADS,
+    LOCAL_EMBEDDING_BACKEND
+)
+from src.chatbot.lib.local_embeddings import LocalEmbeddings
+from langchain_core.embeddings import Embeddings
 from langchain.schema import Document
 from typing import Generator, List, Tuple
 from vertexai.language_models import TextEmbeddingModel
@@ -26,20 +36,49 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def get_embeddings(logger) -> VertexAIEmbeddings:
+def get_embedding_model_id() -> str:
+    """
+    Returns the identifier of the configured embedding model, recorded in the metadata of each chunk.
+    The chatbot compares it with its own `get_embedding_model_id` (src/chatbot/lib/embeddings.py)
+    at startup: both must stay in the same format.
+    """
+    if EMBEDDING_PROVIDER == "local":
+        return f"local:{LOCAL_EMBEDDING_MODEL}"
+    return f"vertex:{VERTEX_EMBEDDING_MODEL}"
+
+
+def get_embeddings(logger) -> Embeddings:
     """
-    Retrieves VertexAI embeddings.
+    Retrieves the embeddings of the configured provider (VertexAI or a local CPU model).
     """
     try:
+        if EMBEDDING_PROVIDER == "local":
+            embeddings = LocalEmbeddings(
+                model_name=LOCAL_EMBEDDING_MODEL,
+                batch_size=LOCAL_EMBEDDING_BATCH_SIZE,
+                num_threads=LOCAL_EMBEDDING_THREADS,
+                backend=LOCAL_EMBEDDING_BACKEND,
+            )
+            logger.info(f"✅ Local embeddings successfully retrieved (model: {LOCAL_EMBEDDING_MODEL}).")
+            return embeddings
         # Initialize VertexAIEmbeddings without directly passing project_id
-        embeddings = VertexAIEmbeddings(model_name="textembedding-gecko@latest", project=PROJECT_ID)
-        logger.info("✅ VertexAI embeddings successfully retrieved (model: textembedding-gecko@latest).")
+        embeddings = VertexAIEmbeddings(model_name=VERTEX_EMBEDDING_MODEL, project=PROJECT_ID)
+        logger.info(f"✅ VertexAI embeddings successfully retrieved (model: {VERTEX_EMBEDDING_MODEL}).")
         return embeddings
     except Exception as e:
         logger.error(f"❌ Error retrieving embeddings: {e}")
         raise
 
 
+def get_embedding_dimension(embeddings: Embeddings) -> int:
+    """
+    Returns the size of the vectors of the given embeddings, used to create the table.
+    """
+    if isinstance(embeddings, LocalEmbeddings):
+        return embeddings.dimension
+    return len(embeddings.embed_query("dimension"))
+
+
 def load_documents_from_local(directory: str, logger: logging.Logger) -> list[Document]:
     """
     Loads PDF documents from a local directory.
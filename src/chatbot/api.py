@@ -0,0 +1,239 @@
+import json
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from functools import partial
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
+from aiohttp import web
+
+from lib.admission import AdmissionRejected
+from lib.warmup import Readiness, warm_up_with_retry
+from lib.api_client import documents_from_json, response_to_json
+from lib.config import (
+    API_HOST,
+    API_PORT,
+    ADMISSION_QUEUE_TIMEOUT,
+    WARMUP_ENABLED,
+    WARMUP_QUESTION,
+    WARMUP_BATCH_QUESTIONS,
+    WARMUP_RETRY_SECONDS,
+    WARMUP_RETRY_MAX_SECONDS
+)
+
+if TYPE_CHECKING:
+    from lib.service import RagService
+
+logging.basicConfig(level=logging.INFO)
+
+# Les métadonnées des documents peuvent contenir des valeurs non JSON (uuid, dates...)
+dumps = partial(json.dumps, ensure_ascii=False, default=str)
+
+
+@dataclass
+class ServiceHolder:
+    """
+    Contient le service RAG, créé en arrière-plan après le démarrage du serveur : l'application
+    ne pouvant plus être modifiée une fois démarrée, c'est ce conteneur qui est renseigné.
+    """
+    service: Optional["RagService"] = None
+
+
+SERVICE_KEY = web.AppKey("service", ServiceHolder)
+READINESS_KEY = web.AppKey("readiness", Readiness)
+INITIALIZATION_KEY = web.AppKey("initialization", asyncio.Task)
+
+
+def shed_response() -> web.Response:
+    # Requête délestée par le contrôle d'admission : le client peut réessayer plus tard
+    return web.json_response(
+        {"error": "Service surchargé, veuillez réessayer plus tard."},
+        status=503,
+        headers={"Retry-After": str(max(1, round(ADMISSION_QUEUE_TIMEOUT)))},
+    )
+
+
+def get_service(request: web.Request) -> "RagService":
+    service = request.app[SERVICE_KEY].service
+    if service is None:
+        raise web.HTTPServiceUnavailable(text="Service en cours de démarrage.", headers={"Retry-After": "5"})
+    return service
+
+
+async def read_body(request: web.Request) -> dict:
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        raise web.HTTPBadRequest(text="Le corps de la requête doit être un JSON.")
+    question = body.get("question") if isinstance(body, dict) else None
+    if not isinstance(question, str) or not question.strip():
+        raise web.HTTPBadRequest(text="Le champ 'question' est obligatoire.")
+    return {**body, "question": question.strip()}
+
+
+async def read_question(request: web.Request) -> str:
+    return (await read_body(request))["question"]
+
+
+async def ask(request: web.Request) -> web.Response:
+    """
+    POST /ask {"question": "..."} : retourne la réponse complète et ses sources.
+    """
+    service = get_service(request)
+    question = await read_question(request)
+    try:
+        response = await service.answer(question)
+    except AdmissionRejected:
+        return shed_response()
+    if response is None:
+        return web.json_response({"error": "La réponse n'a pas pu être générée."}, status=503, dumps=dumps)
+    return web.json_response(response_to_json(response), dumps=dumps)
+
+
+async def ask_stream(request: web.Request) -> web.StreamResponse:
+    """
+    POST /ask/stream {"question": "..."} : retourne une ligne JSON par token ({"token": ...}),
+    puis la réponse complète ({"response": ...}).
+    """
+    service = get_service(request)
+    question = await read_question(request)
+    tokens: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            return await service.astream_answer(question, tokens.put_nowait)
+        finally:
+            tokens.put_nowait(None)
+
+    task = asyncio.ensure_future(produce())
+    try:
+        # Le statut n'est envoyé qu'au premier token, pour pouvoir répondre 503 si la requête est délestée
+        token = await tokens.get()
+        if token is None:
+            await asyncio.wait({task})
+            if isinstance(task.exception(), AdmissionRejected):
+                return shed_response()
+
+        stream = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await stream.prepare(request)
+        while token is not None:
+            await stream.write((dumps({"token": token}) + "\n").encode("utf-8"))
+            token = await tokens.get()
+        try:
+            response = await task
+        except Exception as e:
+            logging.error(f"Erreur lors de la génération de la réponse en streaming : {e}")
+            response = None
+    finally:
+        # Client déconnecté ou écriture en échec : la génération est interrompue
+        if not task.done():
+            task.cancel()
+
+    if response is None:
+        event = {"error": "La réponse n'a pas pu être générée."}
+    else:
+        event = {"response": response_to_json(response)}
+    await stream.write((dumps(event) + "\n").encode("utf-8"))
+    await stream.write_eof()
+    return stream
+
+
+async def regenerate(request: web.Request) -> web.Response:
+    """
+    POST /regenerate {"question": "...", "source_documents": [...]} : retourne une nouvelle
+    réponse sur les documents déjà récupérés, sans embedding ni recherche.
+    """
+    service = get_service(request)
+    body = await read_body(request)
+    try:
+        source_documents = documents_from_json(body.get("source_documents") or [])
+    except (KeyError, TypeError, AttributeError):
+        raise web.HTTPBadRequest(text="Le champ 'source_documents' est invalide.")
+    try:
+        response = await service.regenerate(body["question"], source_documents)
+    except AdmissionRejected:
+        return shed_response()
+    if response is None:
+        return web.json_response({"error": "La réponse n'a pas pu être régénérée."}, status=503, dumps=dumps)
+    return web.json_response(response_to_json(response), dumps=dumps)
+
+
+async def health(request: web.Request) -> web.Response:
+    """
+    GET /health : le processus répond (liveness), avec les métriques des caches et du contrôle d'admission.
+    """
+    service = request.app[SERVICE_KEY].service
+    stats = service.stats() if service is not None else {}
+    return web.json_response({"status": "ok", "readiness": request.app[READINESS_KEY].as_dict(), **stats}, dumps=dumps)
+
+
+async def ready(request: web.Request) -> web.Response:
+    """
+    GET /ready : 200 seulement une fois le préchauffage réussi (readiness du load balancer), 503 sinon.
+    """
+    readiness = request.app[READINESS_KEY]
+    return web.json_response(readiness.as_dict(), status=200 if readiness.ready else 503)
+
+
+async def initialize_service(app: web.Application) -> None:
+    # La chaîne QA (Vertex AI, Cloud SQL) n'est chargée que pour le service réel
+    from lib.service import RagService
+
+    holder, readiness = app[SERVICE_KEY], app[READINESS_KEY]
+    # Le service n'est pas prêt tant que l'initialisation n'a pas réussi : réessayer avec une attente croissante
+    delay = WARMUP_RETRY_SECONDS
+    while holder.service is None:
+        try:
+            start = time.perf_counter()
+            holder.service = await RagService.create()
+            readiness.timings["initialization"] = time.perf_counter() - start
+            readiness.error = None
+        except Exception as e:
+            readiness.error = f"initialization : {e}"
+            logging.error(f"Échec de l'initialisation du service, nouvelle tentative dans {delay:.1f}s : {e}")
+            await asyncio.sleep(delay)
+            delay = min(2 * delay, WARMUP_RETRY_MAX_SECONDS)
+    if WARMUP_ENABLED:
+        await warm_up_with_retry(
+            holder.service,
+            WARMUP_QUESTION,
+            readiness,
+            WARMUP_BATCH_QUESTIONS,
+            attempts=0,
+            delay=WARMUP_RETRY_SECONDS,
+            max_delay=WARMUP_RETRY_MAX_SECONDS,
+        )
+    else:
+        readiness.ready = True
+
+
+def create_app(service: Optional["RagService"] = None) -> web.Application:
+    """
+    Crée l'application HTTP. Si aucun service n'est fourni, la chaîne QA (et son pool
+    de connexions Cloud SQL, partagé par toutes les requêtes) est créée puis préchauffée
+    en arrière-plan : le serveur répond à /health immédiatement et /ready passe à 200
+    une fois le préchauffage réussi.
+    """
+    app = web.Application()
+    app[SERVICE_KEY] = ServiceHolder(service)
+    app[READINESS_KEY] = Readiness(ready=service is not None)
+    if service is None:
+        async def run_initialization(app: web.Application) -> AsyncIterator[None]:
+            app[INITIALIZATION_KEY] = asyncio.ensure_future(initialize_service(app))
+            yield
+            app[INITIALIZATION_KEY].cancel()
+
+        app.cleanup_ctx.append(run_initialization)
+
+    app.router.add_post("/ask", ask)
+    app.router.add_post("/ask/stream", ask_stream)
+    app.router.add_post("/regenerate", regenerate)
+    app.router.add_get("/health", health)
+    app.router.add_get("/ready", ready)
+    return app
+
+
+# Point d'entrée pour exécuter le service
+if __name__ == "__main__":
+    web.run_app(create_app(), host=API_HOST, port=API_PORT)
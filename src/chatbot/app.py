@@ -1,8 +1,6 @@
 import os
-import uuid
 import time
 import logging
-import asyncio
 import vertexai
 from PIL import Image
 import streamlit as st
@@ -17,16 +15,22 @@ st.set_page_config(page_title="CareBot", layout="wide", page_icon="🩺")
 
 # Configuration des chemins et des imports locaux
 from images import IMAGE_PATH
-from lib.feedback import save_feedback, display_feedback_analysis
+from lib.feedback import save_feedback, display_feedback_analysis, migrate_feedback_file
 from lib.callbacks import (
     feedback_callback,
     regenerate_callback,
     initialize_qa_chain,
+    initialize_readiness,
+    remember_retrieval,
+    generate_response,
+    stream_response,
     get_default_response,
     evaluation_callback,
 )
 from config import PROJECT_ID, REGION
-from eval import display_evaluation_page
+from lib.config import STREAMING_ENABLED, CHAT_HISTORY_TURNS
+from lib.event_loop import run_async
+from lib.source_retriever import format_answer_with_source
 
 # Configuration du logging
 logging.basicConfig(
@@ -39,8 +43,13 @@ logging.basicConfig(
 vertexai.init(project=PROJECT_ID, location=REGION)
 aiplatform.init(project=PROJECT_ID, location=REGION)
 
-# Chargement du logo
-logo = Image.open(os.path.join(IMAGE_PATH, "logo.png")).resize((200, 100))
+# Mise à jour des colonnes du fichier de feedbacks, une seule fois par processus
+migrate_feedback_file()
+
+# Chargement du logo, une seule fois par processus
+@st.cache_resource(show_spinner=False)
+def load_logo():
+    return Image.open(os.path.join(IMAGE_PATH, "logo.png")).resize((200, 100))
 
 # Variables de session
 if "page" not in st.session_state:
@@ -60,26 +69,82 @@ if "last_response" not in st.session_state:
     st.session_state["last_response"] = ""
 if "last_duree_reponse" not in st.session_state:
     st.session_state["last_duree_reponse"] = 0
-
-# Fonction asynchrone pour générer une réponse
-async def generate_response(qa_chain, prompt):
-    try:
-        logging.info(f"Prompt envoyé à la chaîne QA : {prompt}")
-        response = await qa_chain.ainvoke({"query": prompt})
-        logging.info(f"Réponse reçue de la chaîne QA : {response}")
-        if not response or not response.get("result"):
-            logging.error("La réponse générée est None ou vide.")
-            return None
-        return response
-    except Exception as e:
-        logging.error(f"Erreur lors de la génération de la réponse : {e}")
-        return None
-
-# Fonction principale asynchrone
-async def main():
+if "last_duree_premier_token" not in st.session_state:
+    st.session_state["last_duree_premier_token"] = 0
+if "history_turns" not in st.session_state:
+    st.session_state["history_turns"] = CHAT_HISTORY_TURNS
+
+
+# Historique de la conversation : seuls les derniers échanges sont affichés, les précédents à la demande.
+# Le dernier échange est affiché hors de l'historique pendant sa génération : afficher plus de messages
+# réexécute toute la page (et non un fragment, qui l'afficherait en double).
+def render_chat_history():
+    messages = st.session_state.messages
+    visible = 2 * st.session_state["history_turns"]
+    if len(messages) > visible:
+        if st.button(f"Afficher les messages précédents ({len(messages) - visible})", key="show_previous_messages"):
+            st.session_state["history_turns"] += CHAT_HISTORY_TURNS
+            st.rerun()
+    for message in messages[-visible:]:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+
+
+# État du préchauffage, vérifié toutes les 2 secondes : la page est réexécutée dès que la chaîne QA est prête
+@st.fragment(run_every=2)
+def render_readiness(readiness):
+    if readiness.ready:
+        st.rerun(scope="app")
+    if readiness.error:
+        st.warning(f"CareBot n'est pas encore disponible, nouvelle tentative en cours ({readiness.error}).")
+    else:
+        st.info("CareBot se prépare, vous pourrez poser vos questions dans quelques instants...")
+
+
+# Boutons sous la dernière réponse, avec des clés stables d'une exécution à l'autre
+@st.fragment
+def render_actions():
+    col1, col2, col3 = st.columns(3)
+    col1.button("Feedback", key="feedback", on_click=feedback_callback)
+
+    # La régénération et le changement de page modifient le reste de la page : toute l'application est réexécutée
+    if col2.button("Regénérer la réponse", key="regenerate") and regenerate_callback():
+        st.rerun()
+
+    if col3.button("Évaluation", key="evaluation"):
+        evaluation_callback()
+        st.rerun()
+
+    if st.session_state.get("show_feedback_modal", False):
+        render_feedback_form()
+
+
+# Formulaire de feedback sur la dernière réponse
+@st.fragment
+def render_feedback_form():
+    with st.form(key="feedback_form"):
+        st.markdown("### Donnez votre avis")
+        nombre_etoiles = st.slider("Notez CareBot (1 à 5 étoiles) :", 1, 5, 3)
+        feedback_text = st.text_area("Laissez un commentaire...")
+        if st.form_submit_button("Envoyer"):
+            save_feedback(
+                question=st.session_state["feedback_data"]["question"],
+                reponse=st.session_state["feedback_data"]["reponse"],
+                feedback_text=feedback_text,
+                duree_reponse=st.session_state["feedback_data"]["duree_reponse"],
+                duree_premier_token=st.session_state["feedback_data"].get("duree_premier_token", 0),
+                nombre_etoiles=nombre_etoiles
+            )
+            st.session_state["show_feedback_modal"] = False
+            # Le formulaire est rendu dans un fragment : relancer toute la page pour le masquer
+            st.toast("Merci pour votre feedback !")
+            st.rerun(scope="app")
+
+# Fonction principale
+def main():
     # Barre latérale
     with st.sidebar:
-        st.image(logo)
+        st.image(load_logo())
         st.markdown("## 🏥 Navigation")
         st.session_state["page"] = st.radio(
             "Sélectionnez une page :",
@@ -104,17 +169,19 @@ async def main():
             "### Bienvenue sur Care Bot, votre assistant médical virtuel spécialisé en oncologie."
         )
         st.markdown("#### Posez-moi vos questions !")
-        qa_chain = initialize_qa_chain()
+        with st.spinner("Initialisation de CareBot..."):
+            qa_chain = initialize_qa_chain()
+        readiness = initialize_readiness(qa_chain)
+        if qa_chain is not None and not readiness.ready:
+            render_readiness(readiness)
 
-        # Zone d'entrée utilisateur (en bas de la page)
-        prompt = st.chat_input("💬 Posez votre question ici...")
+        # Zone d'entrée utilisateur (en bas de la page), active une fois la chaîne QA préchauffée
+        prompt = st.chat_input("💬 Posez votre question ici...", disabled=not readiness.ready)
 
         # Affichage des messages du chatbot
         chat_container = st.container()
         with chat_container:
-            for message in st.session_state.messages:
-                with st.chat_message(message["role"]):
-                    st.markdown(message["content"])
+            render_chat_history()
 
         # Traitement de la nouvelle question
         if prompt:
@@ -125,81 +192,52 @@ async def main():
             with st.chat_message("user"):
                 st.markdown(prompt)
 
-            with st.spinner("CareBot réfléchit..."):
-                start_time = time.time()
-                response = await generate_response(qa_chain, prompt)
-
-                if response is None:
-                    logging.error("La chaîne QA a échoué. Tentative de réinitialisation...")
-                    response = await generate_response(qa_chain, prompt)
+            start_time = time.time()
+            time_to_first_token = None
+            with st.chat_message("assistant"):
+                placeholder = st.empty()
+                if STREAMING_ENABLED:
+                    # Le message d'attente est remplacé par le premier token
+                    placeholder.markdown("*CareBot réfléchit...*")
+                    response, time_to_first_token = stream_response(qa_chain, prompt, placeholder)
+                else:
+                    with st.spinner("CareBot réfléchit..."):
+                        response = run_async(generate_response(qa_chain, prompt))
 
                 if response is not None and response.get("result"):
-                    answer = response["result"]
+                    # Les sources sont ajoutées une fois la génération terminée
+                    answer = format_answer_with_source(response)
+                    if response.get("source_documents"):
+                        remember_retrieval(prompt, response["source_documents"])
                     duree_reponse = time.time() - start_time
-
-                    if "source_documents" in response and response["source_documents"]:
-                        best_doc = max(
-                            response["source_documents"],
-                            key=lambda doc: doc.metadata.get("similarity_score", 0)
-                        )
-                        similarity_score = best_doc.metadata.get("similarity_score", 0)
-
-                        # Vérifier si le score de similarité est supérieur ou égal à 0.6
-                        if similarity_score >= 0.65:
-                            answer += f"\n\n**Source :** {best_doc.metadata.get('source', 'N/A')}\n"
-                            answer += f"\n**Focus Area :** {best_doc.metadata.get('focus_area', 'N/A')}\n"
-                            answer += f"\n**Similarity Score :** {similarity_score}\n"
-                            answer += f"\n**Similarity Type :** {best_doc.metadata.get('similarity_type', 'N/A')}"
-                        else:
-                            logging.info("\nScore de similarité inférieur à 0.6. Afficher uniquement la réponse du modèle.")
-                    else:
-                        logging.info("\nNo relevant sources found.")
+                    if time_to_first_token is None:
+                        time_to_first_token = duree_reponse
                 else:
                     logging.error("La réponse générée est None ou vide. Vérifiez l'état du chaînage QA.")
                     answer = get_default_response(prompt)
                     duree_reponse = 0
+                    time_to_first_token = 0
+
+                # Afficher la réponse dans l'interface utilisateur
+                placeholder.markdown(answer)
 
             # Ajouter la réponse à l'historique des messages
             st.session_state.messages.append({"role": "assistant", "content": answer})
 
-            # Afficher la réponse dans l'interface utilisateur
-            with st.chat_message("assistant"):
-                st.markdown(answer)
-
             # Mettre à jour les variables de session
             st.session_state["last_question"] = prompt
             st.session_state["last_response"] = answer
             st.session_state["last_duree_reponse"] = duree_reponse
+            st.session_state["last_duree_premier_token"] = time_to_first_token
 
-            # Afficher les boutons sous la réponse
-            col1, col2, col3 = st.columns(3)
-            if col1.button("Feedback", key=f"feedback_{uuid.uuid4()}", on_click=feedback_callback):
-                pass
-
-            if col2.button("Regénérer la réponse", key=f"regenerate_{uuid.uuid4()}", on_click=regenerate_callback):
-                pass
-
-            if col3.button("Évaluation", key=f"evaluation_{uuid.uuid4()}", on_click=evaluation_callback):
-                pass
-
-        # Afficher la fenêtre modale pour le feedback
-        if st.session_state.get("show_feedback_modal", False):
-            with st.form(key="feedback_form"):
-                st.markdown("### Donnez votre avis")
-                nombre_etoiles = st.slider("Notez CareBot (1 à 5 étoiles) :", 1, 5, 3)
-                feedback_text = st.text_area("Laissez un commentaire...")
-                if st.form_submit_button("Envoyer"):
-                    save_feedback(
-                        question=st.session_state["feedback_data"]["question"],
-                        reponse=st.session_state["feedback_data"]["reponse"],
-                        feedback_text=feedback_text,
-                        duree_reponse=st.session_state["feedback_data"]["duree_reponse"],
-                        nombre_etoiles=nombre_etoiles
-                    )
-                    st.success("Merci pour votre feedback !")
-                    st.session_state["show_feedback_modal"] = False
+        # Boutons et formulaire de feedback sous la dernière réponse
+        if st.session_state["last_question"]:
+            render_actions()
 
     elif st.session_state["page"] == "Évaluation":
+        # La pile d'évaluation (Ragas, Vertex AI, sentence-transformers) n'est chargée qu'ici
+        with st.spinner("Chargement des outils d'évaluation..."):
+            from eval import display_evaluation_page
         display_evaluation_page()
 
     elif st.session_state["page"] == "Voir les feedbacks":
@@ -208,6 +246,4 @@ async def main():
 
 # Point d'entrée pour exécuter l'application
 if __name__ == "__main__":
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(main())
+    main()
@@ -1,21 +1,14 @@
 import os
 import ast  
-import asyncio
 import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
 from dotenv import load_dotenv
-from langchain.schema import HumanMessage
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
-from ragas import SingleTurnSample, EvaluationDataset, evaluate
-from ragas.metrics import faithfulness, answer_relevancy, LLMContextPrecisionWithReference
-from ragas.llms import LangchainLLMWrapper
-from ragas.embeddings import LangchainEmbeddingsWrapper
-from langchain_google_vertexai import ChatVertexAI, VertexAIEmbeddings
 from langchain_core.outputs import LLMResult, ChatGeneration
-import google.auth
 from config import PROJECT_ID
+from lib.event_loop import run_async
+
+# Ragas, Vertex AI, sentence-transformers et matplotlib ne sont importés qu'à l'ouverture
+# de la page d'évaluation, pour ne pas ralentir le démarrage du chatbot
 
 # Suppress symlinks warning on Windows
 os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
@@ -30,19 +23,6 @@ config = {
     "embedding_model_id": "textembedding-gecko@latest",  
 }
 
-# Authentification Google
-creds, _ = google.auth.default(quota_project_id=config["project_id"])
-
-# Créer le modèle de langage et les embeddings avec Vertex AI
-vertexai_llm = ChatVertexAI(
-    credentials=creds,
-    model_name=config["chat_model_id"],
-)
-vertexai_embeddings = VertexAIEmbeddings(
-    credentials=creds,
-    model_name=config["embedding_model_id"],
-)
-
 # Envelopper les modèles pour Ragas
 # Create a custom is_finished_parser to capture Gemini generation completion signals
 def gemini_is_finished_parser(response: LLMResult) -> bool:
@@ -77,21 +57,41 @@ def gemini_is_finished_parser(response: LLMResult) -> bool:
 
     return all(is_finished_list)
 
-vertexai_llm = LangchainLLMWrapper(vertexai_llm, is_finished_parser=gemini_is_finished_parser)
-vertexai_embeddings = LangchainEmbeddingsWrapper(vertexai_embeddings)
-
-# Configurer le LLM pour Ragas
-evaluator_llm = vertexai_llm
+@st.cache_resource(show_spinner=False)
+def load_ragas_models():
+    """
+    Crée le LLM et les embeddings Vertex AI utilisés par Ragas (au premier appel seulement).
+    """
+    import google.auth
+    from langchain_google_vertexai import ChatVertexAI, VertexAIEmbeddings
+    from ragas.llms import LangchainLLMWrapper
+    from ragas.embeddings import LangchainEmbeddingsWrapper
+
+    # Authentification Google
+    creds, _ = google.auth.default(quota_project_id=config["project_id"])
+
+    # Créer le modèle de langage et les embeddings avec Vertex AI
+    vertexai_llm = ChatVertexAI(
+        credentials=creds,
+        model_name=config["chat_model_id"],
+    )
+    vertexai_embeddings = VertexAIEmbeddings(
+        credentials=creds,
+        model_name=config["embedding_model_id"],
+    )
+    vertexai_llm = LangchainLLMWrapper(vertexai_llm, is_finished_parser=gemini_is_finished_parser)
+    vertexai_embeddings = LangchainEmbeddingsWrapper(vertexai_embeddings)
+    return vertexai_llm, vertexai_embeddings
 
 # Charger un modèle d'embedding pour la similarité cosinus
 @st.cache_resource
 def load_model():
+    from sentence_transformers import SentenceTransformer
     return SentenceTransformer('paraphrase-MiniLM-L6-v2')
 
-model = load_model()
-
 def calculate_cosine_similarity(text1, text2):
-    embeddings = model.encode([text1, text2])
+    from sklearn.metrics.pairwise import cosine_similarity
+    embeddings = load_model().encode([text1, text2])
     similarity = cosine_similarity([embeddings[0]], [embeddings[1]])[0][0]
     return similarity
 
@@ -131,6 +131,13 @@ async def evaluate_sample(sample):
     Évalue un échantillon avec Ragas et retourne les résultats.
     """
     try:
+        from langchain_core.messages import HumanMessage
+        from ragas import EvaluationDataset, evaluate
+        from ragas.metrics import faithfulness, answer_relevancy, LLMContextPrecisionWithReference
+
+        # Configurer le LLM pour Ragas
+        evaluator_llm, _ = load_ragas_models()
+
         # Créer un dataset avec l'échantillon
         dataset = EvaluationDataset([sample])
 
@@ -159,6 +166,9 @@ async def evaluate_sample(sample):
         return {"error": str(e)}
 
 def display_evaluation_page():
+    import matplotlib.pyplot as plt
+    from ragas import SingleTurnSample
+
     st.title("📊 Évaluation du système RAG")
     st.markdown("### Évaluez les performances de votre système RAG en utilisant des métriques standards et spécifiques.")
 
@@ -219,9 +229,7 @@ def display_evaluation_page():
                     # Essayer de calculer et afficher les métriques Ragas
                     try:
                         with st.spinner("Calcul des métriques Ragas..."):
-                            loop = asyncio.new_event_loop()
-                            asyncio.set_event_loop(loop)
-                            ragas_metrics = loop.run_until_complete(evaluate_sample(sample))
+                            ragas_metrics = run_async(evaluate_sample(sample))
 
                             if "error" in ragas_metrics:
                                 st.error(f"Une erreur s'est produite lors du calcul des métriques Ragas : {ragas_metrics['error']}")
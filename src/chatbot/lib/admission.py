@@ -0,0 +1,122 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Tuple
+
+
+class AdmissionRejected(Exception):
+    """
+    Levée lorsqu'une requête est délestée : file d'attente pleine ou délai d'attente dépassé.
+    """
+
+
+class AdmissionController:
+    """
+    Contrôle d'admission devant la chaîne QA : au plus `max_in_flight` requêtes en cours,
+    au plus `max_queue` requêtes en attente pendant `queue_timeout` secondes ; au-delà,
+    les requêtes sont rejetées immédiatement plutôt que de ralentir toutes les autres.
+
+    Les places libérées sont attribuées dans l'ordre d'arrivée, y compris à des
+    requêtes en attente sur une autre boucle asyncio.
+    """
+
+    def __init__(self, max_in_flight: int = 8, max_queue: int = 16, queue_timeout: float = 3.0):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_seconds: deque = deque(maxlen=1000)
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        """
+        Attend une place libre.
+
+        Raises:
+            AdmissionRejected: Si la file d'attente est pleine ou si le délai d'attente est dépassé.
+        """
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.in_flight < self.max_in_flight and not self._waiters:
+                self.in_flight += 1
+                self.admitted += 1
+                self.wait_seconds.append(0.0)
+                return
+            if len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                logging.warning("Admission : file d'attente pleine, requête délestée.")
+                raise AdmissionRejected(f"File d'attente pleine ({self.max_queue} requêtes en attente).")
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+
+        try:
+            await asyncio.wait_for(waiter[1], self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                granted = waiter not in self._waiters
+                if not granted:
+                    self._waiters.remove(waiter)
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timed_out += 1
+                    self.rejected += 1
+            # La place a pu être attribuée juste avant l'expiration du délai : elle est rendue
+            if granted:
+                self.release()
+            if isinstance(e, asyncio.TimeoutError):
+                logging.warning("Admission : délai d'attente dépassé, requête délestée.")
+                raise AdmissionRejected(f"Délai d'attente dépassé ({self.queue_timeout}s).") from None
+            raise
+
+        with self._lock:
+            self.admitted += 1
+            self.wait_seconds.append(time.perf_counter() - start)
+
+    def release(self) -> None:
+        """
+        Libère une place, transmise directement à la plus ancienne requête en attente.
+        """
+        with self._lock:
+            if self._waiters:
+                loop, future = self._waiters.popleft()
+                loop.call_soon_threadsafe(self._grant, future)
+                return
+            self.in_flight -= 1
+
+    def _grant(self, future: asyncio.Future) -> None:
+        if not future.done():
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """
+        Contexte asynchrone réservant une place pendant le traitement d'une requête.
+        """
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = sorted(self.wait_seconds)
+            return {
+                "in_flight": self.in_flight,
+                "queue_depth": len(self._waiters),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "p95_wait_ms": 1000 * waits[int(len(waits) * 0.95)] if waits else 0.0,
+            }
@@ -0,0 +1,100 @@
+import json
+import asyncio
+from typing import Callable, List, Optional
+
+import aiohttp
+from langchain_core.documents import Document
+
+# Session HTTP partagée, créée sur la boucle asyncio qui l'utilise
+_SESSION: Optional[aiohttp.ClientSession] = None
+_SESSION_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+def documents_to_json(documents: List[Document]) -> List[dict]:
+    return [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents]
+
+
+def documents_from_json(data: List[dict]) -> List[Document]:
+    return [Document(page_content=doc["page_content"], metadata=doc.get("metadata", {})) for doc in data]
+
+
+def response_to_json(response: dict) -> dict:
+    """
+    Convertit une réponse de la chaîne QA en dictionnaire sérialisable en JSON.
+    """
+    return {
+        "query": response.get("query"),
+        "result": response.get("result"),
+        "source_documents": documents_to_json(response.get("source_documents", [])),
+    }
+
+
+def response_from_json(data: dict) -> dict:
+    """
+    Reconstruit une réponse au format de la chaîne QA à partir de sa forme JSON.
+    """
+    return {
+        "query": data.get("query"),
+        "result": data.get("result"),
+        "source_documents": documents_from_json(data.get("source_documents", [])),
+    }
+
+
+def _get_session(timeout: float) -> aiohttp.ClientSession:
+    global _SESSION, _SESSION_LOOP
+    loop = asyncio.get_running_loop()
+    if _SESSION is None or _SESSION.closed or _SESSION_LOOP is not loop:
+        _SESSION = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout))
+        _SESSION_LOOP = loop
+    return _SESSION
+
+
+async def ask(api_url: str, prompt: str, timeout: float = 120) -> Optional[dict]:
+    """
+    Pose une question au service RAG (`POST /ask`).
+
+    Returns:
+        Optional[dict]: La réponse au format de la chaîne QA, ou None si le service n'a pas pu répondre.
+    """
+    async with _get_session(timeout).post(f"{api_url}/ask", json={"question": prompt}) as resp:
+        if resp.status != 200:
+            return None
+        return response_from_json(await resp.json())
+
+
+async def regenerate(
+    api_url: str, prompt: str, source_documents: List[Document], timeout: float = 120
+) -> Optional[dict]:
+    """
+    Demande au service RAG une nouvelle réponse sur les documents déjà récupérés (`POST /regenerate`).
+
+    Returns:
+        Optional[dict]: La réponse au format de la chaîne QA, ou None si le service n'a pas pu répondre.
+    """
+    payload = {"question": prompt, "source_documents": documents_to_json(source_documents)}
+    async with _get_session(timeout).post(f"{api_url}/regenerate", json=payload) as resp:
+        if resp.status != 200:
+            return None
+        return response_from_json(await resp.json())
+
+
+async def astream_answer(
+    api_url: str, prompt: str, on_token: Callable[[str], None], timeout: float = 120
+) -> Optional[dict]:
+    """
+    Pose une question au service RAG en streaming (`POST /ask/stream`, une ligne JSON par événement).
+    Chaque token est transmis à `on_token`, puis la réponse complète est retournée.
+    """
+    response = None
+    async with _get_session(timeout).post(f"{api_url}/ask/stream", json={"question": prompt}) as resp:
+        if resp.status != 200:
+            return None
+        async for line in resp.content:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            if "token" in event:
+                on_token(event["token"])
+            elif event.get("response"):
+                response = response_from_json(event["response"])
+    return response
@@ -1,16 +1,36 @@
 import streamlit as st
-import asyncio
+import queue
 import logging
 import time
 
 # Importation des fonctions personnalisées
-from lib.embeddings import (
-    create_cloud_sql_database_connection,
-    get_embedding_model,
-    get_vector_store
+from lib.service import (
+    RagService,
+    abuild_qa_chain,
+    build_query_embeddings,
+    build_semantic_cache,
+    build_admission_controller,
+    build_regeneration_chain,
+    abuild_example_selector
+)
+from lib.embeddings import create_cloud_sql_database_connection
+from lib.admission import AdmissionController, AdmissionRejected
+from lib.source_retriever import format_answer_with_source
+from lib.semantic_cache import SemanticCache
+from lib.single_flight import SingleFlight
+from lib.warmup import Readiness, warm_up_with_retry
+from lib.event_loop import run_async, submit
+from lib import api_client
+from lib.config import (
+    RETRIEVAL_CACHE_MAX_TURNS,
+    RAG_API_URL,
+    RAG_API_TIMEOUT,
+    WARMUP_ENABLED,
+    WARMUP_QUESTION,
+    WARMUP_BATCH_QUESTIONS,
+    WARMUP_RETRY_SECONDS,
+    WARMUP_RETRY_MAX_SECONDS
 )
-
-from lib.chain import get_chain
 
 # Callbacks pour les boutons
 def feedback_callback():
@@ -18,67 +38,176 @@ def feedback_callback():
         "nature_feedback": "neutre",
         "question": st.session_state["last_question"],
         "reponse": st.session_state["last_response"],
-        "duree_reponse": st.session_state["last_duree_reponse"]
+        "duree_reponse": st.session_state["last_duree_reponse"],
+        "duree_premier_token": st.session_state["last_duree_premier_token"]
     }
     st.session_state["show_feedback_modal"] = True
 
-async def regenerate_callback():
+def remember_retrieval(question: str, source_documents: list):
+    """
+    Garde en session le contexte récupéré pour une question, afin de pouvoir
+    régénérer la réponse sans refaire l'embedding ni la recherche.
+    """
+    retrieval_cache = st.session_state.setdefault("retrieval_cache", {})
+    retrieval_cache.pop(question, None)
+    retrieval_cache[question] = source_documents
+    while len(retrieval_cache) > RETRIEVAL_CACHE_MAX_TURNS:
+        retrieval_cache.pop(next(iter(retrieval_cache)))
+
+def regenerate_callback() -> bool:
+    """
+    Régénère la dernière réponse et retourne True si elle a été remplacée.
+    """
     if st.session_state["last_question"]:
         prompt = st.session_state["last_question"]
-        st.session_state.messages.pop()
-
-        if st.session_state["qa_chain"]:
-            try:
-                with st.spinner("CareBot réfléchit..."):
-                    start_time = time.time()
-                    # Utilisez await pour appeler generate_response
-                    response = await generate_response(st.session_state["qa_chain"], prompt)
-                    if response and response.get("result"):
-                        answer = response["result"]
-                        duree_reponse = time.time() - start_time
-
-                        if "source_documents" in response and response["source_documents"]:
-                            best_doc = max(
-                                response["source_documents"],
-                                key=lambda doc: doc.metadata.get("similarity_score", 0)
-                            )
-                            answer += f"\n\n**Source :** {best_doc.metadata.get('source', 'N/A')}\n"
-                            answer += f"\n**Focus Area :** {best_doc.metadata.get('focus_area', 'N/A')}\n"
-                            answer += f"\n**Similarity Score :** {best_doc.metadata.get('similarity_score', 'N/A')}\n"
-                            answer += f"\n**Similarity Type :** {best_doc.metadata.get('similarity_type', 'N/A')}"
-
-                        st.session_state.messages.append({"role": "assistant", "content": answer})
-                        with st.chat_message("assistant"):
-                            st.markdown(answer)
-
-                        st.session_state["last_response"] = answer
-                    else:
-                        st.error("Erreur lors de la régénération de la réponse.")
-            except Exception as e:
-                st.error(f"Erreur lors de la régénération de la réponse : {e}")
-                logging.error(f"Erreur lors de la régénération de la réponse : {e}")
+        try:
+            with st.spinner("CareBot réfléchit..."):
+                start_time = time.time()
+                source_documents = st.session_state.get("retrieval_cache", {}).get(prompt)
+                if source_documents is not None:
+                    # Seul le LLM est rappelé, sur le même contexte
+                    response = run_async(aregenerate_response(initialize_qa_chain(), prompt, source_documents))
+                else:
+                    response = run_async(generate_response(initialize_qa_chain(), prompt))
+
+                if response and response.get("result"):
+                    answer = format_answer_with_source(response)
+                    st.session_state.messages.pop()
+                    st.session_state.messages.append({"role": "assistant", "content": answer})
+                    st.session_state["last_response"] = answer
+                    st.session_state["last_duree_reponse"] = time.time() - start_time
+                    st.session_state["last_duree_premier_token"] = st.session_state["last_duree_reponse"]
+                    if response.get("source_documents"):
+                        remember_retrieval(prompt, response["source_documents"])
+                    return True
+                st.error("Erreur lors de la régénération de la réponse.")
+        except Exception as e:
+            st.error(f"Erreur lors de la régénération de la réponse : {e}")
+            logging.error(f"Erreur lors de la régénération de la réponse : {e}")
+    return False
+
+# Régénération sur le même contexte, localement ou via le service HTTP
+async def aregenerate_response(qa_chain, prompt, source_documents):
+    if RAG_API_URL:
+        try:
+            return await api_client.regenerate(RAG_API_URL, prompt, source_documents, timeout=RAG_API_TIMEOUT)
+        except Exception as e:
+            logging.error(f"Erreur lors de l'appel au service RAG : {e}")
+            return None
+    try:
+        return await get_rag_service(qa_chain).regenerate(prompt, source_documents)
+    except AdmissionRejected:
+        # La réponse précédente est conservée
+        logging.warning(f"Régénération délestée : {prompt}")
+        return None
 
 def evaluation_callback():
     st.session_state["page"] = "Évaluation"
 
 @st.cache_resource(show_spinner=False)
+def build_cached_qa_chain():
+    """
+    Crée la chaîne QA une seule fois par processus. Une exception n'étant pas mise en cache
+    par Streamlit, un échec est retenté à l'exécution suivante du script.
+    """
+    return run_async(abuild_qa_chain(initialize_query_embeddings(), example_selector=initialize_example_selector()))
+
 def initialize_qa_chain():
+    if RAG_API_URL:
+        # La chaîne QA tourne dans le service HTTP, l'application n'en est que le client
+        return None
     try:
-        logging.info("Connexion à la base de données...")
-        engine = create_cloud_sql_database_connection()
-        logging.info("Chargement du modèle d'embedding...")
-        embeddings = get_embedding_model(engine)
-        logging.info("Création du vector store...")
-        vector_store = asyncio.run(get_vector_store(engine, embeddings))  
-        logging.info("Création de la chaîne QA...")
-        qa_chain = asyncio.run(get_chain(vector_store=vector_store))  
-        logging.info("Chaîne QA initialisée avec succès.")
-        return qa_chain
+        return build_cached_qa_chain()
     except Exception as e:
         st.error(f"Échec de l'initialisation du chatbot : {e}")
         logging.error(f"Échec de l'initialisation du chatbot : {e}")
         return None
 
+@st.cache_resource(show_spinner=False)
+def initialize_regeneration_chain():
+    """
+    Retourne la chaîne prompt | LLM utilisée pour régénérer une réponse à partir du contexte déjà récupéré.
+    """
+    return build_regeneration_chain(initialize_example_selector())
+
+@st.cache_resource(show_spinner=False)
+def initialize_semantic_cache() -> SemanticCache:
+    """
+    Retourne le cache sémantique des réponses, partagé par toutes les sessions.
+    """
+    return build_semantic_cache(create_cloud_sql_database_connection())
+
+@st.cache_resource(show_spinner=False)
+def initialize_single_flight() -> SingleFlight:
+    """
+    Retourne la table des questions en cours de traitement, partagée par toutes les sessions.
+    """
+    return SingleFlight()
+
+@st.cache_resource(show_spinner=False)
+def initialize_query_embeddings():
+    """
+    Retourne le modèle d'embedding des requêtes, partagé par toutes les sessions.
+    """
+    return build_query_embeddings()
+
+@st.cache_resource(show_spinner=False)
+def initialize_example_selector():
+    """
+    Retourne le sélecteur des exemples du prompt, dont les vecteurs sont calculés une seule fois.
+    """
+    return run_async(abuild_example_selector(initialize_query_embeddings()))
+
+@st.cache_resource(show_spinner=False)
+def initialize_admission_controller() -> AdmissionController:
+    """
+    Retourne le contrôleur d'admission de la chaîne QA, partagé par toutes les sessions.
+    """
+    return build_admission_controller()
+
+@st.cache_resource(show_spinner=False)
+def start_warm_up(_qa_chain) -> Readiness:
+    """
+    Lance le préchauffage de la chaîne QA une seule fois par processus, sur la boucle
+    d'arrière-plan, et retourne aussitôt son état, mis à jour au fil des étapes. Un échec
+    est retenté en arrière-plan avec une attente croissante (au plus `WARMUP_RETRY_MAX_SECONDS`) :
+    aucune exécution du script n'attend le préchauffage ni ses nouvelles tentatives.
+    (`_qa_chain` est exclu de la clé du cache.)
+    """
+    readiness = Readiness()
+    submit(warm_up_with_retry(
+        get_rag_service(_qa_chain),
+        WARMUP_QUESTION,
+        readiness,
+        WARMUP_BATCH_QUESTIONS,
+        attempts=0,
+        delay=WARMUP_RETRY_SECONDS,
+        max_delay=WARMUP_RETRY_MAX_SECONDS
+    ))
+    return readiness
+
+def initialize_readiness(qa_chain) -> Readiness:
+    """
+    Retourne l'état de préchauffage de la chaîne QA (`start_warm_up`), utilisé pour n'activer
+    la saisie qu'une fois la chaîne prête. Streamlit n'ayant pas de point d'entrée au démarrage
+    du processus, le préchauffage est lancé lors de la première exécution du script.
+    La sonde de santé de Streamlit (`/_stcore/health`) ne dépend pas de cet état : derrière un
+    load balancer, utiliser le service HTTP (`api.py`) et sa sonde `GET /ready`.
+    """
+    if qa_chain is None or not WARMUP_ENABLED:
+        return Readiness(ready=qa_chain is not None or bool(RAG_API_URL))
+    return start_warm_up(qa_chain)
+
+def get_rag_service(qa_chain) -> RagService:
+    return RagService(
+        qa_chain,
+        initialize_query_embeddings(),
+        initialize_semantic_cache(),
+        initialize_single_flight(),
+        initialize_admission_controller(),
+        initialize_regeneration_chain()
+    )
+
 def get_default_response(prompt: str) -> str:
     """
     Retourne une réponse par défaut si le chatbot n'est pas initialisé ou en cas d'erreur.
@@ -90,3 +219,67 @@ def get_default_response(prompt: str) -> str:
         "Je ne suis pas en mesure de répondre pour le moment. Merci de votre patience.",
     ]
     return default_responses[len(prompt) % len(default_responses)]
+
+# Réponse par défaut lorsque la requête est délestée par le contrôle d'admission
+def get_shed_response(prompt: str) -> dict:
+    logging.warning(f"Requête délestée, réponse par défaut envoyée : {prompt}")
+    return {"query": prompt, "result": get_default_response(prompt), "source_documents": []}
+
+# Fonction asynchrone pour générer une réponse, localement ou via le service HTTP
+async def generate_response(qa_chain, prompt):
+    if RAG_API_URL:
+        try:
+            return await api_client.ask(RAG_API_URL, prompt, timeout=RAG_API_TIMEOUT)
+        except Exception as e:
+            logging.error(f"Erreur lors de l'appel au service RAG : {e}")
+            return None
+    try:
+        return await get_rag_service(qa_chain).answer(prompt)
+    except AdmissionRejected:
+        return get_shed_response(prompt)
+
+# Fonction asynchrone produisant la réponse en streaming, token par token via `on_token`
+async def astream_answer(qa_chain, prompt, on_token):
+    if RAG_API_URL:
+        return await api_client.astream_answer(RAG_API_URL, prompt, on_token, timeout=RAG_API_TIMEOUT)
+    try:
+        return await get_rag_service(qa_chain).astream_answer(prompt, on_token)
+    except AdmissionRejected:
+        return get_shed_response(prompt)
+
+# Fonction de génération en streaming dans un placeholder Streamlit
+def stream_response(qa_chain, prompt, placeholder):
+    """
+    Affiche la réponse au fil des tokens et retourne la réponse complète
+    avec le temps jusqu'au premier token.
+
+    La génération tourne sur la boucle d'arrière-plan ; les tokens sont transmis
+    par une file au thread du script, seul autorisé à mettre à jour l'interface.
+    """
+    start_time = time.time()
+    tokens = queue.Queue()
+
+    async def produce():
+        try:
+            return await astream_answer(qa_chain, prompt, tokens.put)
+        finally:
+            tokens.put(None)
+
+    try:
+        future = submit(produce())
+        time_to_first_token, partial_answer = None, ""
+        while (token := tokens.get()) is not None:
+            if time_to_first_token is None:
+                time_to_first_token = time.time() - start_time
+            partial_answer += token
+            placeholder.markdown(partial_answer + "▌")
+
+        response = future.result()
+        if response is None:
+            return None, None
+        if time_to_first_token is None:
+            time_to_first_token = time.time() - start_time
+        return response, time_to_first_token
+    except Exception as e:
+        logging.error(f"Erreur lors de la génération de la réponse en streaming : {e}")
+        return None, None
@@ -1,7 +1,8 @@
-from typing import Optional, List
+from typing import AsyncIterator, Optional, List
+from langchain_core.example_selectors import BaseExampleSelector
 from langchain.schema import BaseRetriever, Document
 from langchain.chains import RetrievalQA
-from langchain_google_cloud_sql_pg import PostgresVectorStore
+from langchain_google_cloud_sql_pg import PostgresVectorStore, PostgresEngine
 from pydantic import BaseModel
 import logging
 import asyncio
@@ -12,18 +13,191 @@ from lib.embeddings import (
     get_embedding_model, 
     get_vector_store
 )
-from lib.retriever import get_relevant_documents
-from lib.model import get_llm
+from lib.retriever import (
+    get_relevant_documents,
+    get_relevant_documents_batch,
+    get_relevant_documents_from_index,
+    get_relevant_documents_hybrid,
+    get_relevant_documents_two_phase,
+    adaptive_cutoff,
+    is_lexical_fast_path
+)
+from lib.vector_index import NumpyVectorIndex
+from lib.lexical_index import BM25Index
+from lib.reranker import CrossEncoderReranker
+from lib.context_packer import pack_context
+from lib.chunk_cache import ChunkContentCache
+from lib.event_loop import run_async
+from lib.model import get_llm, get_hedged_llm
+from lib.resilience import CircuitBreaker, DependencyError, GuardedChatModel
+from lib.generation_budget import BudgetedChatModel, current_response_format
 from lib.prompt import get_prompt
 
 
 class CustomRetriever(BaseRetriever, BaseModel):
     """
     A custom retriever that fetches relevant documents from a PostgresVectorStore
-    based on a similarity threshold.
+    based on a similarity threshold. When an in-memory vector index is provided,
+    searches are answered from it instead of Cloud SQL. When a lexical index is
+    provided, BM25 results are fused with the vector results. When a reranker is
+    provided, more candidates are fetched and only the best ones are kept.
+    When context packing is enabled, overlapping chunks of the same source are
+    merged and the context is limited to a token budget. In adaptive k mode, up to
+    `max_k` documents are fetched and the number kept depends on the score distribution.
+    When a chunk cache is provided, Cloud SQL searches are run in two phases: ids and
+    scores first, then the content of the kept chunks only. When a Cloud SQL circuit
+    breaker is provided, Cloud SQL searches go through it within `search_budget_share`
+    of the request deadline, and dependency failures are raised instead of returning
+    no documents.
     """
     vector_store: PostgresVectorStore
     similarity_threshold: float
+    k: int = 4
+    adaptive_k: bool = False
+    max_k: int = 8
+    vector_index: Optional[NumpyVectorIndex] = None
+    lexical_index: Optional[BM25Index] = None
+    reranker: Optional[CrossEncoderReranker] = None
+    context_packing: bool = False
+    context_max_tokens: int = 0
+    engine: Optional[PostgresEngine] = None
+    chunk_cache: Optional[ChunkContentCache] = None
+    sql_breaker: Optional[CircuitBreaker] = None
+    search_budget_share: float = 1.0
+    sql_retries: int = 0
+
+    async def _guard_sql(self, search):
+        """
+        Runs a Cloud SQL search through its circuit breaker, when one is configured.
+        The query must already be embedded, so that the breaker and its share of the
+        deadline only measure Cloud SQL.
+        """
+        if self.sql_breaker is None:
+            return await search()
+        return await self.sql_breaker.call(search, self.search_budget_share, self.sql_retries)
+
+    async def _vector_search(self, query: str, k: int) -> List[dict]:
+        """
+        Runs the vector search on the configured backend.
+        """
+        if self.vector_index is not None:
+            relevant_docs = await get_relevant_documents_from_index(
+                query=query,
+                vector_index=self.vector_index,
+                embeddings=self.vector_store.embeddings,
+                similarity_threshold=self.similarity_threshold,
+                k=k
+            )
+        else:
+            # Embedding hors du disjoncteur Cloud SQL, qui a le sien
+            query_embedding = await self.vector_store.embeddings.aembed_query(query)
+            if self.chunk_cache is not None and self.engine is not None:
+                # La coupure est appliquée entre les deux phases, avant la lecture du contenu
+                return await self._guard_sql(lambda: get_relevant_documents_two_phase(
+                    query=query,
+                    engine=self.engine,
+                    embeddings=self.vector_store.embeddings,
+                    chunk_cache=self.chunk_cache,
+                    similarity_threshold=self.similarity_threshold,
+                    k=k,
+                    cutoff=self._cutoff,
+                    query_embedding=query_embedding
+                ))
+            else:
+                relevant_docs = await self._guard_sql(lambda: get_relevant_documents(
+                    query=query,
+                    vector_store=self.vector_store,
+                    similarity_threshold=self.similarity_threshold,
+                    k=k,
+                    query_embedding=query_embedding
+                ))
+
+        scores = [doc["similarity_score"] for doc in relevant_docs]
+        return relevant_docs[:self._cutoff(scores)]
+
+    def _cutoff(self, scores: List[float]) -> int:
+        """
+        Returns the number of vector results to keep for the given scores.
+        """
+        if self.adaptive_k and self.reranker is None:
+            return adaptive_cutoff(scores, min_k=self.k)
+        return len(scores)
+
+    def _fetch_k(self) -> int:
+        """
+        Returns the number of candidates fetched before reranking or cutoff.
+        """
+        if self.reranker is not None:
+            return self.reranker.fetch_k
+        if self.adaptive_k:
+            return self.max_k
+        return self.k
+
+    def is_lexical_fast_path(self, query: str) -> bool:
+        """
+        Tells whether the query will be answered by the lexical search alone,
+        without embedding it.
+        """
+        return self.lexical_index is not None and is_lexical_fast_path(query, self.lexical_index, self._fetch_k())
+
+    async def _search(self, query: str) -> List[dict]:
+        """
+        Runs the vector search, fused with the lexical search when enabled,
+        then reranks the candidates when a reranker is configured.
+        """
+        k = self._fetch_k()
+        if self.lexical_index is not None:
+            relevant_docs = await get_relevant_documents_hybrid(
+                query=query,
+                lexical_index=self.lexical_index,
+                vector_search=lambda: self._vector_search(query, k),
+                k=k
+            )
+        else:
+            relevant_docs = await self._vector_search(query, k)
+
+        if self.reranker is not None:
+            relevant_docs = await self.reranker.arerank(query, relevant_docs)
+        if self.context_packing:
+            relevant_docs = pack_context(relevant_docs, max_tokens=self.context_max_tokens)
+        return relevant_docs
+
+    async def abatch_search(self, queries: List[str]) -> List[List[Document]]:
+        """
+        Searches the documents of several queries at once: a single embedding call,
+        then one matrix product (in-memory index) or one Cloud SQL query for all of them.
+        Only the vector search is run (no lexical fusion, reranking nor packing).
+
+        Args:
+            queries (List[str]): The search queries.
+
+        Returns:
+            List[List[Document]]: The relevant documents of each query.
+        """
+        results = await get_relevant_documents_batch(
+            queries=queries,
+            engine=self.engine,
+            embeddings=self.vector_store.embeddings,
+            k=self.k,
+            similarity_threshold=self.similarity_threshold,
+            vector_index=self.vector_index
+        )
+        return [self._to_documents(relevant_docs) for relevant_docs in results]
+
+    @staticmethod
+    def _to_documents(relevant_docs: List[dict]) -> List[Document]:
+        # Convertir les dictionnaires en objets Document
+        return [
+            Document(
+                page_content=doc["content"],
+                metadata={
+                    **doc["metadata"],
+                    "similarity_score": doc["similarity_score"],
+                    "similarity_type": doc["similarity_type"]
+                }
+            )
+            for doc in relevant_docs
+        ]
 
     def _get_relevant_documents(self, query: str) -> List[Document]:
         """
@@ -36,27 +210,28 @@ class CustomRetriever(BaseRetriever, BaseModel):
             List[Document]: A list of relevant documents with similarity scores and types.
         """
         try:
-            # Appeler la fonction async de manière synchrone
-            relevant_docs = asyncio.run(
-                get_relevant_documents(
-                    query=query,
-                    vector_store=self.vector_store,
-                    similarity_threshold=self.similarity_threshold
-                )
-            )
-            # Convertir les dictionnaires en objets Document
-            documents = [
-                Document(
-                    page_content=doc["content"],
-                    metadata={
-                        **doc["metadata"],
-                        "similarity_score": doc["similarity_score"],
-                        "similarity_type": doc["similarity_type"]
-                    }
-                )
-                for doc in relevant_docs
-            ]
-            return documents
+            # Exécuter la recherche async sur la boucle d'arrière-plan du processus
+            return self._to_documents(run_async(self._search(query)))
+        except DependencyError:
+            raise
+        except Exception as e:
+            logging.error(f"Error retrieving documents: {e}")
+            return []
+
+    async def _aget_relevant_documents(self, query: str) -> List[Document]:
+        """
+        Retrieves relevant documents for a given query, on the caller's event loop.
+
+        Args:
+            query (str): The search query.
+
+        Returns:
+            List[Document]: A list of relevant documents with similarity scores and types.
+        """
+        try:
+            return self._to_documents(await self._search(query))
+        except DependencyError:
+            raise
         except Exception as e:
             logging.error(f"Error retrieving documents: {e}")
             return []
@@ -67,6 +242,23 @@ async def get_chain(
     similarity_threshold: float = 0.5,
     max_output_tokens: int = 716,
     temperature: float = 0.1,
+    vector_index: Optional[NumpyVectorIndex] = None,
+    lexical_index: Optional[BM25Index] = None,
+    reranker: Optional[CrossEncoderReranker] = None,
+    context_packing: bool = False,
+    context_max_tokens: int = 0,
+    adaptive_k: bool = False,
+    max_k: int = 8,
+    engine: Optional[PostgresEngine] = None,
+    chunk_cache: Optional[ChunkContentCache] = None,
+    fallback_model: Optional[str] = None,
+    hedge_delay: float = 0,
+    llm_breaker: Optional[CircuitBreaker] = None,
+    sql_breaker: Optional[CircuitBreaker] = None,
+    search_budget_share: float = 1.0,
+    dependency_retries: int = 0,
+    example_selector: Optional[BaseExampleSelector] = None,
+    adaptive_budget: bool = False,
 ) -> Optional[RetrievalQA]:
     """
     Creates and returns a RetrievalQA chain for answering questions.
@@ -76,6 +268,23 @@ async def get_chain(
         similarity_threshold (float): The similarity threshold for filtering documents.
         max_output_tokens (int): The maximum number of tokens for the LLM's response.
         temperature (float): The temperature parameter for the LLM.
+        vector_index (Optional[NumpyVectorIndex]): In-memory replica of the vector table used instead of Cloud SQL.
+        lexical_index (Optional[BM25Index]): BM25 index fused with the vector search.
+        reranker (Optional[CrossEncoderReranker]): Local cross-encoder reranking the retrieved candidates.
+        context_packing (bool): Whether to merge overlapping chunks before building the context.
+        context_max_tokens (int): Token budget of the packed context (0 for no limit).
+        adaptive_k (bool): Whether to adapt the number of documents to the score distribution.
+        max_k (int): The maximum number of documents fetched in adaptive k mode.
+        engine (Optional[PostgresEngine]): The Cloud SQL engine, required for two-phase retrieval.
+        chunk_cache (Optional[ChunkContentCache]): In-memory chunk content cache enabling two-phase retrieval.
+        fallback_model (Optional[str]): Faster model queried when the primary LLM is slow (None to disable hedging).
+        hedge_delay (float): Seconds without a first token before the fallback model is queried.
+        llm_breaker (Optional[CircuitBreaker]): Circuit breaker of the LLM, which then follows the request deadline.
+        sql_breaker (Optional[CircuitBreaker]): Circuit breaker of the Cloud SQL searches.
+        search_budget_share (float): Maximum share of the request deadline given to a Cloud SQL search.
+        dependency_retries (int): Retries of a failed LLM or Cloud SQL call, made only if budget remains.
+        example_selector (Optional[BaseExampleSelector]): Selects the few-shot examples of each prompt (all of them if None).
+        adaptive_budget (bool): Whether `max_output_tokens` follows the class of the question (see `question_class_scope`).
 
     Returns:
         RetrievalQA: A configured RetrievalQA instance.
@@ -86,13 +295,24 @@ async def get_chain(
         # Create a custom retriever
         retriever = CustomRetriever(
             vector_store=vector_store,
-            similarity_threshold=similarity_threshold
+            similarity_threshold=similarity_threshold,
+            vector_index=vector_index,
+            lexical_index=lexical_index,
+            reranker=reranker,
+            context_packing=context_packing,
+            context_max_tokens=context_max_tokens,
+            adaptive_k=adaptive_k,
+            max_k=max_k,
+            engine=engine,
+            chunk_cache=chunk_cache,
+            sql_breaker=sql_breaker,
+            search_budget_share=search_budget_share,
+            sql_retries=dependency_retries
         )
 
         # Initialize the language model (LLM)
-        llm = get_llm(
-            max_output_tokens=max_output_tokens,
-            temp=temperature
+        llm = _build_llm(
+            max_output_tokens, temperature, fallback_model, hedge_delay, llm_breaker, dependency_retries, adaptive_budget
         )
 
         # Create the RetrievalQA chain
@@ -100,7 +320,7 @@ async def get_chain(
             llm=llm,
             chain_type="stuff",
             retriever=retriever,
-            chain_type_kwargs={"prompt": get_prompt()},
+            chain_type_kwargs={"prompt": get_prompt(example_selector)},
             return_source_documents=True,
         )
 
@@ -110,6 +330,107 @@ async def get_chain(
         return None
 
 
+def _build_llm(
+    max_output_tokens: int,
+    temperature: float,
+    fallback_model: Optional[str],
+    hedge_delay: float,
+    breaker: Optional[CircuitBreaker] = None,
+    retries: int = 0,
+    adaptive_budget: bool = False,
+):
+    # Avec un disjoncteur, les nouvelles tentatives sont faites par GuardedChatModel selon le budget restant
+    max_retries = 0 if breaker is not None else 2
+    if fallback_model and hedge_delay > 0:
+        llm = get_hedged_llm(
+            max_output_tokens=max_output_tokens,
+            temp=temperature,
+            fallback_model=fallback_model,
+            hedge_delay=hedge_delay,
+            max_retries=max_retries
+        )
+    else:
+        llm = get_llm(max_output_tokens=max_output_tokens, temp=temperature, max_retries=max_retries)
+    if breaker is not None:
+        llm = GuardedChatModel(model=llm, breaker=breaker, max_retries=retries)
+    if adaptive_budget:
+        llm = BudgetedChatModel(model=llm)
+    return llm
+
+
+def get_regeneration_chain(
+    max_output_tokens: int = 716,
+    temperature: float = 0.7,
+    fallback_model: Optional[str] = None,
+    hedge_delay: float = 0,
+    llm_breaker: Optional[CircuitBreaker] = None,
+    retries: int = 0,
+    example_selector: Optional[BaseExampleSelector] = None,
+    adaptive_budget: bool = False,
+):
+    """
+    Creates a prompt | LLM chain answering from documents that were already retrieved.
+
+    Args:
+        max_output_tokens (int): The maximum number of tokens for the LLM's response.
+        temperature (float): The temperature parameter for the LLM, higher than the
+            QA chain's so that a regenerated answer differs from the first one.
+        fallback_model (Optional[str]): Faster model queried when the primary LLM is slow (None to disable hedging).
+        hedge_delay (float): Seconds without a first token before the fallback model is queried.
+        llm_breaker (Optional[CircuitBreaker]): Circuit breaker of the LLM, which then follows the request deadline.
+        retries (int): Retries of a failed generation, made only if budget remains.
+        example_selector (Optional[BaseExampleSelector]): Selects the few-shot examples of each prompt (all of them if None).
+        adaptive_budget (bool): Whether `max_output_tokens` follows the class of the question (see `question_class_scope`).
+
+    Returns:
+        Runnable: The regeneration chain.
+    """
+    return get_prompt(example_selector) | _build_llm(
+        max_output_tokens, temperature, fallback_model, hedge_delay, llm_breaker, retries, adaptive_budget
+    )
+
+
+async def regenerate_response(regeneration_chain, query: str, source_documents: List[Document]) -> dict:
+    """
+    Generates a new answer over the same context, without embedding nor vector search.
+
+    Args:
+        regeneration_chain (Runnable): The chain returned by `get_regeneration_chain`.
+        query (str): The user question.
+        source_documents (List[Document]): The documents retrieved for the first answer.
+
+    Returns:
+        dict: The response, in the same format as the QA chain output.
+    """
+    # Même assemblage du contexte que la chaîne "stuff"
+    context = "\n\n".join(doc.page_content for doc in source_documents)
+    message = await regeneration_chain.ainvoke(
+        {"context": context, "question": query, "response_format": current_response_format()}
+    )
+    return {"query": query, "result": message.content, "source_documents": source_documents}
+
+
+async def astream_response(qa_chain: RetrievalQA, query: str) -> AsyncIterator[dict]:
+    """
+    Streams the answer of the QA chain token by token.
+
+    Args:
+        qa_chain (RetrievalQA): The QA chain.
+        query (str): The user question.
+
+    Yields:
+        dict: `{"token": str}` for each generated token, then `{"response": dict}`
+        with the full chain output (result and source documents).
+    """
+    async for event in qa_chain.astream_events({"query": query}, version="v2"):
+        if event["event"] == "on_chat_model_stream":
+            token = event["data"]["chunk"].content
+            if token:
+                yield {"token": token}
+        elif event["event"] == "on_chain_end" and not event.get("parent_ids"):
+            yield {"response": event["data"]["output"]}
+
+
 async def main():
     # Initialize the vector store (replace with your actual initialization code)
     engine = create_cloud_sql_database_connection()
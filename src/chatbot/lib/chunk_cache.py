@@ -0,0 +1,65 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Tuple
+
+
+class ChunkContentCache:
+    """
+    Cache LRU en mémoire du contenu et des métadonnées des chunks, indexé par identifiant.
+    La taille du cache est bornée en octets plutôt qu'en nombre d'entrées.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[str, dict, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _entry_size(content: str, metadata: dict) -> int:
+        return len(content.encode("utf-8")) + len(json.dumps(metadata, ensure_ascii=False).encode("utf-8"))
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, Tuple[str, dict]]:
+        """
+        Retourne le contenu et les métadonnées des chunks présents dans le cache.
+
+        Args:
+            ids (Iterable[str]): Les identifiants recherchés.
+
+        Returns:
+            Dict[str, Tuple[str, dict]]: Les chunks trouvés, par identifiant.
+        """
+        found = {}
+        with self._lock:
+            for chunk_id in ids:
+                entry = self._entries.get(chunk_id)
+                if entry is None:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(chunk_id)
+                self.hits += 1
+                found[chunk_id] = (entry[0], entry[1])
+        return found
+
+    def put(self, chunk_id: str, content: str, metadata: dict) -> None:
+        """
+        Ajoute un chunk au cache en évinçant les moins récemment utilisés si la taille maximale est dépassée.
+        """
+        size = self._entry_size(content, metadata)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(chunk_id, None)
+            if previous is not None:
+                self.size_bytes -= previous[2]
+            self._entries[chunk_id] = (content, metadata, size)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted_size
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -13,4 +13,145 @@ INSTANCE = os.environ['INSTANCE']
 DATABASE = os.environ['DATABASE']
 DB_PASSWORD = os.environ['DB_PASSWORD']
 TABLE_NAME = os.environ['TABLE_NAME']
-DB_USER = os.environ['DB_USER']
\ No newline at end of file
+DB_USER = os.environ['DB_USER']
+
+# Cache sémantique des réponses
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', 0.95))
+SEMANTIC_CACHE_MAX_SIZE = int(os.environ.get('SEMANTIC_CACHE_MAX_SIZE', 500))
+SEMANTIC_CACHE_TTL = float(os.environ.get('SEMANTIC_CACHE_TTL', 3600))
+# Intervalle de lecture de la version de la table des chunks ; le cache est vidé lorsqu'elle change
+INDEX_VERSION_CHECK_SECONDS = float(os.environ.get('INDEX_VERSION_CHECK_SECONDS', 60))
+
+# Backend de recherche vectorielle : 'pgvector' (Cloud SQL) ou 'numpy' (réplique en mémoire)
+RETRIEVER_BACKEND = os.environ.get('RETRIEVER_BACKEND', 'pgvector')
+VECTOR_INDEX_PATH = os.environ.get('VECTOR_INDEX_PATH', '')
+VECTOR_INDEX_REFRESH_SECONDS = float(os.environ.get('VECTOR_INDEX_REFRESH_SECONDS', 600))
+
+# Recherche lexicale BM25 fusionnée avec la recherche vectorielle
+LEXICAL_SEARCH_ENABLED = os.environ.get('LEXICAL_SEARCH_ENABLED', 'false').lower() == 'true'
+LEXICAL_FAST_PATH_MARGIN = float(os.environ.get('LEXICAL_FAST_PATH_MARGIN', 2.0))
+LEXICAL_INDEX_REFRESH_SECONDS = float(os.environ.get('LEXICAL_INDEX_REFRESH_SECONDS', 600))
+RRF_K = int(os.environ.get('RRF_K', 60))
+# Part minimale des termes de la question qu'un chunk trouvé par BM25 seul doit contenir
+LEXICAL_MIN_TERM_COVERAGE = float(os.environ.get('LEXICAL_MIN_TERM_COVERAGE', 0.5))
+
+# Reranking local par cross-encoder
+RERANK_ENABLED = os.environ.get('RERANK_ENABLED', 'false').lower() == 'true'
+RERANK_MODEL = os.environ.get('RERANK_MODEL', 'cross-encoder/mmarco-mMiniLMv2-L12-H384-v1')
+RERANK_FETCH_K = int(os.environ.get('RERANK_FETCH_K', 20))
+RERANK_TOP_N = int(os.environ.get('RERANK_TOP_N', 4))
+RERANK_MAX_TOKENS = int(os.environ.get('RERANK_MAX_TOKENS', 0))
+RERANK_BATCH_SIZE = int(os.environ.get('RERANK_BATCH_SIZE', 16))
+RERANK_TIME_BUDGET = float(os.environ.get('RERANK_TIME_BUDGET', 0.5))
+# Tronque les candidats sans les scorer (le modèle n'est pas chargé)
+RERANK_SKIP = os.environ.get('RERANK_SKIP', 'false').lower() == 'true'
+
+# Assemblage du contexte : fusion des chunks qui se chevauchent et budget de tokens
+CONTEXT_PACKING_ENABLED = os.environ.get('CONTEXT_PACKING_ENABLED', 'true').lower() == 'true'
+CONTEXT_MAX_TOKENS = int(os.environ.get('CONTEXT_MAX_TOKENS', 1500))
+
+# Nombre de documents adaptatif selon la distribution des scores
+ADAPTIVE_K_ENABLED = os.environ.get('ADAPTIVE_K_ENABLED', 'false').lower() == 'true'
+ADAPTIVE_K_MAX = int(os.environ.get('ADAPTIVE_K_MAX', 8))
+ADAPTIVE_K_DOMINANCE_MARGIN = float(os.environ.get('ADAPTIVE_K_DOMINANCE_MARGIN', 0.1))
+ADAPTIVE_K_CLUSTER_WIDTH = float(os.environ.get('ADAPTIVE_K_CLUSTER_WIDTH', 0.03))
+
+# Recherche en deux phases avec cache du contenu des chunks
+TWO_PHASE_RETRIEVAL_ENABLED = os.environ.get('TWO_PHASE_RETRIEVAL_ENABLED', 'false').lower() == 'true'
+CHUNK_CACHE_MAX_BYTES = int(os.environ.get('CHUNK_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+# Regroupement des embeddings de requêtes concurrentes
+EMBEDDING_BATCH_ENABLED = os.environ.get('EMBEDDING_BATCH_ENABLED', 'true').lower() == 'true'
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.environ.get('EMBEDDING_BATCH_MAX_WAIT_MS', 5))
+EMBEDDING_BATCH_MAX_SIZE = int(os.environ.get('EMBEDDING_BATCH_MAX_SIZE', 16))
+
+# Fournisseur d'embeddings : 'vertex' (Vertex AI) ou 'local' (sentence-transformers sur CPU)
+EMBEDDING_PROVIDER = os.environ.get('EMBEDDING_PROVIDER', 'vertex')
+VERTEX_EMBEDDING_MODEL = os.environ.get('VERTEX_EMBEDDING_MODEL', 'textembedding-gecko@latest')
+LOCAL_EMBEDDING_MODEL = os.environ.get('LOCAL_EMBEDDING_MODEL', 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.environ.get('LOCAL_EMBEDDING_BATCH_SIZE', 32))
+LOCAL_EMBEDDING_THREADS = int(os.environ.get('LOCAL_EMBEDDING_THREADS', 0)) or None
+LOCAL_EMBEDDING_BACKEND = os.environ.get('LOCAL_EMBEDDING_BACKEND', 'torch')
+
+# Affichage de la réponse au fil des tokens
+STREAMING_ENABLED = os.environ.get('STREAMING_ENABLED', 'true').lower() == 'true'
+
+# Régénération d'une réponse à partir du contexte déjà récupéré
+REGENERATE_TEMPERATURE = float(os.environ.get('REGENERATE_TEMPERATURE', 0.7))
+RETRIEVAL_CACHE_MAX_TURNS = int(os.environ.get('RETRIEVAL_CACHE_MAX_TURNS', 20))
+
+# Hedging du LLM : modèle de repli interrogé si aucun token n'est reçu après LLM_HEDGE_DELAY secondes (0 pour désactiver)
+LLM_FALLBACK_MODEL = os.environ.get('LLM_FALLBACK_MODEL', 'gemini-1.5-flash')
+LLM_HEDGE_DELAY = float(os.environ.get('LLM_HEDGE_DELAY', 0))
+
+# Routeur local : réponses fixes sans embedding ni LLM pour les salutations et questions non françaises
+QUERY_ROUTER_ENABLED = os.environ.get('QUERY_ROUTER_ENABLED', 'true').lower() == 'true'
+
+# Service HTTP de la chaîne QA (api.py). Si RAG_API_URL est renseignée, l'application Streamlit en est un simple client
+RAG_API_URL = os.environ.get('RAG_API_URL', '').rstrip('/')
+RAG_API_TIMEOUT = float(os.environ.get('RAG_API_TIMEOUT', 120))
+API_HOST = os.environ.get('API_HOST', '0.0.0.0')
+API_PORT = int(os.environ.get('API_PORT', 8000))
+
+# Contrôle d'admission devant la chaîne QA : requêtes en cours, file d'attente et délai d'attente (secondes)
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', 16))
+ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 32))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 3.0))
+
+# Préchauffage au démarrage (embedding, recherche et courte génération) avant d'accepter des requêtes
+WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', 'true').lower() == 'true'
+WARMUP_QUESTION = os.environ.get('WARMUP_QUESTION', "Quels sont les symptômes du cancer du sein ?")
+# Nouvelles tentatives après un échec de l'initialisation ou du préchauffage, sans limite de nombre :
+# attente initiale puis doublée jusqu'au maximum (secondes)
+WARMUP_RETRY_SECONDS = float(os.environ.get('WARMUP_RETRY_SECONDS', 5))
+WARMUP_RETRY_MAX_SECONDS = float(os.environ.get('WARMUP_RETRY_MAX_SECONDS', 300))
+# Questions fréquentes recherchées ensemble pendant le préchauffage (séparées par « | »)
+WARMUP_BATCH_QUESTIONS = [
+    question.strip()
+    for question in os.environ.get(
+        'WARMUP_BATCH_QUESTIONS',
+        "Qu'est-ce qu'une mammographie ?|Quels sont les traitements du cancer du sein ?|"
+        "Quels sont les effets secondaires de la chimiothérapie ?"
+    ).split('|')
+    if question.strip()
+]
+
+# Pool de connexions Cloud SQL partagé par le processus : taille, débordement, attente maximale (secondes),
+# recyclage des connexions (secondes) et vérification avant emprunt
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+
+# Échéance de bout en bout d'une requête (secondes, 0 pour aucune) et part maximale accordée
+# à l'embedding et à la recherche Cloud SQL ; la génération dispose du temps restant
+REQUEST_DEADLINE = float(os.environ.get('REQUEST_DEADLINE', 30))
+EMBEDDING_BUDGET_SHARE = float(os.environ.get('EMBEDDING_BUDGET_SHARE', 0.15))
+SEARCH_BUDGET_SHARE = float(os.environ.get('SEARCH_BUDGET_SHARE', 0.3))
+# Nouvelles tentatives après un échec, seulement s'il reste du budget
+DEPENDENCY_RETRIES = int(os.environ.get('DEPENDENCY_RETRIES', 1))
+
+# Disjoncteurs de Vertex AI et Cloud SQL : proportion d'échecs sur une fenêtre d'appels,
+# durée d'ouverture (secondes) et seuils de lenteur comptés comme échecs (secondes)
+CIRCUIT_FAILURE_RATE = float(os.environ.get('CIRCUIT_FAILURE_RATE', 0.5))
+CIRCUIT_MIN_CALLS = int(os.environ.get('CIRCUIT_MIN_CALLS', 5))
+CIRCUIT_WINDOW = int(os.environ.get('CIRCUIT_WINDOW', 20))
+CIRCUIT_OPEN_SECONDS = float(os.environ.get('CIRCUIT_OPEN_SECONDS', 30))
+EMBEDDING_SLOW_SECONDS = float(os.environ.get('EMBEDDING_SLOW_SECONDS', 2))
+CLOUD_SQL_SLOW_SECONDS = float(os.environ.get('CLOUD_SQL_SLOW_SECONDS', 3))
+LLM_SLOW_FIRST_TOKEN_SECONDS = float(os.environ.get('LLM_SLOW_FIRST_TOKEN_SECONDS', 10))
+
+# Exemples du prompt choisis par similarité avec la question : nombre maximal, budget en tokens et similarité minimale
+FEW_SHOT_DYNAMIC = os.environ.get('FEW_SHOT_DYNAMIC', 'true').lower() == 'true'
+FEW_SHOT_K = int(os.environ.get('FEW_SHOT_K', 2))
+FEW_SHOT_MAX_TOKENS = int(os.environ.get('FEW_SHOT_MAX_TOKENS', 450))
+FEW_SHOT_MIN_SIMILARITY = float(os.environ.get('FEW_SHOT_MIN_SIMILARITY', 0.0))
+# Nombre de vecteurs de questions récentes conservés (une question n'est vectorisée qu'une fois par requête)
+QUERY_EMBEDDING_CACHE_SIZE = int(os.environ.get('QUERY_EMBEDDING_CACHE_SIZE', 256))
+
+# Budget de génération (max_output_tokens) et structure de réponse selon le type de question
+ADAPTIVE_OUTPUT_BUDGET_ENABLED = os.environ.get('ADAPTIVE_OUTPUT_BUDGET_ENABLED', 'true').lower() == 'true'
+
+# Historique de conversation affiché : derniers échanges (question et réponse), les précédents à la demande
+CHAT_HISTORY_TURNS = int(os.environ.get('CHAT_HISTORY_TURNS', 10))
@@ -0,0 +1,106 @@
+import logging
+from typing import List, Optional
+
+from lib.reranker import estimate_tokens
+
+
+def find_overlap(left: str, right: str, min_overlap: int = 20, max_overlap: int = 400) -> int:
+    """
+    Retourne la longueur du plus long suffixe de `left` qui est aussi un préfixe de `right`.
+
+    Args:
+        left (str): Le premier texte.
+        right (str): Le texte qui pourrait lui faire suite.
+        min_overlap (int): La longueur minimale d'un chevauchement significatif.
+        max_overlap (int): La longueur maximale recherchée.
+
+    Returns:
+        int: La longueur du chevauchement, ou 0 s'il n'y en a pas.
+    """
+    for size in range(min(len(left), len(right), max_overlap), min_overlap - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _merge_pair(first: dict, second: dict, min_overlap: int) -> Optional[str]:
+    a, b = first["content"], second["content"]
+    if b in a:
+        return a
+    if a in b:
+        return b
+    overlap = find_overlap(a, b, min_overlap)
+    if overlap:
+        return a + b[overlap:]
+    overlap = find_overlap(b, a, min_overlap)
+    if overlap:
+        return b + a[overlap:]
+    return None
+
+
+def merge_overlapping_chunks(docs: List[dict], min_overlap: int = 20) -> List[dict]:
+    """
+    Fusionne les chunks d'une même source qui se chevauchent (chunk_overlap du découpage)
+    ou qui sont inclus les uns dans les autres.
+
+    Le document fusionné conserve les métadonnées et le meilleur score de similarité
+    de ses chunks, et la position du mieux classé.
+
+    Args:
+        docs (List[dict]): Les documents au format de `get_relevant_documents`, triés par pertinence.
+        min_overlap (int): La longueur minimale (en caractères) d'un chevauchement.
+
+    Returns:
+        List[dict]: Les documents fusionnés, dans l'ordre de pertinence.
+    """
+    merged: List[dict] = []
+    for doc in docs:
+        current = dict(doc)
+        position = len(merged)
+        i = 0
+        # Un chunk fusionné peut à son tour rejoindre un autre chunk de la même source
+        while i < len(merged):
+            other = merged[i]
+            content = None
+            if other["metadata"].get("source") == current["metadata"].get("source"):
+                content = _merge_pair(other, current, min_overlap)
+            if content is None:
+                i += 1
+                continue
+            best = other if other["similarity_score"] >= current["similarity_score"] else current
+            current = {**best, "content": content}
+            merged.pop(i)
+            position = min(position, i)
+            i = 0
+        merged.insert(position, current)
+    return merged
+
+
+def pack_context(docs: List[dict], max_tokens: int = 0, min_overlap: int = 20) -> List[dict]:
+    """
+    Prépare le contexte transmis au prompt : fusion des chunks qui se chevauchent,
+    puis sélection des documents dans l'ordre de pertinence jusqu'au budget de tokens.
+
+    Args:
+        docs (List[dict]): Les documents au format de `get_relevant_documents`.
+        max_tokens (int): Le budget de tokens du contexte (0 pour ne pas limiter).
+        min_overlap (int): La longueur minimale (en caractères) d'un chevauchement.
+
+    Returns:
+        List[dict]: Les documents à insérer dans le contexte.
+    """
+    merged = merge_overlapping_chunks(docs, min_overlap)
+
+    packed, tokens = [], 0
+    for doc in merged:
+        doc_tokens = estimate_tokens(doc["content"])
+        if max_tokens and packed and tokens + doc_tokens > max_tokens:
+            continue
+        packed.append(doc)
+        tokens += doc_tokens
+
+    tokens_before = sum(estimate_tokens(doc["content"]) for doc in docs)
+    logging.info(
+        f"Contexte : {len(docs)} chunks ({tokens_before} tokens) -> {len(packed)} documents ({tokens} tokens)"
+    )
+    return packed
@@ -0,0 +1,171 @@
+import time
+import logging
+import threading
+from collections import deque
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from langchain_google_cloud_sql_pg import PostgresEngine
+
+# La configuration du chatbot n'est importée que pour créer le pool : la préparation des données
+# (src/Data_preparation), qui a sa propre configuration, utilise aussi `get_index_embedding_model`
+
+
+class PoolMetrics:
+    """
+    Métriques du pool de connexions : emprunts, délais d'attente d'une connexion
+    et nouvelles connexions ouvertes (chacune paie la poignée de main du connecteur Cloud SQL).
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds: deque = deque(maxlen=1000)
+        self._lock = threading.Lock()
+
+    def record_checkout(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds.append(seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = sorted(self.wait_seconds)
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "p50_wait_ms": 1000 * waits[len(waits) // 2] if waits else 0.0,
+                "p95_wait_ms": 1000 * waits[int(len(waits) * 0.95)] if waits else 0.0,
+            }
+
+
+POOL_METRICS = PoolMetrics()
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """
+    Pool SQLAlchemy mesurant le temps d'attente de chaque emprunt de connexion.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            POOL_METRICS.record_checkout(time.perf_counter() - start, timed_out=True)
+            raise
+        POOL_METRICS.record_checkout(time.perf_counter() - start)
+        return connection
+
+
+_ENGINE: Optional[PostgresEngine] = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def get_engine() -> PostgresEngine:
+    """
+    Retourne la connexion Cloud SQL du processus, créée au premier appel.
+    Toutes les sessions et requêtes partagent son pool de connexions.
+    """
+    global _ENGINE
+    if _ENGINE is None:
+        from config import PROJECT_ID, REGION, INSTANCE, DATABASE, DB_USER, DB_PASSWORD
+        from lib.config import DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+
+        with _ENGINE_LOCK:
+            if _ENGINE is None:
+                logging.info(
+                    f"Création du pool de connexions Cloud SQL (taille {DB_POOL_SIZE}, débordement {DB_MAX_OVERFLOW})..."
+                )
+                _ENGINE = PostgresEngine.from_instance(
+                    project_id=PROJECT_ID,
+                    instance=INSTANCE,
+                    region=REGION,
+                    database=DATABASE,
+                    user=DB_USER,
+                    password=DB_PASSWORD,
+                    engine_args={
+                        "poolclass": MeteredQueuePool,
+                        "pool_size": DB_POOL_SIZE,
+                        "max_overflow": DB_MAX_OVERFLOW,
+                        "pool_timeout": DB_POOL_TIMEOUT,
+                        "pool_recycle": DB_POOL_RECYCLE,
+                        "pool_pre_ping": DB_POOL_PRE_PING,
+                    },
+                )
+    return _ENGINE
+
+
+# Requêtes SQL directes sur la connexion de PostgresEngine, qui n'expose pas d'API publique pour cela.
+# Seules ces fonctions utilisent ses attributs privés (`_pool`, `_run_as_async`, `_run_as_sync`),
+# vérifiés par tests/test_database.py pour la version figée dans requirements.txt (0.14.x).
+
+def get_async_engine(engine: PostgresEngine) -> AsyncEngine:
+    """
+    Retourne l'engine SQLAlchemy asynchrone (et son pool de connexions) de la connexion Cloud SQL.
+    """
+    return engine._pool
+
+
+async def _fetch_rows(engine: PostgresEngine, query: str, params: Optional[dict]) -> List[dict]:
+    async with get_async_engine(engine).connect() as conn:
+        result = await conn.execute(text(query), params or {})
+        return [dict(row) for row in result.mappings().fetchall()]
+
+
+async def fetch_all(engine: PostgresEngine, query: str, params: Optional[dict] = None) -> List[dict]:
+    """
+    Exécute une requête SQL sur la boucle de la connexion Cloud SQL et retourne ses lignes,
+    sans bloquer la boucle d'événements de l'appelant.
+    """
+    return await engine._run_as_async(_fetch_rows(engine, query, params))
+
+
+def fetch_all_sync(engine: PostgresEngine, query: str, params: Optional[dict] = None) -> List[dict]:
+    """
+    Exécute une requête SQL depuis du code synchrone et retourne ses lignes.
+    """
+    return engine._run_as_sync(_fetch_rows(engine, query, params))
+
+
+def pool_stats() -> dict:
+    """
+    Retourne l'utilisation du pool de connexions et les temps d'attente (vide si aucune connexion n'a été créée).
+    """
+    if _ENGINE is None:
+        return {}
+    from lib.config import DB_POOL_SIZE, DB_MAX_OVERFLOW
+
+    pool = get_async_engine(_ENGINE).pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+        "max_connections": DB_POOL_SIZE + DB_MAX_OVERFLOW,
+        **POOL_METRICS.stats(),
+    }
+
+
+def get_index_embedding_model(engine: PostgresEngine, table_name: str, default_model: str) -> Optional[str]:
+    """
+    Retourne le modèle d'embedding des chunks de la table (None si elle est vide). L'ingestion
+    refuse de mélanger deux modèles dans une table : un seul chunk est lu. Les chunks ingérés
+    avant l'enregistrement du modèle dans leurs métadonnées sont attribués à `default_model`.
+    """
+    rows = fetch_all_sync(
+        engine,
+        f"""
+        SELECT COALESCE(langchain_metadata->>'embedding_model', :default) AS model
+        FROM "{table_name}"
+        LIMIT 1
+        """,
+        {"default": default_model},
+    )
+    return rows[0]["model"] if rows else None
@@ -0,0 +1,157 @@
+import time
+import queue
+import asyncio
+import inspect
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """
+    Vectorise plusieurs requêtes en un seul appel `embed_documents`.
+
+    Avec VertexAIEmbeddings, le type de tâche RETRIEVAL_QUERY est conservé afin que
+    les vecteurs soient identiques à ceux de `embed_query`.
+    """
+    if isinstance(embeddings, EmbeddingMicroBatcher):
+        embeddings = embeddings.embeddings
+    if "embeddings_task_type" in inspect.signature(embeddings.embed_documents).parameters:
+        return embeddings.embed_documents(texts, embeddings_task_type="RETRIEVAL_QUERY")
+    return embeddings.embed_documents(texts)
+
+
+class EmbeddingMicroBatcher(Embeddings):
+    """
+    Regroupe les appels `embed_query` concurrents (toutes sessions confondues) en un seul
+    appel `embed_documents` au modèle d'embedding.
+
+    Les requêtes sont collectées pendant au plus `max_wait_ms` millisecondes, ou jusqu'à
+    `max_batch_size` requêtes, puis chaque appelant reçoit son propre vecteur.
+    Les documents (`embed_documents`) ne sont pas regroupés.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_wait_ms: float = 5, max_batch_size: int = 16):
+        self.embeddings = embeddings
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.requests = 0
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Les requêtes annulées entre-temps (appelant expiré ou abandonné) ne sont pas vectorisées ;
+            # les autres ne peuvent plus être annulées et seront toujours résolues
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            texts = [text for text, _ in batch]
+            try:
+                vectors = embed_queries(self.embeddings, texts)
+                if len(vectors) != len(batch):
+                    raise ValueError(f"{len(vectors)} vecteurs reçus pour {len(batch)} requêtes.")
+                for (_, future), vector in zip(batch, vectors):
+                    self._resolve(future, vector)
+            except Exception as e:
+                logging.error(f"Erreur lors de la vectorisation d'un lot de {len(batch)} requêtes : {e}")
+                for _, future in batch:
+                    self._resolve(future, error=e)
+
+            self.batches += 1
+            self.requests += len(batch)
+            if len(batch) > 1:
+                logging.info(f"Embeddings : {len(batch)} requêtes regroupées en un seul appel.")
+
+    @staticmethod
+    def _resolve(future: Future, vector: Optional[List[float]] = None, error: Optional[Exception] = None) -> None:
+        # Une erreur en résolvant un appelant ne doit jamais arrêter le thread de regroupement
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(vector)
+        except Exception as e:
+            logging.warning(f"Résultat d'embedding non transmis à un appelant : {e}")
+
+    def _submit(self, text: str) -> Future:
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._submit(text).result()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self._submit(text))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+
+class QueryEmbeddingCache(Embeddings):
+    """
+    Conserve les vecteurs des `max_size` dernières requêtes : une même question n'est
+    vectorisée qu'une fois pour le cache sémantique, la recherche et la sélection des
+    exemples du prompt. Les documents (`embed_documents`) ne sont pas conservés.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_size: int = 256):
+        self.embeddings = embeddings
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._vectors: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, text: str):
+        with self._lock:
+            vector = self._vectors.get(text)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._vectors.move_to_end(text)
+            self.hits += 1
+            return vector
+
+    def _put(self, text: str, vector: List[float]) -> List[float]:
+        with self._lock:
+            self._vectors[text] = vector
+            self._vectors.move_to_end(text)
+            while len(self._vectors) > self.max_size:
+                self._vectors.popitem(last=False)
+        return vector
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self._get(text)
+        return vector if vector is not None else self._put(text, self.embeddings.embed_query(text))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = self._get(text)
+        return vector if vector is not None else self._put(text, await self.embeddings.aembed_query(text))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
@@ -1,44 +1,71 @@
-import os
+from langchain_core.embeddings import Embeddings
 from langchain_google_cloud_sql_pg import PostgresVectorStore, PostgresEngine
 from langchain_google_vertexai import VertexAIEmbeddings
-from dotenv import load_dotenv
-from config import (
-    PROJECT_ID, 
-    REGION, 
-    INSTANCE, 
-    DATABASE, 
-    DB_USER
+from config import PROJECT_ID
+from lib.config import (
+    EMBEDDING_PROVIDER,
+    VERTEX_EMBEDDING_MODEL,
+    LOCAL_EMBEDDING_MODEL,
+    LOCAL_EMBEDDING_BATCH_SIZE,
+    LOCAL_EMBEDDING_THREADS,
+    LOCAL_EMBEDDING_BACKEND
 )
+from lib.local_embeddings import LocalEmbeddings
+from lib.database import get_engine, get_index_embedding_model
 
-load_dotenv()
-DB_PASSWORD = os.environ["DB_PASSWORD"]
+
+def get_embedding_model_id() -> str:
+    """
+    Returns the identifier of the configured embedding model, as recorded with the index.
+    The ingestion computes it the same way (`get_embedding_model_id` of Data_preparation/lib/embedding.py)
+    and stores it in the metadata of each chunk: both must stay in the same format.
+    """
+    if EMBEDDING_PROVIDER == "local":
+        return f"local:{LOCAL_EMBEDDING_MODEL}"
+    return f"vertex:{VERTEX_EMBEDDING_MODEL}"
 
 
-def get_embedding_model(logger) -> VertexAIEmbeddings:
+def get_embedding_model(logger) -> Embeddings:
     """
-    Retrieves VertexAI embeddings.
+    Retrieves the embedding model of the configured provider
+    (VertexAI, or a local sentence-transformers model on CPU).
     """
+    if EMBEDDING_PROVIDER == "local":
+        return LocalEmbeddings(
+            model_name=LOCAL_EMBEDDING_MODEL,
+            batch_size=LOCAL_EMBEDDING_BATCH_SIZE,
+            num_threads=LOCAL_EMBEDDING_THREADS,
+            backend=LOCAL_EMBEDDING_BACKEND,
+        )
     # Initialize VertexAIEmbeddings without directly passing project_id
-    embeddings = VertexAIEmbeddings(model_name="textembedding-gecko@latest", project=PROJECT_ID)
+    embeddings = VertexAIEmbeddings(model_name=VERTEX_EMBEDDING_MODEL, project=PROJECT_ID)
     return embeddings
-    
 
-def create_cloud_sql_database_connection() -> PostgresEngine:
 
-    engine = PostgresEngine.from_instance(
-        project_id=PROJECT_ID,
-        instance=INSTANCE,
-        region=REGION,
-        database=DATABASE,
-        user=DB_USER,
-        password=DB_PASSWORD,
-    )
+def check_index_embedding_model(engine: PostgresEngine, table_name: str = "MI_RAG") -> None:
+    """
+    Checks that the chunks of the table were embedded with the configured model.
+    Chunks ingested before the model was recorded are considered Vertex chunks.
 
-    return engine
+    Raises:
+        ValueError: If the index was built with another embedding model.
+    """
+    index_model = get_index_embedding_model(engine, table_name, f"vertex:{VERTEX_EMBEDDING_MODEL}")
+    model_id = get_embedding_model_id()
+    if index_model is not None and index_model != model_id:
+        raise ValueError(
+            f"The index {table_name} was built with {index_model}, but the configured embedding model is {model_id}."
+        )
+    
 
+def create_cloud_sql_database_connection() -> PostgresEngine:
+    """
+    Returns the process-wide Cloud SQL engine, whose connection pool is shared by all callers.
+    """
+    return get_engine()
 
 
-async def get_vector_store(engine: PostgresEngine, embedding: VertexAIEmbeddings) -> PostgresVectorStore:
+async def get_vector_store(engine: PostgresEngine, embedding: Embeddings) -> PostgresVectorStore:
 
     vector_store = PostgresVectorStore.create_sync(
         engine=engine,
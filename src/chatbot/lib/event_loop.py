@@ -0,0 +1,56 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Boucle asyncio unique du processus, exécutée dans un thread d'arrière-plan
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_THREAD: Optional[threading.Thread] = None
+_LOCK = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Retourne la boucle asyncio du processus, en la démarrant au premier appel.
+
+    Les clients et connexions asynchrones créés sur cette boucle restent utilisables
+    d'une interaction à l'autre, contrairement à ceux créés par `asyncio.run`.
+    """
+    global _LOOP, _THREAD
+    if _LOOP is None:
+        with _LOCK:
+            if _LOOP is None:
+                loop = asyncio.new_event_loop()
+                _THREAD = threading.Thread(target=loop.run_forever, name="chatbot-event-loop", daemon=True)
+                _THREAD.start()
+                _LOOP = loop
+                logging.info("Boucle asyncio d'arrière-plan démarrée.")
+    return _LOOP
+
+
+def submit(coro: Awaitable[T]) -> "Future[T]":
+    """
+    Soumet une coroutine à la boucle d'arrière-plan sans attendre son résultat.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+
+
+def run_async(coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """
+    Exécute une coroutine sur la boucle d'arrière-plan et attend son résultat.
+    À utiliser depuis du code synchrone (script ou callbacks Streamlit).
+
+    Args:
+        coro (Awaitable[T]): La coroutine à exécuter.
+        timeout (Optional[float]): Le temps d'attente maximal en secondes.
+
+    Returns:
+        T: Le résultat de la coroutine.
+    """
+    if threading.current_thread() is _THREAD:
+        coro.close()
+        raise RuntimeError("run_async ne peut pas être appelé depuis la boucle d'arrière-plan : utilisez await.")
+    return submit(coro).result(timeout)
@@ -10,12 +10,34 @@ FEEDBACK_FILE = "feedbacks.csv"
 # En-têtes du fichier CSV
 CSV_HEADERS = [
     "timestamp", "nature_feedback", "question", "reponse", 
-    "feedback_text", "duree_reponse", "nombre_etoiles"
+    "feedback_text", "duree_reponse", "nombre_etoiles", "duree_premier_token"
 ]
 
-def save_feedback(question: str, reponse: str, feedback_text: str, duree_reponse: float, nombre_etoiles: int):
+@st.cache_resource(show_spinner=False)
+def migrate_feedback_file():
+    """
+    Ajoute les colonnes manquantes (ex : `duree_premier_token`) à un fichier de feedbacks existant.
+    Appelée au démarrage de l'application, une seule fois par processus.
+    """
+    if not os.path.exists(FEEDBACK_FILE):
+        return
+    with open(FEEDBACK_FILE, mode="r", newline="", encoding="utf-8") as file:
+        rows = list(csv.reader(file))
+    if not rows or rows[0] == CSV_HEADERS:
+        return
+    missing = len(CSV_HEADERS) - len(rows[0])
+    if missing <= 0:
+        return
+    with open(FEEDBACK_FILE, mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_HEADERS)
+        for row in rows[1:]:
+            writer.writerow(row + [""] * missing)
+
+def save_feedback(question: str, reponse: str, feedback_text: str, duree_reponse: float, nombre_etoiles: int, duree_premier_token: float = 0):
     """
     Sauvegarde le feedback dans un fichier CSV.
+    `duree_reponse` est la durée totale de génération et `duree_premier_token` le temps jusqu'au premier token.
     """
     if nombre_etoiles in [1, 2]:
         nature_feedback = "negative"
@@ -38,7 +60,8 @@ def save_feedback(question: str, reponse: str, feedback_text: str, duree_reponse
             reponse,
             feedback_text,
             duree_reponse,
-            nombre_etoiles
+            nombre_etoiles,
+            duree_premier_token
         ])
 
 def load_feedbacks():
@@ -0,0 +1,148 @@
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.example_selectors import BaseExampleSelector
+
+from lib.reranker import estimate_tokens
+
+# Exemples questions-réponses du prompt, dont seuls les plus proches de la question sont envoyés au LLM
+FEW_SHOT_EXAMPLES: List[Dict[str, str]] = [
+    {
+        "question": "Quels sont les symptômes du cancer du sein ?",
+        "answer": """Le cancer du sein peut se manifester par différents symptômes. Voici les principaux signes à surveiller :
+- **Points clés** :
+  - Une masse ou une grosseur dans le sein ou sous l'aisselle.
+  - Des changements de la peau du sein, comme une rougeur, une peau d'orange ou une desquamation.
+  - Des écoulements anormaux du mamelon (sang ou liquide).
+  - Une rétraction du mamelon ou une modification de sa forme.
+  - Une douleur persistante dans le sein ou le mamelon.
+**Conclusion** : Si vous remarquez l'un de ces symptômes, il est important de consulter un médecin pour un examen approfondi. Ces signes ne signifient pas nécessairement un cancer, mais un diagnostic précoce est essentiel.""",
+    },
+    {
+        "question": "Quels sont les facteurs de risque du cancer du sein ?",
+        "answer": """Plusieurs facteurs peuvent augmenter le risque de développer un cancer du sein. Voici les principaux éléments à prendre en compte :
+- **Points clés** :
+  - **Âge** : Le risque augmente avec l'âge, en particulier après 50 ans.
+  - **Antécédents familiaux** : Avoir un parent proche (mère, sœur, fille) atteint de cancer du sein augmente le risque.
+  - **Mutations génétiques** : Les mutations des gènes BRCA1 et BRCA2 sont associées à un risque accru.
+  - **Facteurs hormonaux** : Une exposition prolongée aux œstrogènes (ménopause tardive, premières règles précoces) peut augmenter le risque.
+  - **Mode de vie** : L'obésité, la consommation d'alcool et le manque d'activité physique sont des facteurs de risque modifiables.
+**Conclusion** : Bien que certains facteurs ne puissent pas être modifiés, un mode de vie sain et un dépistage régulier peuvent réduire le risque. Parlez à votre médecin des options de dépistage adaptées à votre situation.""",
+    },
+    {
+        "question": "What are the symptoms of breast cancer?",
+        "answer": "Je suis désolé, je ne peux répondre qu'en français. Veuillez reformuler votre question en français.",
+    },
+    {
+        "question": "Quels sont les traitements disponibles pour le cancer du sein ?",
+        "answer": """Le traitement du cancer du sein dépend du stade de la maladie, du type de cancer et de l'état de santé général du patient. Voici les options principales :
+- **Points clés** :
+  - **Chirurgie** : Pour enlever la tumeur (tumorectomie) ou le sein entier (mastectomie).
+  - **Radiothérapie** : Utilisée pour détruire les cellules cancéreuses restantes après la chirurgie.
+  - **Chimiothérapie** : Médicaments pour tuer les cellules cancéreuses ou empêcher leur croissance.
+  - **Hormonothérapie** : Pour les cancers sensibles aux hormones, afin de bloquer leur action.
+  - **Thérapie ciblée** : Médicaments qui ciblent des caractéristiques spécifiques des cellules cancéreuses.
+  - **Immunothérapie** : Pour stimuler le système immunitaire à combattre le cancer.
+**Conclusion** : Le choix du traitement est personnalisé et doit être discuté avec un oncologue. Une combinaison de ces traitements est souvent utilisée pour maximiser l'efficacité.""",
+    },
+    {
+        "question": "Comment se déroule le dépistage du cancer du sein ?",
+        "answer": """Le dépistage du cancer du sein est essentiel pour détecter la maladie à un stade précoce. Voici les principales méthodes utilisées :
+- **Points clés** :
+  - **Mammographie** : Examen radiologique recommandé tous les 2 ans pour les femmes de 50 à 74 ans.
+  - **Examen clinique des seins** : Réalisé par un médecin pour détecter des anomalies.
+  - **Auto-examen des seins** : Permet de surveiller les changements dans la texture ou l'apparence des seins.
+  - **IRM mammaire** : Utilisée pour les femmes à haut risque (par exemple, porteuses de mutations génétiques).
+**Conclusion** : Un dépistage régulier peut sauver des vies en détectant le cancer à un stade précoce. Parlez à votre médecin du calendrier de dépistage adapté à votre situation.""",
+    },
+    {
+        "question": "How is breast cancer treated?",
+        "answer": "Je suis désolé, je ne peux répondre qu'en français. Veuillez reformuler votre question en français.",
+    },
+]
+
+
+def example_tokens(example: Dict[str, str]) -> int:
+    return estimate_tokens(example["question"]) + estimate_tokens(example["answer"])
+
+
+class EmbeddingExampleSelector(BaseExampleSelector):
+    """
+    Sélectionne les exemples du prompt les plus proches de la question (similarité cosinus
+    entre la question et celles des exemples) : au plus `k` exemples, dans la limite de
+    `max_tokens` tokens et au-dessus de `min_similarity`.
+
+    Les vecteurs des exemples sont calculés une seule fois (`aprepare`, au démarrage).
+    La question est vectorisée avec le modèle des requêtes : avec `QueryEmbeddingCache`,
+    son vecteur est celui déjà calculé pour la recherche.
+    """
+
+    def __init__(
+        self,
+        examples: List[Dict[str, str]],
+        embeddings: Embeddings,
+        k: int = 2,
+        max_tokens: int = 450,
+        min_similarity: float = 0.0,
+    ):
+        self.examples = list(examples)
+        self.embeddings = embeddings
+        self.k = k
+        self.max_tokens = max_tokens
+        self.min_similarity = min_similarity
+        self._vectors: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _set_vectors(self, vectors) -> None:
+        with self._lock:
+            self._vectors = self._normalize(vectors)
+
+    def prepare(self) -> None:
+        """
+        Calcule les vecteurs des exemples.
+        """
+        self._set_vectors(self.embeddings.embed_documents([example["question"] for example in self.examples]))
+
+    async def aprepare(self) -> None:
+        """
+        Calcule les vecteurs des exemples, de manière asynchrone.
+        """
+        self._set_vectors(await self.embeddings.aembed_documents([example["question"] for example in self.examples]))
+
+    def add_example(self, example: Dict[str, str]) -> None:
+        with self._lock:
+            self.examples.append(example)
+            self._vectors = None
+
+    def _select(self, query_vector: List[float]) -> List[Dict[str, str]]:
+        with self._lock:
+            vectors, examples = self._vectors, list(self.examples)
+        scores = vectors @ self._normalize(query_vector)
+        selected, tokens = [], 0
+        for index in np.argsort(-scores):
+            if len(selected) >= self.k or scores[index] < self.min_similarity:
+                break
+            cost = example_tokens(examples[index])
+            if tokens + cost > self.max_tokens:
+                break
+            selected.append(examples[index])
+            tokens += cost
+        return selected
+
+    def select_examples(self, input_variables: Dict[str, str]) -> List[Dict[str, str]]:
+        if self._vectors is None:
+            self.prepare()
+        return self._select(self.embeddings.embed_query(input_variables["question"]))
+
+    async def aselect_examples(self, input_variables: Dict[str, str]) -> List[Dict[str, str]]:
+        if self._vectors is None:
+            await self.aprepare()
+        return self._select(await self.embeddings.aembed_query(input_variables["question"]))
@@ -0,0 +1,229 @@
+import re
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel, agenerate_from_stream
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import Field
+
+from lib.event_loop import run_async
+from lib.hedging import astream_model
+from lib.lexical_index import fold_accents
+from lib.reranker import estimate_tokens
+
+# Structure de réponse par défaut, celle des exemples du prompt
+STRUCTURED_FORMAT = """Structurez votre réponse de la manière suivante :
+       - **Introduction** : Donnez une brève introduction pour contextualiser la réponse.
+       - **Points clés** : Utilisez des puces ou des numéros pour lister les informations importantes.
+       - **Conclusion** : Résumez les points essentiels et, si nécessaire, donnez des recommandations ou des conseils."""
+
+
+@dataclass(frozen=True)
+class QuestionClass:
+    """
+    Type de question : budget de génération et structure de réponse demandée au LLM.
+    """
+    name: str
+    max_output_tokens: int
+    response_format: str
+
+
+QUESTION_CLASSES: Dict[str, QuestionClass] = {
+    "definition": QuestionClass(
+        "definition",
+        400,
+        "Donnez une définition claire en 3 à 5 phrases, puis au plus trois points clés si cela aide à comprendre.",
+    ),
+    "list": QuestionClass("list", 716, STRUCTURED_FORMAT),
+    "comparison": QuestionClass(
+        "comparison",
+        600,
+        "Comparez les options point par point (ressemblances puis différences), puis concluez en une ou deux phrases.",
+    ),
+    "follow_up": QuestionClass(
+        "follow_up",
+        256,
+        "Répondez directement et brièvement, en 2 à 4 phrases, sans introduction ni conclusion.",
+    ),
+    "general": QuestionClass("general", 600, STRUCTURED_FORMAT),
+}
+
+# Motifs sur le texte en minuscules et sans accents, testés dans cet ordre
+CLASS_PATTERNS = [
+    ("comparison", re.compile(
+        r"\b(difference|differences|differencier|compar\w*|versus|vs|plutot que|mieux que|ou bien)\b"
+    )),
+    ("definition", re.compile(
+        r"^(qu ?est[ -]ce qu|c ?est quoi|que (veut dire|signifie)|definition|definis|definir)|\bsignifie\b"
+    )),
+    ("list", re.compile(
+        r"\b(quels|quelles) sont\b|\b(liste|symptomes|signes|traitements|facteurs|causes|types|etapes|"
+        r"effets secondaires|options|examens|moyens)\b"
+    )),
+    ("follow_up", re.compile(
+        r"^(et|mais|donc|alors|est[ -]ce que|est[ -]ce grave|c ?est grave|peut[ -]on|faut[ -]il|dois[ -]je)\b"
+        r"|\b(ca|cela|celui[ -]ci|celle[ -]ci)\b"
+        # Question fermée à sujet inversé (« est-elle », « touche-t-il »), sauf après un mot interrogatif
+        r"|^(?!.*\b(pourquoi|comment|quand|combien|quel\w*|lequel|laquelle|lesquel\w*)\b)"
+        r".*\b\w+-(t-)?(il|elle|ils|elles|on|je)\b"
+    )),
+]
+
+
+def classify_question(question: str) -> QuestionClass:
+    """
+    Classe une question (définition, liste, comparaison, question de suivi ou générale)
+    à partir de sa formulation, sans appel à un modèle.
+    """
+    text = re.sub(r"[’'\s]+", " ", fold_accents(question)).strip()
+    for name, pattern in CLASS_PATTERNS:
+        if pattern.search(text):
+            return QUESTION_CLASSES[name]
+    # Les questions très courtes sont le plus souvent des précisions sur la réponse précédente
+    if len(text.split()) <= 4:
+        return QUESTION_CLASSES["follow_up"]
+    return QUESTION_CLASSES["general"]
+
+
+_QUESTION_CLASS: ContextVar[Optional[QuestionClass]] = ContextVar("question_class", default=None)
+
+
+@contextmanager
+def question_class_scope(question: str) -> Iterator[QuestionClass]:
+    """
+    Classe la question et fixe sa classe pour la requête en cours : le prompt et le LLM
+    (`BudgetedChatModel`) l'utilisent pour la structure et la longueur de la réponse.
+    """
+    question_class = classify_question(question)
+    token = _QUESTION_CLASS.set(question_class)
+    try:
+        yield question_class
+    finally:
+        _QUESTION_CLASS.reset(token)
+
+
+def current_response_format() -> str:
+    """
+    Retourne la structure de réponse de la classe de la requête en cours
+    (la structure par défaut hors `question_class_scope`).
+    """
+    question_class = _QUESTION_CLASS.get()
+    return question_class.response_format if question_class is not None else STRUCTURED_FORMAT
+
+
+def current_question_class(question: Optional[str] = None) -> Optional[QuestionClass]:
+    """
+    Retourne la classe de la requête en cours ou, à défaut, celle de `question`.
+    """
+    question_class = _QUESTION_CLASS.get()
+    if question_class is None and question is not None:
+        return classify_question(question)
+    return question_class
+
+
+class GenerationStats:
+    """
+    Longueur des réponses et durée de génération par classe de question, pour ajuster les budgets.
+    """
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._truncated: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, question_class: QuestionClass, output_tokens: int, seconds: float) -> None:
+        truncated = output_tokens >= 0.95 * question_class.max_output_tokens
+        with self._lock:
+            self._samples.setdefault(question_class.name, deque(maxlen=self.window)).append((output_tokens, seconds))
+            self._truncated[question_class.name] = self._truncated.get(question_class.name, 0) + truncated
+        logging.info(
+            f"Génération [{question_class.name}] : ~{output_tokens} tokens en {seconds:.2f}s "
+            f"(budget {question_class.max_output_tokens}{', atteint' if truncated else ''})."
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+            truncated = dict(self._truncated)
+        result = {}
+        for name, values in samples.items():
+            tokens = sorted(output_tokens for output_tokens, _ in values)
+            seconds = sorted(duration for _, duration in values)
+            result[name] = {
+                "calls": len(values),
+                "truncated": truncated.get(name, 0),
+                "max_output_tokens": QUESTION_CLASSES[name].max_output_tokens,
+                "p50_output_tokens": tokens[len(tokens) // 2],
+                "p95_output_tokens": tokens[int(len(tokens) * 0.95)],
+                "p50_latency_ms": 1000 * seconds[len(seconds) // 2],
+                "p95_latency_ms": 1000 * seconds[int(len(seconds) * 0.95)],
+            }
+        return result
+
+
+GENERATION_STATS = GenerationStats()
+
+
+class BudgetedChatModel(BaseChatModel):
+    """
+    Limite la génération au budget de la classe de la question en cours
+    (`question_class_scope`) et mesure la longueur et la durée de chaque réponse.
+    Sans classe fixée, le modèle garde son propre `max_output_tokens`.
+    """
+
+    model: BaseChatModel
+    stats: GenerationStats = Field(default_factory=lambda: GENERATION_STATS, exclude=True)
+
+    @property
+    def _llm_type(self) -> str:
+        return "budgeted-chat-model"
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        question_class = current_question_class()
+        if question_class is not None:
+            # Argument direct pour les versions récentes de langchain-google-genai ; les versions 2.x
+            # ne lisent que `generation_config`, qui est donc aussi renseigné
+            kwargs["max_output_tokens"] = question_class.max_output_tokens
+            kwargs["generation_config"] = {
+                **(kwargs.get("generation_config") or {}),
+                "max_output_tokens": question_class.max_output_tokens,
+            }
+        start = time.perf_counter()
+        output = ""
+        async for chunk in astream_model(self.model, messages, stop, **kwargs):
+            output += chunk.text
+            yield chunk
+        if question_class is not None:
+            self.stats.record(question_class, estimate_tokens(output), time.perf_counter() - start)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return await agenerate_from_stream(self._astream(messages, stop=stop, **kwargs))
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return run_async(self._agenerate(messages, stop=stop, **kwargs))
@@ -0,0 +1,143 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel, agenerate_from_stream
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import Field
+
+from lib.event_loop import run_async
+
+
+@dataclass
+class HedgeStats:
+    """
+    Métriques cumulées des requêtes LLM couvertes (hedging).
+    """
+    calls: int = 0
+    hedged: int = 0
+    primary_wins: int = 0
+    fallback_wins: int = 0
+    first_token_seconds: deque = field(default_factory=lambda: deque(maxlen=1000))
+
+    def as_dict(self) -> dict:
+        latencies = sorted(self.first_token_seconds)
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "primary_wins": self.primary_wins,
+            "fallback_wins": self.fallback_wins,
+            "p50_first_token_ms": 1000 * latencies[len(latencies) // 2] if latencies else 0.0,
+            "p95_first_token_ms": 1000 * latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+        }
+
+
+async def astream_model(
+    model: BaseChatModel, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any
+) -> AsyncIterator[ChatGenerationChunk]:
+    # Les méthodes privées sont appelées directement : seul le modèle couvert émet les
+    # callbacks, pour ne pas dupliquer les tokens dans `astream_events`
+    try:
+        async for chunk in model._astream(messages, stop=stop, **kwargs):
+            yield chunk
+    except NotImplementedError:
+        result = await model._agenerate(messages, stop=stop, **kwargs)
+        message = result.generations[0].message
+        yield ChatGenerationChunk(message=AIMessageChunk(content=message.content))
+
+
+class HedgedChatModel(BaseChatModel):
+    """
+    Couvre un modèle principal par un modèle de repli plus rapide.
+
+    Si le modèle principal n'a produit aucun token après `hedge_delay` secondes (ou a
+    échoué), la même requête est envoyée au modèle de repli ; le premier des deux à
+    produire un token est conservé et l'autre requête est annulée.
+    """
+
+    primary: BaseChatModel
+    fallback: BaseChatModel
+    hedge_delay: float = 5.0
+    stats: HedgeStats = Field(default_factory=HedgeStats, exclude=True)
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged-chat-model"
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        start = time.perf_counter()
+        self.stats.calls += 1
+        streams = {"primary": astream_model(self.primary, messages, stop, **kwargs)}
+        tasks = {asyncio.ensure_future(anext(streams["primary"])): "primary"}
+
+        winner, first_chunk, error = None, None, None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+            if not done or next(iter(done)).exception() is not None:
+                logging.info(
+                    f"Hedging : pas de token du modèle principal après {time.perf_counter() - start:.2f}s, "
+                    "envoi de la requête au modèle de repli."
+                )
+                self.stats.hedged += 1
+                streams["fallback"] = astream_model(self.fallback, messages, stop, **kwargs)
+                tasks[asyncio.ensure_future(anext(streams["fallback"]))] = "fallback"
+
+            pending = set(tasks)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner, first_chunk = tasks[task], task.result()
+                        break
+                    error = task.exception()
+                    logging.warning(f"Hedging : échec du modèle {tasks[task]} : {error}")
+        finally:
+            losers = [task for task, name in tasks.items() if name != winner]
+            for task in losers:
+                task.cancel()
+            await asyncio.gather(*losers, return_exceptions=True)
+            for name, stream in streams.items():
+                if name != winner:
+                    await stream.aclose()
+
+        if winner is None:
+            raise error
+        elapsed = time.perf_counter() - start
+        self.stats.first_token_seconds.append(elapsed)
+        if winner == "primary":
+            self.stats.primary_wins += 1
+        else:
+            self.stats.fallback_wins += 1
+            logging.info(f"Hedging : réponse du modèle de repli retenue (premier token après {elapsed:.2f}s).")
+
+        yield first_chunk
+        async for chunk in streams[winner]:
+            yield chunk
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return await agenerate_from_stream(self._astream(messages, stop=stop, **kwargs))
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return run_async(self._agenerate(messages, stop=stop, **kwargs))
@@ -0,0 +1,233 @@
+import re
+import math
+import time
+import logging
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+# Mots vides français (sous forme sans accents, après normalisation)
+FRENCH_STOP_WORDS = {
+    "a", "au", "aux", "avec", "ce", "ces", "c", "d", "dans", "de", "des", "du", "elle", "en",
+    "est", "et", "etre", "eux", "il", "ils", "j", "je", "l", "la", "le", "les", "leur", "lui",
+    "m", "ma", "mais", "me", "meme", "mes", "moi", "mon", "n", "ne", "nos", "notre", "nous",
+    "on", "ou", "par", "pas", "pour", "qu", "que", "quel", "quelle", "quelles", "quels", "qui",
+    "s", "sa", "sans", "se", "ses", "son", "sont", "sur", "t", "ta", "te", "tes", "toi", "ton",
+    "tu", "un", "une", "vos", "votre", "vous", "y", "quoi", "comment",
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def fold_accents(text: str) -> str:
+    """
+    Supprime les accents et met le texte en minuscules ("Tumorectomie" -> "tumorectomie").
+    """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Découpe un texte français en termes normalisés : accents supprimés, élisions
+    ("l'", "d'", "qu'") et mots vides retirés, pluriels simples ramenés au singulier.
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(fold_accents(text)):
+        if token in FRENCH_STOP_WORDS:
+            continue
+        if len(token) > 4 and token[-1] in "sx" and not token[-2].isdigit():
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = 60) -> List[Tuple[Hashable, float]]:
+    """
+    Fusionne plusieurs classements par Reciprocal Rank Fusion.
+
+    Args:
+        rankings (Sequence[Sequence[Hashable]]): Les classements (clés triées par pertinence).
+        k (int): La constante de lissage de RRF.
+
+    Returns:
+        List[Tuple[Hashable, float]]: Les clés et leur score RRF, triées par score décroissant.
+    """
+    scores: Dict[Hashable, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] += 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """
+    Index inversé BM25 en mémoire sur le contenu des chunks de MI_RAG.
+    Les chunks sont ajoutés et retirés de manière incrémentale : un chunk retiré garde
+    sa position (ses postings sont supprimés), pour que les positions déjà retournées
+    par `search` restent valides.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids: List[str] = []
+        self.contents: List[str] = []
+        self.metadatas: List[dict] = []
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.doc_lengths: List[int] = []
+        self.total_length = 0
+        self._positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def add_documents(self, rows: Sequence[dict]) -> int:
+        """
+        Ajoute à l'index les chunks qui n'y sont pas encore.
+
+        Args:
+            rows (Sequence[dict]): Lignes avec les clés `langchain_id`, `content` et `langchain_metadata`.
+
+        Returns:
+            int: Le nombre de chunks ajoutés.
+        """
+        added = 0
+        with self._lock:
+            for row in rows:
+                doc_id = str(row["langchain_id"])
+                if doc_id in self._positions:
+                    continue
+                position = len(self.ids)
+                terms = Counter(tokenize(row["content"]))
+                for term, frequency in terms.items():
+                    self.postings[term][position] = frequency
+                length = sum(terms.values())
+                self.ids.append(doc_id)
+                self.contents.append(row["content"])
+                self.metadatas.append(row.get("langchain_metadata") or {})
+                self.doc_lengths.append(length)
+                self.total_length += length
+                self._positions[doc_id] = position
+                added += 1
+        if added:
+            logging.info(f"Index lexical : {added} chunks ajoutés ({len(self)} au total).")
+        return added
+
+    def remove_documents(self, doc_ids: Sequence[str]) -> int:
+        """
+        Retire de l'index les chunks donnés : ils ne sont plus retournés par `search`.
+
+        Args:
+            doc_ids (Sequence[str]): Les identifiants (`langchain_id`) des chunks à retirer.
+
+        Returns:
+            int: Le nombre de chunks retirés.
+        """
+        removed = 0
+        with self._lock:
+            for doc_id in doc_ids:
+                position = self._positions.pop(str(doc_id), None)
+                if position is None:
+                    continue
+                for term in set(tokenize(self.contents[position])):
+                    postings = self.postings.get(term)
+                    if postings is not None:
+                        postings.pop(position, None)
+                        if not postings:
+                            del self.postings[term]
+                self.total_length -= self.doc_lengths[position]
+                removed += 1
+        if removed:
+            logging.info(f"Index lexical : {removed} chunks retirés ({len(self)} au total).")
+        return removed
+
+    def sync_documents(self, rows: Sequence[dict]) -> None:
+        """
+        Aligne l'index sur le contenu complet de la table : les chunks supprimés ou modifiés
+        sont retirés, puis les chunks nouveaux ou modifiés sont ajoutés.
+
+        Args:
+            rows (Sequence[dict]): Toutes les lignes de la table, au format de `add_documents`.
+        """
+        current = {str(row["langchain_id"]): row for row in rows}
+        with self._lock:
+            stale = [
+                doc_id
+                for doc_id, position in self._positions.items()
+                if doc_id not in current
+                or current[doc_id]["content"] != self.contents[position]
+                or (current[doc_id].get("langchain_metadata") or {}) != self.metadatas[position]
+            ]
+        self.remove_documents(stale)
+        self.add_documents(rows)
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[int, float]]:
+        """
+        Retourne les positions et scores BM25 des k chunks les plus pertinents.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._positions)
+            if not count or not terms:
+                return []
+            average_length = self.total_length / count
+            scores: Dict[int, float] = defaultdict(float)
+            for term in terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for position, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[position] / average_length)
+                    scores[position] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def term_coverage(self, query: str, position: int) -> float:
+        """
+        Retourne la part des termes de la requête présents dans un chunk (entre 0 et 1).
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return 0.0
+        with self._lock:
+            return sum(position in self.postings.get(term, {}) for term in terms) / len(terms)
+
+    def is_confident(self, query: str, results: Sequence[Tuple[int, float]], min_margin: float) -> bool:
+        """
+        Indique si le meilleur résultat lexical est assez sûr pour se passer de la recherche vectorielle :
+        il contient tous les termes de la requête et devance nettement le second.
+        """
+        if not results or min_margin <= 0:
+            return False
+        best_position, best_score = results[0]
+        if self.term_coverage(query, best_position) < 1:
+            return False
+        return len(results) == 1 or best_score >= min_margin * results[1][1]
+
+    def get(self, position: int) -> Tuple[str, str, dict]:
+        """
+        Retourne l'identifiant, le contenu et les métadonnées d'un chunk.
+        """
+        return self.ids[position], self.contents[position], self.metadatas[position]
+
+    def start_background_refresh(self, loader: Callable[[], Sequence[dict]], interval: float) -> None:
+        """
+        Aligne périodiquement l'index sur la table (`sync_documents`), dans un thread en arrière-plan.
+        """
+        if self._refresh_thread is not None or interval <= 0:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sync_documents(loader())
+                except Exception as e:
+                    logging.error(f"Erreur lors de la mise à jour de l'index lexical : {e}")
+
+        self._refresh_thread = threading.Thread(target=run, daemon=True)
+        self._refresh_thread.start()
@@ -0,0 +1,82 @@
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+# Modèles déjà chargés, partagés par toutes les instances du processus
+_MODELS: Dict[str, object] = {}
+_MODELS_LOCK = threading.Lock()
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    Embeddings calculés localement sur CPU avec un modèle sentence-transformers
+    (backend PyTorch ou ONNX). Le modèle est chargé une seule fois par processus
+    et l'inférence est faite par lots. Utilisé aussi par la préparation des données
+    (src/Data_preparation), qui doit produire les mêmes vecteurs.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+        batch_size: int = 32,
+        num_threads: Optional[int] = None,
+        backend: str = "torch",
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.backend = backend
+
+    @property
+    def model(self):
+        key = f"{self.backend}:{self.model_name}"
+        if key not in _MODELS:
+            with _MODELS_LOCK:
+                if key not in _MODELS:
+                    from sentence_transformers import SentenceTransformer
+                    logging.info(f"Chargement du modèle d'embedding local {self.model_name} ({self.backend})...")
+                    _MODELS[key] = SentenceTransformer(
+                        self.model_name, device="cpu", backend=self.backend, model_kwargs=self._model_kwargs()
+                    )
+        return _MODELS[key]
+
+    def _model_kwargs(self) -> Optional[dict]:
+        """
+        Options de chargement du modèle : nombre de threads de PyTorch, ou session
+        ONNX Runtime sur CPU (PyTorch n'est alors pas utilisé pour l'inférence).
+        """
+        if self.backend == "onnx":
+            import onnxruntime
+            session_options = onnxruntime.SessionOptions()
+            if self.num_threads:
+                session_options.intra_op_num_threads = self.num_threads
+                session_options.inter_op_num_threads = 1
+            return {"provider": "CPUExecutionProvider", "session_options": session_options}
+        if self.num_threads:
+            import torch
+            torch.set_num_threads(self.num_threads)
+        return None
+
+    @property
+    def dimension(self) -> int:
+        """
+        Taille des vecteurs produits par le modèle.
+        """
+        return self.model.get_sentence_embedding_dimension()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
@@ -1,14 +1,16 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema.runnable import RunnableLambda
+from lib.hedging import HedgedChatModel
 
 
-def get_llm(max_output_tokens: int = 512, temp: float = 0.1):
+def get_llm(max_output_tokens: int = 512, temp: float = 0.1, max_retries: int = 2):
     """
     Retourne un modèle de langage (LLM) configuré.
 
     Args:
         max_output_tokens (int): Le nombre maximum de tokens pour la réponse.
         temp (float): Le paramètre de température pour le LLM.
+        max_retries (int): Le nombre de nouvelles tentatives du client en cas d'échec.
 
     Returns:
         Un modèle de langage compatible avec LangChain.
@@ -18,6 +20,39 @@ def get_llm(max_output_tokens: int = 512, temp: float = 0.1):
         temperature=temp,
         max_output_tokens=max_output_tokens,
         timeout=None,
-        max_retries=2,
+        max_retries=max_retries,
+    )
+    return llm
+
+def get_hedged_llm(
+    max_output_tokens: int = 512,
+    temp: float = 0.1,
+    fallback_model: str = "gemini-1.5-flash",
+    hedge_delay: float = 5.0,
+    max_retries: int = 2,
+):
+    """
+    Retourne le LLM de `get_llm`, couvert par un modèle de repli plus rapide.
+
+    Args:
+        max_output_tokens (int): Le nombre maximum de tokens pour la réponse.
+        temp (float): Le paramètre de température pour le LLM.
+        fallback_model (str): Le modèle interrogé si le principal est trop lent.
+        hedge_delay (float): Le délai (en secondes) sans premier token avant d'interroger le modèle de repli.
+        max_retries (int): Le nombre de nouvelles tentatives du client du modèle principal.
+
+    Returns:
+        Un modèle de langage compatible avec LangChain.
+    """
+    fallback = ChatGoogleGenerativeAI(
+        model=fallback_model,
+        temperature=temp,
+        max_output_tokens=max_output_tokens,
+        timeout=None,
+        max_retries=0,
+    )
+    return HedgedChatModel(
+        primary=get_llm(max_output_tokens=max_output_tokens, temp=temp, max_retries=max_retries),
+        fallback=fallback,
+        hedge_delay=hedge_delay,
     )
-    return llm
\ No newline at end of file
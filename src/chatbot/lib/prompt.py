@@ -1,13 +1,31 @@
-from langchain.prompts import PromptTemplate
+from typing import Optional
 
-def get_prompt() -> PromptTemplate:
+from langchain.prompts import FewShotPromptTemplate, PromptTemplate
+from langchain_core.example_selectors import BaseExampleSelector
+
+from lib.few_shot import FEW_SHOT_EXAMPLES
+from lib.generation_budget import current_response_format
+
+EXAMPLE_PROMPT = PromptTemplate(
+    template="Exemple :\n    Question: {question}\n    Réponse: \n{answer}",
+    input_variables=["question", "answer"],
+)
+
+def get_prompt(example_selector: Optional[BaseExampleSelector] = None) -> FewShotPromptTemplate:
     """
     Retourne un template de prompt configuré pour un assistant médical spécialisé en oncologie.
 
+    Args:
+        example_selector (Optional[BaseExampleSelector]): Choisit les exemples envoyés pour chaque
+            question. Sans sélecteur, tous les exemples sont envoyés.
+
+    La structure de réponse demandée (instruction 4), `response_format`, est celle de la classe
+    de la question en cours (`question_class_scope`) lorsqu'elle n'est pas passée en entrée.
+
     Returns:
-        PromptTemplate: Un template de prompt adapté au domaine du cancer.
+        FewShotPromptTemplate: Un template de prompt adapté au domaine du cancer.
     """
-    template = """
+    prefix = """
     Vous êtes un assistant médical virtuel spécialisé en oncologie. 
     Votre rôle est de fournir des informations précises, fiables et à jour sur les cancers, 
     basées sur les documents suivants  :
@@ -23,10 +41,7 @@ def get_prompt() -> PromptTemplate:
        Répondez comme si vous partagiez des connaissances générales.
     3. Si la question concerne un symptôme, un diagnostic, un traitement ou un suivi lié au cancer du sein, 
        fournissez des informations détaillées et structurées. Utilisez un langage clair et accessible.
-    4. Structurez votre réponse de la manière suivante :
-       - **Introduction** : Donnez une brève introduction pour contextualiser la réponse.
-       - **Points clés** : Utilisez des puces ou des numéros pour lister les informations importantes.
-       - **Conclusion** : Résumez les points essentiels et, si nécessaire, donnez des recommandations ou des conseils.
+    4. {response_format}
     5. Si le contexte ne contient pas suffisamment d'informations pour répondre à la question, dites :
        "Je suis désolé, je ne trouve pas d'informations médicales fiables pour répondre à votre question. 
        Veuillez consulter un oncologue ou un professionnel de santé pour des conseils personnalisés."
@@ -34,67 +49,18 @@ def get_prompt() -> PromptTemplate:
     7. Répondez toujours en français.
     8. ne traduit pas les questions pour répondre si la questions avec une autre langue différente au francais répond avec "Je suis désolé, je ne peux répondre qu'en français. Veuillez reformuler votre question en français."
 
-    Exemples :
-    -----
-    Question: Quels sont les symptômes du cancer du sein ?
-    Réponse: 
-    Le cancer du sein peut se manifester par différents symptômes. Voici les principaux signes à surveiller :
-    - **Points clés** :
-      - Une masse ou une grosseur dans le sein ou sous l'aisselle.
-      - Des changements de la peau du sein, comme une rougeur, une peau d'orange ou une desquamation.
-      - Des écoulements anormaux du mamelon (sang ou liquide).
-      - Une rétraction du mamelon ou une modification de sa forme.
-      - Une douleur persistante dans le sein ou le mamelon.
-    **Conclusion** : Si vous remarquez l'un de ces symptômes, il est important de consulter un médecin pour un examen approfondi. Ces signes ne signifient pas nécessairement un cancer, mais un diagnostic précoce est essentiel.
-
-    -----
-    Question: Quels sont les facteurs de risque du cancer du sein ?
-    Réponse: 
-    Plusieurs facteurs peuvent augmenter le risque de développer un cancer du sein. Voici les principaux éléments à prendre en compte :
-    - **Points clés** :
-      - **Âge** : Le risque augmente avec l'âge, en particulier après 50 ans.
-      - **Antécédents familiaux** : Avoir un parent proche (mère, sœur, fille) atteint de cancer du sein augmente le risque.
-      - **Mutations génétiques** : Les mutations des gènes BRCA1 et BRCA2 sont associées à un risque accru.
-      - **Facteurs hormonaux** : Une exposition prolongée aux œstrogènes (ménopause tardive, premières règles précoces) peut augmenter le risque.
-      - **Mode de vie** : L'obésité, la consommation d'alcool et le manque d'activité physique sont des facteurs de risque modifiables.
-    **Conclusion** : Bien que certains facteurs ne puissent pas être modifiés, un mode de vie sain et un dépistage régulier peuvent réduire le risque. Parlez à votre médecin des options de dépistage adaptées à votre situation.
-    -----
-    Question: What are the symptoms of breast cancer?
-    Réponse: 
-    Je suis désolé, je ne peux répondre qu'en français. Veuillez reformuler votre question en français.
-
-  
-    -----
-    Question: Quels sont les traitements disponibles pour le cancer du sein ?
-    Réponse: 
-    Le traitement du cancer du sein dépend du stade de la maladie, du type de cancer et de l'état de santé général du patient. Voici les options principales :
-    - **Points clés** :
-      - **Chirurgie** : Pour enlever la tumeur (tumorectomie) ou le sein entier (mastectomie).
-      - **Radiothérapie** : Utilisée pour détruire les cellules cancéreuses restantes après la chirurgie.
-      - **Chimiothérapie** : Médicaments pour tuer les cellules cancéreuses ou empêcher leur croissance.
-      - **Hormonothérapie** : Pour les cancers sensibles aux hormones, afin de bloquer leur action.
-      - **Thérapie ciblée** : Médicaments qui ciblent des caractéristiques spécifiques des cellules cancéreuses.
-      - **Immunothérapie** : Pour stimuler le système immunitaire à combattre le cancer.
-    **Conclusion** : Le choix du traitement est personnalisé et doit être discuté avec un oncologue. Une combinaison de ces traitements est souvent utilisée pour maximiser l'efficacité.
-
-    -----
-    Question: Comment se déroule le dépistage du cancer du sein ?
-    Réponse: 
-    Le dépistage du cancer du sein est essentiel pour détecter la maladie à un stade précoce. Voici les principales méthodes utilisées :
-    - **Points clés** :
-      - **Mammographie** : Examen radiologique recommandé tous les 2 ans pour les femmes de 50 à 74 ans.
-      - **Examen clinique des seins** : Réalisé par un médecin pour détecter des anomalies.
-      - **Auto-examen des seins** : Permet de surveiller les changements dans la texture ou l'apparence des seins.
-      - **IRM mammaire** : Utilisée pour les femmes à haut risque (par exemple, porteuses de mutations génétiques).
-    **Conclusion** : Un dépistage régulier peut sauver des vies en détectant le cancer à un stade précoce. Parlez à votre médecin du calendrier de dépistage adapté à votre situation.
-
-    -----
-    Question: How is breast cancer treated?
-    Réponse: 
-    Je suis désolé, je ne peux répondre qu'en français. Veuillez reformuler votre question en français.
-
-    -----
+    """
+    suffix = """
     Question: {question}
     Réponse utile :
     """
-    return PromptTemplate(template=template, input_variables=["context", "question"])
+    return FewShotPromptTemplate(
+        examples=None if example_selector is not None else FEW_SHOT_EXAMPLES,
+        example_selector=example_selector,
+        example_prompt=EXAMPLE_PROMPT,
+        example_separator="\n    -----\n    ",
+        prefix=prefix,
+        suffix=suffix,
+        input_variables=["context", "question"],
+        partial_variables={"response_format": current_response_format},
+    )
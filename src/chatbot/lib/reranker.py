@@ -0,0 +1,201 @@
+import time
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+from typing import List, Optional
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estime le nombre de tokens d'un texte (environ 4 caractères par token).
+    """
+    return max(1, len(text) // 4)
+
+
+@dataclass
+class RerankStats:
+    """
+    Métriques cumulées de l'étape de reranking.
+    """
+    calls: int = 0
+    skipped: int = 0
+    timeouts: int = 0
+    candidates: int = 0
+    kept: int = 0
+    tokens_in: int = 0
+    tokens_out: int = 0
+    total_seconds: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "skipped": self.skipped,
+            "timeouts": self.timeouts,
+            "candidates": self.candidates,
+            "kept": self.kept,
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out,
+            "avg_ms": 1000 * self.total_seconds / self.calls if self.calls else 0.0,
+        }
+
+
+class CrossEncoderReranker:
+    """
+    Reranking local des documents récupérés avec un petit cross-encoder sur CPU.
+
+    Les candidats sont scorés par lots jusqu'à épuisement du budget de temps : la taille
+    de chaque lot est réduite pour tenir dans le temps restant, d'après la durée mesurée
+    par paire lors des lots précédents. `arerank` borne en plus la durée totale.
+    Seuls les `top_n` meilleurs (et dans la limite de `max_tokens`) sont transmis au LLM.
+    Avec `skip`, les candidats sont seulement tronqués, sans charger le modèle.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1",
+        fetch_k: int = 20,
+        top_n: int = 4,
+        max_tokens: int = 0,
+        batch_size: int = 16,
+        time_budget: float = 0.5,
+        skip: bool = False,
+        model=None,
+    ):
+        self.model_name = model_name
+        self.fetch_k = fetch_k
+        self.top_n = top_n
+        self.max_tokens = max_tokens
+        self.batch_size = batch_size
+        self.time_budget = time_budget
+        self.skip = skip
+        self.stats = RerankStats()
+        self._model = model
+        self._seconds_per_pair: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        # Chargement différé : sentence-transformers n'est importé qu'au premier reranking
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    def _select(self, docs: List[dict]) -> List[dict]:
+        selected, tokens = [], 0
+        for doc in docs[: self.top_n]:
+            doc_tokens = estimate_tokens(doc["content"])
+            if self.max_tokens and selected and tokens + doc_tokens > self.max_tokens:
+                break
+            selected.append(doc)
+            tokens += doc_tokens
+        return selected
+
+    def rerank(self, query: str, docs: List[dict], skip: Optional[bool] = None) -> List[dict]:
+        """
+        Réordonne les documents selon leur pertinence pour la question.
+
+        Args:
+            query (str): La question de l'utilisateur.
+            docs (List[dict]): Les documents candidats (format de `get_relevant_documents`).
+            skip (Optional[bool]): Ne pas scorer, seulement tronquer les candidats
+                (par défaut, selon l'attribut `skip` du reranker).
+
+        Returns:
+            List[dict]: Les meilleurs documents, dans l'ordre de pertinence.
+        """
+        start = time.perf_counter()
+        if skip is None:
+            skip = self.skip
+        if skip or len(docs) <= 1:
+            selected = self._select(docs)
+            self._record(docs, selected, start, skipped=True)
+            return selected
+
+        scores: List[Optional[float]] = [None] * len(docs)
+        timed_out = False
+        i = 0
+        while i < len(docs):
+            size = self._batch_size(time.perf_counter() - start)
+            if size < 1:
+                timed_out = True
+                break
+            batch = docs[i: i + size]
+            batch_start = time.perf_counter()
+            batch_scores = self.model.predict([(query, doc["content"]) for doc in batch])
+            self._measure(time.perf_counter() - batch_start, len(batch))
+            scores[i: i + len(batch)] = [float(score) for score in batch_scores]
+            i += len(batch)
+
+        # Les documents non scorés (budget dépassé) restent après les autres, dans leur ordre d'origine
+        scored = sorted(
+            (i for i, score in enumerate(scores) if score is not None),
+            key=lambda i: scores[i],
+            reverse=True,
+        )
+        unscored = [i for i, score in enumerate(scores) if score is None]
+        selected = self._select([docs[i] for i in scored + unscored])
+        self._record(docs, selected, start, timed_out=timed_out)
+        return selected
+
+    def _batch_size(self, elapsed: float) -> int:
+        """
+        Retourne la taille du prochain lot, réduite pour tenir dans le budget de temps restant (0 s'il est épuisé).
+        """
+        if not self.time_budget:
+            return self.batch_size
+        remaining = self.time_budget - elapsed
+        if remaining <= 0:
+            return 0
+        with self._lock:
+            seconds_per_pair = self._seconds_per_pair
+        if seconds_per_pair is None:
+            return self.batch_size
+        return min(self.batch_size, int(remaining / seconds_per_pair))
+
+    def _measure(self, seconds: float, pairs: int) -> None:
+        # Moyenne glissante de la durée par paire, pour dimensionner les lots suivants
+        with self._lock:
+            if self._seconds_per_pair is None:
+                self._seconds_per_pair = seconds / pairs
+            else:
+                self._seconds_per_pair = 0.8 * self._seconds_per_pair + 0.2 * seconds / pairs
+
+    async def arerank(self, query: str, docs: List[dict], skip: Optional[bool] = None) -> List[dict]:
+        """
+        Version asynchrone de `rerank` : le scoring, bloquant pour le CPU, tourne dans un
+        thread pour ne pas bloquer la boucle d'événements. Au-delà du budget de temps, les
+        documents sont retournés dans l'ordre de la recherche, sans attendre la fin du scoring.
+        """
+        rerank = asyncio.to_thread(self.rerank, query, docs, skip)
+        if not self.time_budget:
+            return await rerank
+        try:
+            return await asyncio.wait_for(rerank, self.time_budget)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.stats.timeouts += 1
+            logging.warning("Reranking : budget de temps dépassé, documents gardés dans l'ordre de la recherche.")
+            return self._select(docs)
+
+    def _record(self, docs, selected, start, skipped=False, timed_out=False) -> None:
+        elapsed = time.perf_counter() - start
+        tokens_in = sum(estimate_tokens(doc["content"]) for doc in docs)
+        tokens_out = sum(estimate_tokens(doc["content"]) for doc in selected)
+        with self._lock:
+            self.stats.calls += 1
+            self.stats.skipped += int(skipped)
+            self.stats.timeouts += int(timed_out)
+            self.stats.candidates += len(docs)
+            self.stats.kept += len(selected)
+            self.stats.tokens_in += tokens_in
+            self.stats.tokens_out += tokens_out
+            self.stats.total_seconds += elapsed
+        logging.info(
+            f"Reranking : {len(docs)} candidats -> {len(selected)} documents, "
+            f"{tokens_in} -> {tokens_out} tokens en {1000 * elapsed:.1f} ms"
+            f"{' (budget de temps dépassé)' if timed_out else ''}"
+        )
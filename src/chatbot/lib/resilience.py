@@ -0,0 +1,349 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel, agenerate_from_stream
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import Field
+
+from lib.event_loop import run_async
+from lib.hedging import astream_model
+
+
+class DependencyError(Exception):
+    """
+    Échec d'une dépendance (Vertex AI, Cloud SQL), déjà comptabilisé par son disjoncteur.
+    """
+
+
+class CircuitOpen(DependencyError):
+    """
+    Levée sans appeler la dépendance lorsque son disjoncteur est ouvert.
+    """
+
+
+class DeadlineExceeded(DependencyError):
+    """
+    Levée lorsque le budget de temps de la requête est épuisé.
+    """
+
+
+class Deadline:
+    """
+    Échéance d'une requête : un budget total en secondes, partagé entre ses étapes.
+    """
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+
+_DEADLINE: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+@contextmanager
+def request_deadline(budget: float) -> Iterator[Optional[Deadline]]:
+    """
+    Fixe l'échéance de la requête en cours (0 pour aucune). Elle se propage aux
+    tâches asyncio créées dans ce contexte ; une échéance déjà plus proche est conservée.
+    """
+    current = _DEADLINE.get()
+    deadline = Deadline(budget) if budget > 0 else None
+    if current is not None and (deadline is None or current.remaining() <= budget):
+        deadline = current
+    token = _DEADLINE.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _DEADLINE.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    """
+    Retourne le temps restant avant l'échéance de la requête en cours (None si aucune).
+    """
+    deadline = _DEADLINE.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def stage_timeout(share: float = 1.0) -> Optional[float]:
+    """
+    Retourne le délai accordé à une étape : au plus `share` du budget total, dans la limite du temps restant.
+
+    Raises:
+        DeadlineExceeded: Si le budget de la requête est déjà épuisé.
+    """
+    deadline = _DEADLINE.get()
+    if deadline is None:
+        return None
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        raise DeadlineExceeded("Budget de temps de la requête épuisé.")
+    return min(remaining, deadline.budget * share)
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur d'une dépendance. Il s'ouvre lorsque la proportion d'échecs (erreurs ou
+    appels plus lents que `slow_call_seconds`) sur les `window` derniers appels atteint
+    `failure_rate` ; les appels échouent alors immédiatement pendant `open_seconds`,
+    puis un seul appel de test est autorisé : son succès referme le disjoncteur.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        min_calls: int = 5,
+        window: int = 20,
+        slow_call_seconds: float = 0,
+        open_seconds: float = 30,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.trips = 0
+        self._outcomes: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def allow(self) -> None:
+        """
+        Réserve un appel à la dépendance.
+
+        Raises:
+            CircuitOpen: Si le disjoncteur est ouvert ou si un appel de test est déjà en cours.
+        """
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.open_seconds:
+                self.state = "half_open"
+                logging.info(f"Disjoncteur {self.name} : appel de test.")
+                return
+            if self.state != "closed":
+                self.rejected += 1
+                raise CircuitOpen(f"Disjoncteur {self.name} ouvert.")
+
+    def record(self, success: bool, seconds: float) -> None:
+        """
+        Enregistre le résultat d'un appel autorisé par `allow`.
+        """
+        failed = not success or (self.slow_call_seconds > 0 and seconds > self.slow_call_seconds)
+        with self._lock:
+            self.calls += 1
+            self.failures += failed
+            if self.state == "half_open":
+                if failed:
+                    self._open()
+                else:
+                    self.state = "closed"
+                    self._outcomes.clear()
+                    logging.info(f"Disjoncteur {self.name} refermé.")
+                return
+            self._outcomes.append(failed)
+            if len(self._outcomes) >= self.min_calls and sum(self._outcomes) / len(self._outcomes) >= self.failure_rate:
+                self._open()
+
+    def release(self) -> None:
+        """
+        Libère un appel autorisé mais interrompu sans résultat (annulation, échec d'une autre dépendance).
+        """
+        with self._lock:
+            if self.state == "half_open":
+                # Le prochain appel servira de test
+                self.state = "open"
+
+    def _open(self) -> None:
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        self._outcomes.clear()
+        logging.warning(f"Disjoncteur {self.name} ouvert pour {self.open_seconds}s.")
+
+    async def call(self, func: Callable[[], Awaitable[Any]], share: float = 1.0, retries: int = 0) -> Any:
+        """
+        Appelle la dépendance dans le délai accordé à l'étape ; un échec n'est
+        réessayé que s'il reste au moins autant de budget que l'essai a duré.
+
+        Args:
+            func (Callable[[], Awaitable[Any]]): L'appel à la dépendance.
+            share (float): La part maximale du budget de la requête accordée à l'étape.
+            retries (int): Le nombre maximal de nouvelles tentatives.
+
+        Raises:
+            DependencyError: Si le disjoncteur est ouvert, le budget épuisé ou l'appel en échec.
+        """
+        attempt = 0
+        while True:
+            timeout = stage_timeout(share)
+            self.allow()
+            start = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(func(), timeout)
+            except (DependencyError, asyncio.CancelledError):
+                self.release()
+                raise
+            except Exception as e:
+                elapsed = time.perf_counter() - start
+                self.record(False, elapsed)
+                remaining = remaining_budget()
+                if attempt < retries and (remaining is None or remaining > elapsed):
+                    attempt += 1
+                    logging.warning(f"{self.name} : échec après {elapsed:.2f}s ({type(e).__name__}), nouvelle tentative.")
+                    continue
+                raise DependencyError(f"{self.name} : {type(e).__name__} {e}") from e
+            self.record(True, time.perf_counter() - start)
+            return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "calls": self.calls,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "trips": self.trips,
+            }
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def get_circuit_breaker(name: str, **settings: Any) -> CircuitBreaker:
+    """
+    Retourne le disjoncteur de la dépendance `name`, partagé par tout le processus
+    (créé avec `settings` au premier appel).
+    """
+    with _BREAKERS_LOCK:
+        if name not in _BREAKERS:
+            _BREAKERS[name] = CircuitBreaker(name, **settings)
+        return _BREAKERS[name]
+
+
+def circuit_breaker_stats() -> dict:
+    with _BREAKERS_LOCK:
+        breakers = list(_BREAKERS.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
+
+
+class GuardedEmbeddings(Embeddings):
+    """
+    Modèle d'embedding dont les requêtes asynchrones passent par un disjoncteur,
+    dans la part du budget de la requête accordée à l'embedding.
+    """
+
+    def __init__(self, embeddings: Embeddings, breaker: CircuitBreaker, share: float = 1.0, retries: int = 0):
+        self.embeddings = embeddings
+        self.breaker = breaker
+        self.share = share
+        self.retries = retries
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.breaker.call(lambda: self.embeddings.aembed_query(text), self.share, self.retries)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.breaker.call(lambda: self.embeddings.aembed_documents(texts), self.share, self.retries)
+
+
+class GuardedChatModel(BaseChatModel):
+    """
+    Modèle de langage dont les générations passent par un disjoncteur et respectent
+    l'échéance de la requête. La latence comptabilisée est celle du premier token ;
+    une génération n'est réessayée que si elle a échoué avant son premier token.
+    """
+
+    model: BaseChatModel
+    breaker: CircuitBreaker = Field(exclude=True)
+    max_retries: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "guarded-chat-model"
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        attempt = 0
+        while True:
+            timeout = stage_timeout()
+            self.breaker.allow()
+            start = time.perf_counter()
+            stream = astream_model(self.model, messages, stop, **kwargs)
+            try:
+                first_chunk = await asyncio.wait_for(anext(stream), timeout)
+            except StopAsyncIteration:
+                self.breaker.record(True, time.perf_counter() - start)
+                return
+            except (DependencyError, asyncio.CancelledError):
+                self.breaker.release()
+                await stream.aclose()
+                raise
+            except Exception as e:
+                elapsed = time.perf_counter() - start
+                self.breaker.record(False, elapsed)
+                await stream.aclose()
+                remaining = remaining_budget()
+                if attempt < self.max_retries and (remaining is None or remaining > elapsed):
+                    attempt += 1
+                    logging.warning(
+                        f"{self.breaker.name} : échec après {elapsed:.2f}s ({type(e).__name__}), nouvelle tentative."
+                    )
+                    continue
+                raise DependencyError(f"{self.breaker.name} : {type(e).__name__} {e}") from e
+            self.breaker.record(True, time.perf_counter() - start)
+            break
+
+        try:
+            yield first_chunk
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(anext(stream), stage_timeout())
+                except StopAsyncIteration:
+                    return
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return await agenerate_from_stream(self._astream(messages, stop=stop, **kwargs))
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return run_async(self._agenerate(messages, stop=stop, **kwargs))
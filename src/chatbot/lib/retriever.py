@@ -1,16 +1,29 @@
+import os
 import sys
 import asyncio
 import logging
+from typing import Awaitable, Callable, Optional
 from langchain_google_cloud_sql_pg import PostgresVectorStore
 from langchain_core.documents.base import Document
 import aiohttp
+from langchain_google_cloud_sql_pg import PostgresEngine
 from lib.source_retriever import list_top_k_sources  
+from lib.vector_index import NumpyVectorIndex
+from lib.lexical_index import BM25Index, reciprocal_rank_fusion
+from lib.chunk_cache import ChunkContentCache
+from lib.embedding_batcher import embed_queries
+from lib.database import fetch_all, fetch_all_sync
 
 from lib.config import (
     PROJECT_ID,
     REGION,
     TABLE_NAME,
-    INSTANCE
+    INSTANCE,
+    LEXICAL_FAST_PATH_MARGIN,
+    RRF_K,
+    LEXICAL_MIN_TERM_COVERAGE,
+    ADAPTIVE_K_DOMINANCE_MARGIN,
+    ADAPTIVE_K_CLUSTER_WIDTH
 )
 
 from lib.embeddings import (
@@ -20,12 +33,23 @@ from lib.embeddings import (
 )
 
 async def get_relevant_documents(
-    query: str, vector_store: PostgresVectorStore, similarity_threshold: float
+    query: str,
+    vector_store: PostgresVectorStore,
+    similarity_threshold: float,
+    k: int = 4,
+    query_embedding: Optional[list[float]] = None,
 ) -> list[dict]:
-    # Recherche des documents pertinents avec leurs scores de similarité
-    relevant_docs_scores = vector_store.similarity_search_with_relevance_scores(
-        query=query, k=4
+    # La requête n'est vectorisée ici que si son embedding n'est pas fourni
+    if query_embedding is None:
+        query_embedding = await vector_store.embeddings.aembed_query(query)
+    # Le seuil est appliqué sur la distance retournée : au plus k lignes sont transférées, et un
+    # filtre SQL sur la distance répéterait le vecteur de la requête dans le texte de la requête
+    relevant_docs_distances = await vector_store.asimilarity_search_with_score_by_vector(
+        embedding=query_embedding,
+        k=k,
     )
+    # Même score de pertinence que PostgresVectorStore pour la distance cosinus
+    relevant_docs_scores = [(doc, 1.0 - distance) for doc, distance in relevant_docs_distances]
 
     # Affichez les documents pertinents pour déboguer
     #print("Documents pertinents trouvés :")
@@ -46,6 +70,374 @@ async def get_relevant_documents(
 
     return relevant_docs
 
+
+async def get_relevant_documents_two_phase(
+    query: str,
+    engine: PostgresEngine,
+    embeddings,
+    chunk_cache: ChunkContentCache,
+    similarity_threshold: float,
+    k: int = 4,
+    cutoff: Optional[Callable[[list[float]], int]] = None,
+    table_name: str = "MI_RAG",
+    query_embedding: Optional[list[float]] = None,
+) -> list[dict]:
+    """
+    Recherche en deux phases : les identifiants et scores des chunks les plus proches sont
+    récupérés d'abord, puis le contenu des seuls chunks retenus est lu depuis le cache
+    en mémoire ou, à défaut, chargé en une seule requête.
+
+    Args:
+        query (str): La question de l'utilisateur.
+        engine (PostgresEngine): La connexion à Cloud SQL.
+        embeddings: Le modèle d'embedding.
+        chunk_cache (ChunkContentCache): Le cache du contenu des chunks.
+        similarity_threshold (float): Le seuil de similarité minimal.
+        k (int): Le nombre maximal de documents.
+        cutoff (Optional[Callable[[list[float]], int]]): Choisit le nombre de chunks retenus après la phase 1.
+        table_name (str): La table des chunks.
+        query_embedding (Optional[list[float]]): L'embedding de la question, s'il est déjà calculé.
+
+    Returns:
+        list[dict]: Les documents pertinents, au même format que `get_relevant_documents`.
+    """
+    if query_embedding is None:
+        query_embedding = await embeddings.aembed_query(query)
+    embedding_string = str([float(dimension) for dimension in query_embedding])
+
+    # Phase 1 : identifiants et scores uniquement
+    rows = await fetch_all(
+        engine,
+        f"""
+        SELECT CAST(langchain_id AS text) AS langchain_id,
+               embedding <=> CAST(:embedding AS vector) AS distance
+        FROM "{table_name}"
+        WHERE embedding <=> CAST(:embedding AS vector) <= :max_distance
+        ORDER BY embedding <=> CAST(:embedding AS vector)
+        LIMIT :k
+        """,
+        {"embedding": embedding_string, "max_distance": 1.0 - similarity_threshold, "k": k},
+    )
+    matches = [(row["langchain_id"], 1.0 - row["distance"]) for row in rows]
+    if cutoff is not None:
+        matches = matches[:cutoff([score for _, score in matches])]
+    if not matches:
+        return []
+
+    # Phase 2 : contenu des chunks retenus, depuis le cache puis la base
+    chunks = chunk_cache.get_many(chunk_id for chunk_id, _ in matches)
+    missing_ids = [chunk_id for chunk_id, _ in matches if chunk_id not in chunks]
+    if missing_ids:
+        rows = await fetch_all(
+            engine,
+            f"""
+            SELECT CAST(langchain_id AS text) AS langchain_id, content, langchain_metadata
+            FROM "{table_name}"
+            WHERE langchain_id = ANY(CAST(:ids AS uuid[]))
+            """,
+            {"ids": missing_ids},
+        )
+        for row in rows:
+            metadata = row["langchain_metadata"] or {}
+            chunk_cache.put(row["langchain_id"], row["content"], metadata)
+            chunks[row["langchain_id"]] = (row["content"], metadata)
+
+    return [
+        {
+            "content": chunks[chunk_id][0],
+            "metadata": chunks[chunk_id][1],
+            "similarity_score": score,
+            "similarity_type": "cosine"
+        }
+        for chunk_id, score in matches
+        if chunk_id in chunks
+    ]
+
+
+def adaptive_cutoff(
+    scores: list[float],
+    min_k: int = 4,
+    dominance_margin: float = ADAPTIVE_K_DOMINANCE_MARGIN,
+    cluster_width: float = ADAPTIVE_K_CLUSTER_WIDTH,
+) -> int:
+    """
+    Choisit le nombre de documents à garder selon la distribution des scores (triés par ordre décroissant).
+
+    Si le meilleur document domine nettement le second, lui seul est gardé. Sinon, au moins
+    `min_k` documents sont gardés, et davantage tant que les scores restent groupés
+    autour du meilleur.
+
+    Args:
+        scores (list[float]): Les scores de similarité, triés par ordre décroissant.
+        min_k (int): Le nombre de documents gardés par défaut.
+        dominance_margin (float): L'écart entre les deux meilleurs scores au-delà duquel seul le premier est gardé.
+        cluster_width (float): L'écart maximal au meilleur score pour qu'un document soit gardé au-delà de `min_k`.
+
+    Returns:
+        int: Le nombre de documents à garder.
+    """
+    if len(scores) >= 2 and scores[0] - scores[1] >= dominance_margin:
+        return 1
+    count = 1
+    while count < len(scores) and scores[0] - scores[count] <= cluster_width:
+        count += 1
+    return min(len(scores), max(count, min_k))
+
+
+def load_vector_index_rows(engine: PostgresEngine, table_name: str = "MI_RAG") -> list[dict]:
+    """
+    Charge tous les chunks (ids, contenus, embeddings, métadonnées) de la table.
+    """
+    return fetch_all_sync(engine, f'SELECT langchain_id, content, embedding, langchain_metadata FROM "{table_name}"')
+
+
+def build_vector_index(
+    engine: PostgresEngine, index_path: str = "", refresh_interval: float = 0
+) -> NumpyVectorIndex:
+    """
+    Construit l'index vectoriel en mémoire, depuis le disque si une copie existe, sinon depuis la base.
+
+    Args:
+        engine (PostgresEngine): La connexion à Cloud SQL.
+        index_path (str): Le dossier de sauvegarde de l'index (optionnel).
+        refresh_interval (float): L'intervalle de rafraîchissement depuis la base, en secondes.
+
+    Returns:
+        NumpyVectorIndex: L'index prêt à être interrogé.
+    """
+    vector_index = None
+    if index_path and os.path.exists(os.path.join(index_path, NumpyVectorIndex.EMBEDDINGS_FILE)):
+        try:
+            vector_index = NumpyVectorIndex.load(index_path)
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Copie de l'index vectoriel inutilisable, rechargement depuis la base : {e}")
+    loaded_from_disk = vector_index is not None
+    if not loaded_from_disk:
+        vector_index = NumpyVectorIndex()
+        vector_index.refresh(load_vector_index_rows(engine))
+        if index_path:
+            vector_index.save(index_path)
+
+    # La copie sur disque accélère le démarrage ; elle est remise à jour depuis la base
+    # en arrière-plan, puis sauvegardée après chaque rafraîchissement
+    vector_index.start_background_refresh(
+        lambda: load_vector_index_rows(engine),
+        refresh_interval,
+        directory=index_path,
+        refresh_now=loaded_from_disk,
+    )
+    return vector_index
+
+
+async def get_relevant_documents_from_index(
+    query: str,
+    vector_index: NumpyVectorIndex,
+    embeddings,
+    similarity_threshold: float,
+    k: int = 4,
+) -> list[dict]:
+    """
+    Recherche les documents pertinents dans l'index vectoriel en mémoire.
+    Le format de sortie est identique à celui de `get_relevant_documents`.
+    """
+    query_embedding = await embeddings.aembed_query(query)
+
+    relevant_docs = []
+    for _, content, metadata, score in vector_index.search(query_embedding, k=k):
+        if score >= similarity_threshold:
+            relevant_docs.append({
+                "content": content,
+                "metadata": metadata,
+                "similarity_score": score,
+                "similarity_type": "cosine"
+            })
+
+    return relevant_docs
+
+
+async def get_relevant_documents_batch(
+    queries: list[str],
+    engine: PostgresEngine,
+    embeddings,
+    k: int = 4,
+    similarity_threshold: float = 0.5,
+    vector_index: Optional[NumpyVectorIndex] = None,
+    table_name: str = "MI_RAG",
+) -> list[list[dict]]:
+    """
+    Recherche les documents pertinents pour plusieurs requêtes à la fois.
+
+    Toutes les requêtes sont vectorisées en un seul appel `embed_documents`, puis
+    recherchées soit dans l'index en mémoire (un seul produit matriciel), soit dans
+    Cloud SQL avec une unique requête LATERAL JOIN sur une seule connexion.
+
+    Args:
+        queries (list[str]): Les questions.
+        engine (PostgresEngine): La connexion à Cloud SQL.
+        embeddings: Le modèle d'embedding.
+        k (int): Le nombre de documents par requête.
+        similarity_threshold (float): Le seuil de similarité minimal.
+        vector_index (Optional[NumpyVectorIndex]): L'index en mémoire, s'il est activé.
+        table_name (str): La table des chunks.
+
+    Returns:
+        list[list[dict]]: Pour chaque requête, les documents au format de `get_relevant_documents`.
+    """
+    if not queries:
+        return []
+    query_embeddings = await asyncio.to_thread(embed_queries, embeddings, queries)
+    results = [[] for _ in queries]
+
+    if vector_index is not None:
+        for i, matches in enumerate(vector_index.search_batch(query_embeddings, k=k)):
+            for _, content, metadata, score in matches:
+                if score >= similarity_threshold:
+                    results[i].append({
+                        "content": content,
+                        "metadata": metadata,
+                        "similarity_score": score,
+                        "similarity_type": "cosine"
+                    })
+        return results
+
+    rows = await fetch_all(
+        engine,
+        f"""
+        SELECT q.idx, r.content, r.langchain_metadata, r.distance
+        FROM unnest(CAST(:embeddings AS text[])) WITH ORDINALITY AS q(embedding, idx)
+        CROSS JOIN LATERAL (
+            SELECT content, langchain_metadata,
+                   embedding <=> CAST(q.embedding AS vector) AS distance
+            FROM "{table_name}"
+            WHERE embedding <=> CAST(q.embedding AS vector) <= :max_distance
+            ORDER BY embedding <=> CAST(q.embedding AS vector)
+            LIMIT :k
+        ) r
+        ORDER BY q.idx, r.distance
+        """,
+        {"embeddings": [str([float(x) for x in e]) for e in query_embeddings], "k": k,
+         "max_distance": 1.0 - similarity_threshold},
+    )
+    for row in rows:
+        # Même score de pertinence que PostgresVectorStore pour la distance cosinus
+        score = 1.0 - row["distance"]
+        if score >= similarity_threshold:
+            results[row["idx"] - 1].append({
+                "content": row["content"],
+                "metadata": row["langchain_metadata"] or {},
+                "similarity_score": score,
+                "similarity_type": "cosine"
+            })
+    return results
+
+
+def load_lexical_index_rows(engine: PostgresEngine, table_name: str = "MI_RAG") -> list[dict]:
+    """
+    Charge les ids, contenus et métadonnées des chunks de la table (sans les embeddings).
+    """
+    return fetch_all_sync(engine, f'SELECT langchain_id, content, langchain_metadata FROM "{table_name}"')
+
+
+def load_index_version(engine: PostgresEngine, table_name: str = "MI_RAG") -> str:
+    """
+    Retourne la version de la table des chunks, qui change à chaque écriture : son nombre
+    de lignes et le nombre cumulé d'insertions, mises à jour et suppressions (pg_stat_user_tables).
+    """
+    row = fetch_all_sync(
+        engine,
+        f"""
+        SELECT (SELECT count(*) FROM "{table_name}") AS row_count,
+               COALESCE((
+                   SELECT n_tup_ins + n_tup_upd + n_tup_del
+                   FROM pg_stat_user_tables
+                   WHERE relname = :table_name
+               ), 0) AS writes
+        """,
+        {"table_name": table_name},
+    )[0]
+    return f"{row['row_count']}:{row['writes']}"
+
+
+def build_lexical_index(engine: PostgresEngine, refresh_interval: float = 0) -> BM25Index:
+    """
+    Construit l'index BM25 à partir de la table et l'aligne périodiquement sur son contenu
+    (chunks ajoutés, modifiés ou supprimés).
+    """
+    lexical_index = BM25Index()
+    lexical_index.add_documents(load_lexical_index_rows(engine))
+    lexical_index.start_background_refresh(lambda: load_lexical_index_rows(engine), refresh_interval)
+    return lexical_index
+
+
+def is_lexical_fast_path(
+    query: str,
+    lexical_index: BM25Index,
+    k: int = 4,
+    fast_path_margin: float = LEXICAL_FAST_PATH_MARGIN,
+) -> bool:
+    """
+    Indique si `get_relevant_documents_hybrid` répondra à la requête par la seule recherche
+    lexicale, sans recherche vectorielle ni appel à l'API d'embedding.
+    """
+    return lexical_index.is_confident(query, lexical_index.search(query, k=k), fast_path_margin)
+
+
+async def get_relevant_documents_hybrid(
+    query: str,
+    lexical_index: BM25Index,
+    vector_search: Callable[[], Awaitable[list[dict]]],
+    k: int = 4,
+    fast_path_margin: float = LEXICAL_FAST_PATH_MARGIN,
+    rrf_k: int = RRF_K,
+    min_term_coverage: float = LEXICAL_MIN_TERM_COVERAGE,
+) -> list[dict]:
+    """
+    Recherche hybride : les résultats BM25 et vectoriels sont fusionnés par Reciprocal Rank Fusion.
+    Si le meilleur résultat lexical est suffisamment sûr, la recherche vectorielle
+    (et donc l'appel à l'API d'embedding) est évitée.
+
+    Les chunks trouvés par BM25 seul n'ont pas de score cosinus : leur `similarity_score`
+    vaut 0 et leur `similarity_type` "bm25", ils ne sont donc jamais cités comme source.
+    À défaut du seuil de similarité, ils doivent contenir au moins `min_term_coverage`
+    des termes de la question.
+
+    Args:
+        query (str): La question de l'utilisateur.
+        lexical_index (BM25Index): L'index lexical en mémoire.
+        vector_search (Callable[[], Awaitable[list[dict]]]): La recherche vectorielle à fusionner.
+        k (int): Le nombre de documents retournés.
+        fast_path_margin (float): L'écart minimal entre les deux meilleurs scores BM25 pour
+            répondre sans recherche vectorielle (0 pour désactiver).
+        rrf_k (int): La constante de lissage de RRF.
+        min_term_coverage (float): La part minimale des termes de la question présents
+            dans un chunk trouvé par BM25.
+
+    Returns:
+        list[dict]: Les documents pertinents, au même format que `get_relevant_documents`.
+    """
+    lexical_results = lexical_index.search(query, k=k)
+    lexical_docs = {}
+    for position, _ in lexical_results:
+        if lexical_index.term_coverage(query, position) < min_term_coverage:
+            continue
+        _, content, metadata = lexical_index.get(position)
+        lexical_docs[content] = {
+            "content": content,
+            "metadata": metadata,
+            "similarity_score": 0.0,
+            "similarity_type": "bm25"
+        }
+
+    if lexical_index.is_confident(query, lexical_results, fast_path_margin):
+        logging.info(f"Recherche lexicale seule pour la requête : {query}")
+        return list(lexical_docs.values())
+
+    vector_docs = {doc["content"]: doc for doc in await vector_search()}
+    fused = reciprocal_rank_fusion([list(vector_docs), list(lexical_docs)], k=rrf_k)
+
+    # Les scores cosinus sont conservés pour les documents trouvés par la recherche vectorielle
+    return [vector_docs.get(content) or lexical_docs[content] for content, _ in fused[:k]]
+
 """async def main():
     # Crée une session client
      # Logging configuration
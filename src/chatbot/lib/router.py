@@ -0,0 +1,111 @@
+import re
+import logging
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from lib.lexical_index import fold_accents
+
+# Réponses fixes, identiques à celles demandées au LLM dans le prompt
+NON_FRENCH_RESPONSE = (
+    "Je suis désolé, je ne peux répondre qu'en français. Veuillez reformuler votre question en français."
+)
+GREETING_RESPONSE = (
+    "Bonjour ! Je suis CareBot, votre assistant médical virtuel spécialisé en oncologie. "
+    "Posez-moi vos questions sur le cancer du sein : symptômes, dépistage, traitements ou suivi."
+)
+THANKS_RESPONSE = "Avec plaisir ! N'hésitez pas si vous avez d'autres questions sur le cancer du sein."
+UNCLEAR_RESPONSE = (
+    "Je n'ai pas compris votre question. Pouvez-vous la reformuler, par exemple : "
+    "« Quels sont les symptômes du cancer du sein ? »"
+)
+
+WORD_PATTERN = re.compile(r"[a-z]+")
+
+# Mots-outils fréquents par langue (sans accents), pour une identification rapide de la langue
+FUNCTION_WORDS: Dict[str, set] = {
+    "fr": {
+        "le", "la", "les", "un", "une", "des", "du", "de", "et", "est", "sont", "que", "qui", "quel",
+        "quelle", "quels", "quelles", "pour", "dans", "avec", "sur", "pas", "ce", "cette", "mon", "ma",
+        "mes", "je", "j", "vous", "nous", "il", "elle", "au", "aux", "comment", "pourquoi", "quand",
+        "ou", "peut", "faut", "apres", "avant", "l", "d", "qu", "c", "ai", "suis", "peux",
+    },
+    "en": {
+        "the", "an", "is", "are", "was", "were", "what", "which", "who", "how", "why", "when",
+        "where", "of", "and", "to", "for", "with", "in", "my", "your", "i", "you", "it", "can",
+        "do", "does", "should", "be", "have", "has", "after", "before", "there", "any", "this", "that",
+    },
+    "es": {
+        "el", "los", "las", "una", "es", "son", "que", "cual", "cuales", "como", "por", "para", "con",
+        "en", "del", "mi", "tengo", "puedo", "cuando", "donde", "y",
+    },
+    "de": {
+        "der", "die", "das", "ein", "eine", "ist", "sind", "was", "wie", "warum", "wann", "und", "mit",
+        "fur", "von", "ich", "mein", "meine", "kann", "nach", "bei", "nicht",
+    },
+}
+
+GREETINGS = {
+    "bonjour", "bonsoir", "salut", "coucou", "hello", "hi", "hey", "allo", "bonjour carebot",
+    "salut carebot", "comment ca va", "ca va", "bonjour comment ca va", "salut ca va",
+}
+THANKS = {"merci", "merci beaucoup", "merci bien", "thanks", "thank you", "super merci", "ok merci"}
+
+
+@dataclass
+class Route:
+    """
+    Décision du routeur : `response` est renseignée si la question peut être traitée sans la chaîne QA.
+    """
+    intent: str
+    language: str
+    response: Optional[str] = None
+
+
+def detect_language(text: str) -> str:
+    """
+    Identifie la langue d'un texte court à partir de ses mots-outils et de ses accents.
+
+    Returns:
+        str: Le code de la langue ("fr", "en", "es", "de"), ou "unknown" si le texte ne permet pas de conclure.
+    """
+    words = WORD_PATTERN.findall(fold_accents(text))
+    scores = {language: sum(word in vocabulary for word in words) for language, vocabulary in FUNCTION_WORDS.items()}
+    # Les lettres accentuées propres au français ("é", "è", "ç"...) comptent comme un indice supplémentaire
+    if re.search(r"[éèêàùçôîœ]", text.lower()):
+        scores["fr"] += 2
+    best = max(scores, key=scores.get)
+    if scores[best] == 0:
+        return "unknown"
+    # Langue étrangère retenue seulement si elle domine nettement le français
+    if best != "fr" and scores[best] < max(2, 2 * scores["fr"] + 1):
+        return "fr" if scores["fr"] else "unknown"
+    return best
+
+
+def route_query(query: str) -> Route:
+    """
+    Classe une question avant la chaîne QA : salutations, remerciements, saisies
+    inexploitables et questions dans une autre langue reçoivent une réponse fixe immédiate.
+
+    Args:
+        query (str): La question de l'utilisateur.
+
+    Returns:
+        Route: L'intention détectée et, le cas échéant, la réponse fixe.
+    """
+    normalized = " ".join(WORD_PATTERN.findall(fold_accents(query)))
+    language = detect_language(query)
+
+    if normalized in GREETINGS:
+        route = Route("greeting", language, GREETING_RESPONSE)
+    elif normalized in THANKS:
+        route = Route("thanks", language, THANKS_RESPONSE)
+    elif len(normalized.replace(" ", "")) < 3:
+        route = Route("unclear", language, UNCLEAR_RESPONSE)
+    elif language not in ("fr", "unknown"):
+        route = Route("non_french", language, NON_FRENCH_RESPONSE)
+    else:
+        return Route("question", language)
+
+    logging.info(f"Routeur : question « {query} » traitée sans la chaîne QA ({route.intent}, langue {language}).")
+    return route
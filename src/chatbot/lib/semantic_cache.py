@@ -0,0 +1,165 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+
+@dataclass
+class CacheEntry:
+    """
+    Une réponse mise en cache avec l'embedding normalisé de sa question.
+    """
+    question: str
+    embedding: np.ndarray
+    response: dict
+    created_at: float
+
+
+class SemanticCache:
+    """
+    Cache sémantique des réponses de la chaîne QA.
+
+    Une question est servie depuis le cache si son embedding est suffisamment
+    proche (similarité cosinus) de celui d'une question déjà traitée.
+    Le cache est borné (éviction LRU), chaque entrée expire après `ttl` secondes
+    et tout le cache est invalidé lorsque la version de l'index change
+    (voir `start_index_version_watch`).
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        max_size: int = 500,
+        ttl: float = 3600,
+        index_version: Optional[str] = None,
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.index_version = index_version
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, CacheEntry]" = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self._watch_thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [key for key, entry in self._entries.items() if now - entry.created_at > self.ttl]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup(self, embedding: Sequence[float]) -> Optional[dict]:
+        """
+        Recherche une réponse en cache pour l'embedding d'une question.
+
+        Args:
+            embedding (Sequence[float]): L'embedding de la question.
+
+        Returns:
+            Optional[dict]: La réponse en cache, ou None si aucune question assez proche.
+        """
+        query = self._normalize(embedding)
+        with self._lock:
+            self._evict_expired(time.time())
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            keys = list(self._entries.keys())
+            matrix = np.stack([self._entries[key].embedding for key in keys])
+            scores = matrix @ query
+            best = int(np.argmax(scores))
+
+            if scores[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            key = keys[best]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            entry = self._entries[key]
+            logging.info(
+                f"Cache sémantique : réponse trouvée pour '{entry.question}' (similarité {scores[best]:.3f})"
+            )
+            return entry.response
+
+    def store(self, question: str, embedding: Sequence[float], response: dict) -> None:
+        """
+        Ajoute une réponse au cache en évinçant l'entrée la moins récemment utilisée si besoin.
+
+        Args:
+            question (str): La question posée.
+            embedding (Sequence[float]): L'embedding de la question.
+            response (dict): La réponse de la chaîne QA.
+        """
+        entry = CacheEntry(
+            question=question,
+            embedding=self._normalize(embedding),
+            response=response,
+            created_at=time.time(),
+        )
+        with self._lock:
+            self._entries[self._next_key] = entry
+            self._next_key += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def set_index_version(self, index_version: Optional[str]) -> None:
+        """
+        Invalide le cache si la version de l'index a changé.
+
+        Args:
+            index_version (Optional[str]): La version courante de l'index.
+        """
+        with self._lock:
+            if index_version != self.index_version:
+                logging.info(
+                    f"Cache sémantique invalidé : version d'index {self.index_version} -> {index_version}"
+                )
+                self._entries.clear()
+                self.index_version = index_version
+
+    def start_index_version_watch(self, loader: Callable[[], Optional[str]], interval: float) -> None:
+        """
+        Relit périodiquement la version de l'index dans un thread en arrière-plan ;
+        le cache est vidé dès qu'elle change.
+
+        Args:
+            loader (Callable[[], Optional[str]]): Fonction qui lit la version courante de l'index.
+            interval (float): L'intervalle entre deux lectures, en secondes (0 pour aucune).
+        """
+        if self._watch_thread is not None or interval <= 0:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.set_index_version(loader())
+                except Exception as e:
+                    logging.error(f"Erreur lors de la lecture de la version de l'index : {e}")
+
+        self._watch_thread = threading.Thread(target=run, daemon=True)
+        self._watch_thread.start()
+
+    def clear(self) -> None:
+        """
+        Vide le cache.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
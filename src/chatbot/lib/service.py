@@ -0,0 +1,435 @@
+import logging
+from typing import Callable, List, Optional
+
+from langchain.chains import RetrievalQA
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_google_cloud_sql_pg import PostgresEngine
+
+from lib.embeddings import (
+    create_cloud_sql_database_connection,
+    check_index_embedding_model,
+    get_embedding_model,
+    get_vector_store
+)
+from lib.chain import get_chain, get_regeneration_chain, regenerate_response, astream_response
+from lib.retriever import build_vector_index, build_lexical_index, load_index_version
+from lib.semantic_cache import SemanticCache
+from lib.reranker import CrossEncoderReranker
+from lib.chunk_cache import ChunkContentCache
+from lib.embedding_batcher import EmbeddingMicroBatcher, QueryEmbeddingCache
+from lib.few_shot import FEW_SHOT_EXAMPLES, EmbeddingExampleSelector
+from lib.generation_budget import GENERATION_STATS, question_class_scope
+from lib.single_flight import SingleFlight
+from lib.router import route_query
+from lib.admission import AdmissionController, AdmissionRejected
+from lib.database import pool_stats
+from lib.resilience import (
+    CircuitBreaker,
+    GuardedEmbeddings,
+    get_circuit_breaker,
+    circuit_breaker_stats,
+    request_deadline
+)
+from lib.config import (
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_MAX_SIZE,
+    SEMANTIC_CACHE_TTL,
+    INDEX_VERSION_CHECK_SECONDS,
+    RETRIEVER_BACKEND,
+    VECTOR_INDEX_PATH,
+    VECTOR_INDEX_REFRESH_SECONDS,
+    LEXICAL_SEARCH_ENABLED,
+    LEXICAL_INDEX_REFRESH_SECONDS,
+    RERANK_ENABLED,
+    RERANK_MODEL,
+    RERANK_FETCH_K,
+    RERANK_TOP_N,
+    RERANK_MAX_TOKENS,
+    RERANK_BATCH_SIZE,
+    RERANK_TIME_BUDGET,
+    RERANK_SKIP,
+    CONTEXT_PACKING_ENABLED,
+    CONTEXT_MAX_TOKENS,
+    ADAPTIVE_K_ENABLED,
+    ADAPTIVE_K_MAX,
+    TWO_PHASE_RETRIEVAL_ENABLED,
+    CHUNK_CACHE_MAX_BYTES,
+    EMBEDDING_BATCH_ENABLED,
+    EMBEDDING_BATCH_MAX_WAIT_MS,
+    EMBEDDING_BATCH_MAX_SIZE,
+    LLM_FALLBACK_MODEL,
+    LLM_HEDGE_DELAY,
+    REGENERATE_TEMPERATURE,
+    QUERY_ROUTER_ENABLED,
+    ADMISSION_MAX_IN_FLIGHT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_QUEUE_TIMEOUT,
+    REQUEST_DEADLINE,
+    EMBEDDING_BUDGET_SHARE,
+    SEARCH_BUDGET_SHARE,
+    DEPENDENCY_RETRIES,
+    CIRCUIT_FAILURE_RATE,
+    CIRCUIT_MIN_CALLS,
+    CIRCUIT_WINDOW,
+    CIRCUIT_OPEN_SECONDS,
+    EMBEDDING_SLOW_SECONDS,
+    CLOUD_SQL_SLOW_SECONDS,
+    LLM_SLOW_FIRST_TOKEN_SECONDS,
+    FEW_SHOT_DYNAMIC,
+    FEW_SHOT_K,
+    FEW_SHOT_MAX_TOKENS,
+    FEW_SHOT_MIN_SIMILARITY,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    ADAPTIVE_OUTPUT_BUDGET_ENABLED
+)
+
+
+def build_circuit_breaker(name: str, slow_call_seconds: float) -> CircuitBreaker:
+    """
+    Retourne le disjoncteur d'une dépendance, partagé par tout le processus.
+    """
+    return get_circuit_breaker(
+        name,
+        failure_rate=CIRCUIT_FAILURE_RATE,
+        min_calls=CIRCUIT_MIN_CALLS,
+        window=CIRCUIT_WINDOW,
+        slow_call_seconds=slow_call_seconds,
+        open_seconds=CIRCUIT_OPEN_SECONDS,
+    )
+
+
+def build_llm_breaker() -> CircuitBreaker:
+    return build_circuit_breaker("vertex_llm", LLM_SLOW_FIRST_TOKEN_SECONDS)
+
+
+def build_query_embeddings() -> Embeddings:
+    """
+    Crée le modèle d'embedding des requêtes, protégé par un disjoncteur.
+    Les requêtes concurrentes sont regroupées en un seul appel si le micro-batching est activé,
+    et le vecteur d'une question est réutilisé par toutes les étapes de sa requête.
+    """
+    embeddings = get_embedding_model(None)
+    if EMBEDDING_BATCH_ENABLED:
+        embeddings = EmbeddingMicroBatcher(
+            embeddings,
+            max_wait_ms=EMBEDDING_BATCH_MAX_WAIT_MS,
+            max_batch_size=EMBEDDING_BATCH_MAX_SIZE,
+        )
+    embeddings = GuardedEmbeddings(
+        embeddings,
+        build_circuit_breaker("embedding", EMBEDDING_SLOW_SECONDS),
+        share=EMBEDDING_BUDGET_SHARE,
+        retries=DEPENDENCY_RETRIES,
+    )
+    return QueryEmbeddingCache(embeddings, max_size=QUERY_EMBEDDING_CACHE_SIZE)
+
+
+async def abuild_example_selector(embeddings: Embeddings) -> Optional[EmbeddingExampleSelector]:
+    """
+    Crée le sélecteur des exemples du prompt et calcule les vecteurs des exemples
+    (None si tous les exemples sont envoyés à chaque requête).
+    """
+    if not FEW_SHOT_DYNAMIC:
+        return None
+    selector = EmbeddingExampleSelector(
+        FEW_SHOT_EXAMPLES,
+        embeddings,
+        k=FEW_SHOT_K,
+        max_tokens=FEW_SHOT_MAX_TOKENS,
+        min_similarity=FEW_SHOT_MIN_SIMILARITY,
+    )
+    await selector.aprepare()
+    return selector
+
+
+def build_regeneration_chain(example_selector: Optional[EmbeddingExampleSelector] = None):
+    """
+    Crée la chaîne prompt | LLM qui régénère une réponse à partir du contexte déjà récupéré.
+    """
+    return get_regeneration_chain(
+        temperature=REGENERATE_TEMPERATURE,
+        fallback_model=LLM_FALLBACK_MODEL,
+        hedge_delay=LLM_HEDGE_DELAY,
+        llm_breaker=build_llm_breaker(),
+        retries=DEPENDENCY_RETRIES,
+        example_selector=example_selector,
+        adaptive_budget=ADAPTIVE_OUTPUT_BUDGET_ENABLED
+    )
+
+
+def build_semantic_cache(engine: Optional[PostgresEngine] = None) -> SemanticCache:
+    """
+    Crée le cache sémantique des réponses. Avec une connexion Cloud SQL, il est vidé
+    dès que la table des chunks change (version relue toutes les `INDEX_VERSION_CHECK_SECONDS`).
+    """
+    index_version = None
+    if engine is not None:
+        try:
+            index_version = load_index_version(engine)
+        except Exception as e:
+            logging.warning(f"Version de l'index illisible au démarrage : {e}")
+    semantic_cache = SemanticCache(
+        similarity_threshold=SEMANTIC_CACHE_THRESHOLD,
+        max_size=SEMANTIC_CACHE_MAX_SIZE,
+        ttl=SEMANTIC_CACHE_TTL,
+        index_version=index_version,
+    )
+    if engine is not None:
+        semantic_cache.start_index_version_watch(lambda: load_index_version(engine), INDEX_VERSION_CHECK_SECONDS)
+    return semantic_cache
+
+
+def build_admission_controller() -> AdmissionController:
+    """
+    Crée le contrôleur d'admission placé devant la chaîne QA.
+    """
+    return AdmissionController(
+        max_in_flight=ADMISSION_MAX_IN_FLIGHT,
+        max_queue=ADMISSION_MAX_QUEUE,
+        queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+    )
+
+
+async def abuild_qa_chain(
+    embeddings: Embeddings,
+    engine: Optional[PostgresEngine] = None,
+    example_selector: Optional[EmbeddingExampleSelector] = None,
+) -> RetrievalQA:
+    """
+    Crée la chaîne QA et ses index à partir de la configuration.
+
+    Args:
+        embeddings (Embeddings): Le modèle d'embedding des requêtes.
+        engine (Optional[PostgresEngine]): La connexion Cloud SQL (celle du processus si absente).
+        example_selector (Optional[EmbeddingExampleSelector]): Le sélecteur des exemples du prompt (créé si absent).
+
+    Returns:
+        RetrievalQA: La chaîne QA.
+    """
+    if engine is None:
+        logging.info("Connexion à la base de données...")
+        engine = create_cloud_sql_database_connection()
+    logging.info("Chargement du modèle d'embedding...")
+    check_index_embedding_model(engine)
+    logging.info("Création du vector store...")
+    vector_store = await get_vector_store(engine, embeddings)
+    vector_index = None
+    if RETRIEVER_BACKEND == "numpy":
+        logging.info("Chargement de l'index vectoriel en mémoire...")
+        vector_index = build_vector_index(engine, VECTOR_INDEX_PATH, VECTOR_INDEX_REFRESH_SECONDS)
+    lexical_index = None
+    if LEXICAL_SEARCH_ENABLED:
+        logging.info("Construction de l'index lexical BM25...")
+        lexical_index = build_lexical_index(engine, LEXICAL_INDEX_REFRESH_SECONDS)
+    reranker = None
+    if RERANK_ENABLED:
+        reranker = CrossEncoderReranker(
+            model_name=RERANK_MODEL,
+            fetch_k=RERANK_FETCH_K,
+            top_n=RERANK_TOP_N,
+            max_tokens=RERANK_MAX_TOKENS,
+            batch_size=RERANK_BATCH_SIZE,
+            time_budget=RERANK_TIME_BUDGET,
+            skip=RERANK_SKIP,
+        )
+    if example_selector is None:
+        logging.info("Calcul des vecteurs des exemples du prompt...")
+        example_selector = await abuild_example_selector(embeddings)
+    logging.info("Création de la chaîne QA...")
+    qa_chain = await get_chain(
+        vector_store=vector_store,
+        vector_index=vector_index,
+        lexical_index=lexical_index,
+        reranker=reranker,
+        context_packing=CONTEXT_PACKING_ENABLED,
+        context_max_tokens=CONTEXT_MAX_TOKENS,
+        adaptive_k=ADAPTIVE_K_ENABLED,
+        max_k=ADAPTIVE_K_MAX,
+        engine=engine,
+        chunk_cache=ChunkContentCache(CHUNK_CACHE_MAX_BYTES) if TWO_PHASE_RETRIEVAL_ENABLED else None,
+        fallback_model=LLM_FALLBACK_MODEL,
+        hedge_delay=LLM_HEDGE_DELAY,
+        llm_breaker=build_llm_breaker(),
+        sql_breaker=build_circuit_breaker("cloud_sql", CLOUD_SQL_SLOW_SECONDS),
+        search_budget_share=SEARCH_BUDGET_SHARE,
+        dependency_retries=DEPENDENCY_RETRIES,
+        example_selector=example_selector,
+        adaptive_budget=ADAPTIVE_OUTPUT_BUDGET_ENABLED
+    )
+    if qa_chain is None:
+        raise RuntimeError("La chaîne QA n'a pas pu être créée.")
+    logging.info("Chaîne QA initialisée avec succès.")
+    return qa_chain
+
+
+def get_routed_response(prompt: str) -> Optional[dict]:
+    """
+    Retourne une réponse fixe immédiate pour les salutations, saisies inexploitables
+    et questions non françaises, ou None si la question doit passer par la chaîne QA.
+    """
+    if not QUERY_ROUTER_ENABLED:
+        return None
+    route = route_query(prompt)
+    if route.response is None:
+        return None
+    return {"query": prompt, "result": route.response, "source_documents": []}
+
+
+class RagService:
+    """
+    Répond aux questions avec la chaîne QA : routage, cache sémantique, regroupement
+    des questions identiques en cours et contrôle d'admission. Indépendant de Streamlit,
+    il est utilisé aussi bien par l'application que par le service HTTP (`api.py`).
+
+    Seuls les appels à la chaîne QA passent par le contrôle d'admission ; une requête
+    délestée lève `AdmissionRejected`. Chaque question dispose d'une échéance de
+    `deadline` secondes, répartie entre l'embedding, la recherche et la génération,
+    et d'un budget de génération selon son type (`question_class_scope`).
+    """
+
+    def __init__(
+        self,
+        qa_chain: RetrievalQA,
+        query_embeddings: Embeddings,
+        semantic_cache: SemanticCache,
+        single_flight: SingleFlight,
+        admission: Optional[AdmissionController] = None,
+        regeneration_chain=None,
+        deadline: float = REQUEST_DEADLINE,
+    ):
+        self.qa_chain = qa_chain
+        self.query_embeddings = query_embeddings
+        self.semantic_cache = semantic_cache
+        self.single_flight = single_flight
+        self.admission = admission or AdmissionController(max_in_flight=1 << 30, max_queue=0)
+        self.regeneration_chain = regeneration_chain
+        self.deadline = deadline
+
+    @classmethod
+    async def create(cls) -> "RagService":
+        query_embeddings = build_query_embeddings()
+        engine = create_cloud_sql_database_connection()
+        example_selector = await abuild_example_selector(query_embeddings)
+        qa_chain = await abuild_qa_chain(query_embeddings, engine, example_selector)
+        return cls(
+            qa_chain,
+            query_embeddings,
+            build_semantic_cache(engine),
+            SingleFlight(),
+            build_admission_controller(),
+            build_regeneration_chain(example_selector),
+        )
+
+    # Recherche d'une question similaire déjà traitée dans le cache sémantique. Les questions
+    # traitées par la seule recherche lexicale n'y passent pas : leur embedding coûterait l'appel évité
+    async def _lookup_semantic_cache(self, prompt: str):
+        is_fast_path = getattr(self.qa_chain.retriever, "is_lexical_fast_path", None)
+        if is_fast_path is not None and is_fast_path(prompt):
+            return None, None
+        query_embedding = await self.query_embeddings.aembed_query(prompt)
+        return query_embedding, self.semantic_cache.lookup(query_embedding)
+
+    async def answer(self, prompt: str) -> Optional[dict]:
+        """
+        Génère la réponse complète à une question (None en cas d'échec).
+        """
+        routed_response = get_routed_response(prompt)
+        if routed_response is not None:
+            return routed_response
+
+        async def compute():
+            query_embedding, cached_response = await self._lookup_semantic_cache(prompt)
+            if cached_response is not None:
+                return cached_response
+
+            logging.info(f"Prompt envoyé à la chaîne QA : {prompt}")
+            async with self.admission.admit():
+                response = await self.qa_chain.ainvoke({"query": prompt})
+            logging.info(f"Réponse reçue de la chaîne QA : {response}")
+            if not response or not response.get("result"):
+                logging.error("La réponse générée est None ou vide.")
+                return None
+            if query_embedding is not None:
+                self.semantic_cache.store(prompt, query_embedding, response)
+            return response
+
+        try:
+            # Les questions identiques posées au même moment partagent un seul appel
+            with request_deadline(self.deadline), question_class_scope(prompt):
+                return await self.single_flight.do(prompt, compute)
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            logging.error(f"Erreur lors de la génération de la réponse : {e}")
+            return None
+
+    async def astream_answer(self, prompt: str, on_token: Callable[[str], None]) -> Optional[dict]:
+        """
+        Génère la réponse en transmettant chaque token à `on_token`, puis retourne la réponse complète.
+        Si la même question est déjà en cours, sa réponse complète est attendue sans streaming.
+        """
+        routed_response = get_routed_response(prompt)
+        if routed_response is not None:
+            return routed_response
+
+        async def compute():
+            query_embedding, cached_response = await self._lookup_semantic_cache(prompt)
+            if cached_response is not None:
+                return cached_response
+
+            logging.info(f"Prompt envoyé à la chaîne QA (streaming) : {prompt}")
+            response = None
+            async with self.admission.admit():
+                async for event in astream_response(self.qa_chain, prompt):
+                    if "token" in event:
+                        on_token(event["token"])
+                    else:
+                        response = event["response"]
+            logging.info(f"Réponse reçue de la chaîne QA : {response}")
+            if not response or not response.get("result"):
+                logging.error("La réponse générée est None ou vide.")
+                return None
+            if query_embedding is not None:
+                self.semantic_cache.store(prompt, query_embedding, response)
+            return response
+
+        with request_deadline(self.deadline), question_class_scope(prompt):
+            return await self.single_flight.do(prompt, compute)
+
+    async def regenerate(self, prompt: str, source_documents: List[Document]) -> Optional[dict]:
+        """
+        Génère une nouvelle réponse sur les documents déjà récupérés pour la question,
+        sans embedding ni recherche (None en cas d'échec).
+        """
+        if self.regeneration_chain is None:
+            raise RuntimeError("Aucune chaîne de régénération n'est configurée.")
+        try:
+            with request_deadline(self.deadline), question_class_scope(prompt):
+                async with self.admission.admit():
+                    return await regenerate_response(self.regeneration_chain, prompt, source_documents)
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            logging.error(f"Erreur lors de la régénération de la réponse : {e}")
+            return None
+
+    def stats(self) -> dict:
+        return {
+            "semantic_cache": {
+                "size": len(self.semantic_cache),
+                "hits": self.semantic_cache.hits,
+                "misses": self.semantic_cache.misses,
+            },
+            "single_flight": self.single_flight.stats(),
+            "admission": self.admission.stats(),
+            "database_pool": pool_stats(),
+            "circuit_breakers": circuit_breaker_stats(),
+            "generation_by_question_class": GENERATION_STATS.stats(),
+            "reranker": self._reranker_stats(),
+        }
+
+    # Métriques du reranker de la chaîne QA (None s'il n'est pas activé)
+    def _reranker_stats(self) -> Optional[dict]:
+        reranker = getattr(getattr(self.qa_chain, "retriever", None), "reranker", None)
+        return reranker.stats.as_dict() if reranker is not None else None
@@ -0,0 +1,118 @@
+import re
+import asyncio
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict
+
+from lib.lexical_index import fold_accents
+
+# Résultat transmis aux requêtes en attente quand le calcul partagé a été annulé
+_CANCELLED = object()
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalise une question pour la comparer à d'autres : minuscules, accents,
+    ponctuation finale et espaces multiples supprimés.
+    """
+    question = re.sub(r"\s+", " ", fold_accents(question)).strip()
+    return question.rstrip(" ?!.")
+
+
+class SingleFlight:
+    """
+    Regroupe les questions identiques en cours de traitement : la première requête
+    calcule la réponse, les requêtes identiques concurrentes attendent le même résultat.
+
+    Les sessions Streamlit tournant dans des threads (et boucles asyncio) différents,
+    le résultat est partagé via un `concurrent.futures.Future`.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.saved_calls: Counter = Counter()
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    async def do(self, question: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Exécute `func` si aucune question identique n'est en cours, sinon attend son résultat.
+
+        Args:
+            question (str): La question, normalisée pour servir de clé.
+            func (Callable[[], Awaitable[Any]]): La fonction asynchrone calculant la réponse.
+
+        Returns:
+            Any: Le résultat de `func`, éventuellement calculé par une autre requête.
+        """
+        key = normalize_question(question)
+        while True:
+            with self._lock:
+                future = self._in_flight.get(key)
+                leader = future is None
+                if leader:
+                    future = Future()
+                    # Passé à l'état « en cours » : l'annulation d'une requête en attente ne l'annule pas
+                    future.set_running_or_notify_cancel()
+                    self._in_flight[key] = future
+                    self.calls += 1
+                    followers = self.saved_calls[key]
+                else:
+                    self.saved_calls[key] += 1
+
+            if leader:
+                return await self._lead(key, future, func, followers)
+
+            logging.info(f"Single-flight : question déjà en cours de traitement, attente du résultat ({key}).")
+            result = await asyncio.wrap_future(future)
+            if result is not _CANCELLED:
+                return result
+            # Le calcul partagé a été annulé avec la requête initiale : nouvel essai, éventuellement en tête
+            logging.info(f"Single-flight : calcul partagé annulé, nouvel essai ({key}).")
+
+    async def _lead(self, key: str, future: Future, func: Callable[[], Awaitable[Any]], followers: int) -> Any:
+        """
+        Calcule la réponse dans une tâche distincte, pour que l'annulation de la requête initiale
+        n'interrompe pas le calcul attendu par les requêtes identiques.
+        """
+        task = asyncio.ensure_future(func())
+        task.add_done_callback(lambda task: self._complete(key, future, task))
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            with self._lock:
+                alone = self.saved_calls[key] == followers
+            # Personne d'autre n'attend ce résultat : inutile de poursuivre le calcul
+            if alone:
+                task.cancel()
+            raise
+
+    def _complete(self, key: str, future: Future, task: asyncio.Future) -> None:
+        """
+        Libère la question et transmet le résultat du calcul aux requêtes en attente.
+        """
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+            saved = self.saved_calls[key]
+        if task.cancelled():
+            future.set_result(_CANCELLED)
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+        if saved:
+            logging.info(f"Single-flight : {saved} appel(s) évité(s) au total pour la question ({key}).")
+
+    def stats(self) -> dict:
+        """
+        Retourne le nombre de calculs effectués et d'appels évités, au total et par question.
+        """
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "saved_calls": sum(self.saved_calls.values()),
+                "saved_calls_by_question": dict(self.saved_calls.most_common(20)),
+            }
@@ -1,4 +1,5 @@
 import collections
+import logging
 from typing import List
 from langchain.schema import Document
 from lib.errors_handler import traceback_no_record_found_in_sql
@@ -19,4 +20,34 @@ def list_top_k_sources(source_documents: List[Document], k=3) -> str:
         k = min(k, len(sources))
         distinct_sources = list(zip(*collections.Counter(sources).most_common()))[0][:k]
         distinct_sources_str = "  \n- ".join(distinct_sources)
-        return f"Source(s):  \n- {distinct_sources_str}"
\ No newline at end of file
+        return f"Source(s):  \n- {distinct_sources_str}"
+
+
+def format_answer_with_source(response: dict, min_score: float = 0.65) -> str:
+    """
+    Retourne la réponse de la chaîne QA, suivie de la meilleure source si son score
+    de similarité cosinus est suffisant (les chunks trouvés par BM25 seul ne sont pas cités).
+    """
+    answer = response["result"]
+    source_documents = [
+        doc for doc in response.get("source_documents", [])
+        if doc.metadata.get("similarity_type") != "bm25"
+    ]
+    if not source_documents:
+        logging.info("\nNo relevant sources found.")
+        return answer
+
+    best_doc = max(
+        source_documents,
+        key=lambda doc: doc.metadata.get("similarity_score", 0)
+    )
+    similarity_score = best_doc.metadata.get("similarity_score", 0)
+    if similarity_score < min_score:
+        logging.info(f"\nScore de similarité inférieur à {min_score}. Afficher uniquement la réponse du modèle.")
+        return answer
+
+    answer += f"\n\n**Source :** {best_doc.metadata.get('source', 'N/A')}\n"
+    answer += f"\n**Focus Area :** {best_doc.metadata.get('focus_area', 'N/A')}\n"
+    answer += f"\n**Similarity Score :** {similarity_score}\n"
+    answer += f"\n**Similarity Type :** {best_doc.metadata.get('similarity_type', 'N/A')}"
+    return answer
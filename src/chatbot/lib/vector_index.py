@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def parse_embedding(value) -> np.ndarray:
+    """
+    Convertit un embedding pgvector (chaîne "[...]" ou liste) en vecteur float32.
+    """
+    if isinstance(value, str):
+        return np.array(value.strip("[]").split(","), dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+class NumpyVectorIndex:
+    """
+    Réplique en mémoire de la table MI_RAG pour la recherche par similarité cosinus.
+
+    Les embeddings sont stockés dans une matrice float32 contiguë et normalisée,
+    ce qui permet de répondre à un top-k avec un seul produit matriciel.
+    La matrice peut être sauvegardée sur disque puis rechargée en memory-map.
+
+    Un rafraîchissement remplace toutes les données d'un coup : chaque recherche lit
+    la matrice, les contenus et les métadonnées d'une même version de l'index.
+    """
+
+    EMBEDDINGS_FILE = "embeddings.npy"
+    ROWS_FILE = "rows.json"
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.contents: List[str] = []
+        self.metadatas: List[dict] = []
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.last_refresh: Optional[float] = None
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def refresh(self, rows: Sequence[dict]) -> None:
+        """
+        Reconstruit l'index à partir des lignes de la table.
+
+        Args:
+            rows (Sequence[dict]): Lignes avec les clés `langchain_id`, `content`,
+                `embedding` et `langchain_metadata`.
+        """
+        ids = [str(row["langchain_id"]) for row in rows]
+        contents = [row["content"] for row in rows]
+        metadatas = [row.get("langchain_metadata") or {} for row in rows]
+        if rows:
+            matrix = np.stack([parse_embedding(row["embedding"]) for row in rows])
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix = np.ascontiguousarray(matrix / norms, dtype=np.float32)
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+
+        # Remplacement atomique pour ne pas bloquer les recherches en cours
+        with self._lock:
+            self.ids, self.contents, self.metadatas, self.matrix = ids, contents, metadatas, matrix
+            self.last_refresh = time.time()
+        logging.info(f"Index vectoriel en mémoire rafraîchi : {len(ids)} chunks.")
+
+    def _snapshot(self) -> Tuple[List[str], List[str], List[dict], np.ndarray]:
+        with self._lock:
+            return self.ids, self.contents, self.metadatas, self.matrix
+
+    def search(self, embedding: Sequence[float], k: int = 4) -> List[Tuple[str, str, dict, float]]:
+        """
+        Retourne les k chunks les plus proches et leur score de similarité cosinus.
+
+        Args:
+            embedding (Sequence[float]): L'embedding de la requête.
+            k (int): Le nombre de résultats.
+
+        Returns:
+            List[Tuple[str, str, dict, float]]: Les (identifiant, contenu, métadonnées, score)
+            triés par score décroissant.
+        """
+        ids, contents, metadatas, matrix = self._snapshot()
+        if matrix.shape[0] == 0:
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        scores = matrix @ query
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i], contents[i], metadatas[i], float(scores[i])) for i in top]
+
+    def search_batch(
+        self, embeddings: Sequence[Sequence[float]], k: int = 4
+    ) -> List[List[Tuple[str, str, dict, float]]]:
+        """
+        Recherche les k chunks les plus proches pour plusieurs requêtes avec un seul produit matriciel.
+
+        Args:
+            embeddings (Sequence[Sequence[float]]): Les embeddings des requêtes.
+            k (int): Le nombre de résultats par requête.
+
+        Returns:
+            List[List[Tuple[str, str, dict, float]]]: Les résultats de chaque requête, au format de `search`.
+        """
+        ids, contents, metadatas, matrix = self._snapshot()
+        if matrix.shape[0] == 0 or len(embeddings) == 0:
+            return [[] for _ in embeddings]
+
+        queries = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        scores = (queries / norms) @ matrix.T
+
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in zip(scores, top):
+            candidates = candidates[np.argsort(-row[candidates])]
+            results.append([(ids[i], contents[i], metadatas[i], float(row[i])) for i in candidates])
+        return results
+
+    def save(self, directory: str) -> None:
+        """
+        Sauvegarde l'index sur disque (matrice .npy et lignes JSON).
+
+        Les fichiers sont écrits à côté puis renommés : une matrice chargée
+        en memory-map depuis l'ancienne copie reste lisible.
+        """
+        ids, contents, metadatas, matrix = self._snapshot()
+        os.makedirs(directory, exist_ok=True)
+        embeddings_path = os.path.join(directory, self.EMBEDDINGS_FILE)
+        rows_path = os.path.join(directory, self.ROWS_FILE)
+        with open(embeddings_path + ".tmp", mode="wb") as file:
+            np.save(file, matrix)
+        with open(rows_path + ".tmp", mode="w", encoding="utf-8") as file:
+            json.dump({"ids": ids, "contents": contents, "metadatas": metadatas}, file, ensure_ascii=False)
+        os.replace(embeddings_path + ".tmp", embeddings_path)
+        os.replace(rows_path + ".tmp", rows_path)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "NumpyVectorIndex":
+        """
+        Charge un index sauvegardé, la matrice étant mappée en mémoire par défaut.
+        """
+        index = cls()
+        index.matrix = np.load(
+            os.path.join(directory, cls.EMBEDDINGS_FILE), mmap_mode="r" if mmap else None
+        )
+        with open(os.path.join(directory, cls.ROWS_FILE), encoding="utf-8") as file:
+            rows = json.load(file)
+        index.ids, index.contents, index.metadatas = rows["ids"], rows["contents"], rows["metadatas"]
+        if len(index.ids) != index.matrix.shape[0]:
+            raise ValueError(
+                f"Copie de l'index incohérente dans {directory} : "
+                f"{len(index.ids)} lignes pour {index.matrix.shape[0]} embeddings."
+            )
+        index.last_refresh = os.path.getmtime(os.path.join(directory, cls.ROWS_FILE))
+        return index
+
+    def start_background_refresh(
+        self,
+        loader: Callable[[], Sequence[dict]],
+        interval: float,
+        directory: str = "",
+        refresh_now: bool = False,
+    ) -> None:
+        """
+        Rafraîchit l'index dans un thread en arrière-plan, toutes les `interval` secondes.
+
+        Args:
+            loader (Callable[[], Sequence[dict]]): Fonction qui charge les lignes de la table.
+            interval (float): L'intervalle entre deux rafraîchissements, en secondes (0 pour aucun).
+            directory (str): Le dossier où sauvegarder l'index après chaque rafraîchissement (optionnel).
+            refresh_now (bool): Rafraîchit une première fois sans attendre, par exemple
+                après le chargement d'une copie sur disque.
+        """
+        if self._refresh_thread is not None or (interval <= 0 and not refresh_now):
+            return
+
+        def run():
+            delay = 0 if refresh_now else interval
+            while True:
+                time.sleep(delay)
+                try:
+                    self.refresh(loader())
+                    if directory:
+                        self.save(directory)
+                except Exception as e:
+                    logging.error(f"Erreur lors du rafraîchissement de l'index vectoriel : {e}")
+                if interval <= 0:
+                    return
+                delay = interval
+
+        self._refresh_thread = threading.Thread(target=run, daemon=True)
+        self._refresh_thread.start()
@@ -0,0 +1,114 @@
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence
+
+# Question et consigne courtes utilisées pour le préchauffage
+WARMUP_PROMPT = "Réponds uniquement par « OK »."
+
+
+@dataclass
+class Readiness:
+    """
+    État de préchauffage du processus : prêt seulement une fois toutes les étapes réussies.
+    """
+    ready: bool = False
+    error: Optional[str] = None
+    attempts: int = 0
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        if self.ready:
+            status = "ready"
+        elif self.error:
+            status = "failed"
+        else:
+            status = "warming_up"
+        return {
+            "status": status,
+            "error": self.error,
+            "attempts": self.attempts,
+            "timings_ms": {stage: round(1000 * seconds, 1) for stage, seconds in self.timings.items()},
+        }
+
+
+async def warm_up(
+    service, question: str, readiness: Optional[Readiness] = None, batch_questions: Sequence[str] = ()
+) -> Readiness:
+    """
+    Préchauffe la chaîne QA : un embedding, une recherche (qui charge aussi les index,
+    le reranker et le cache des chunks), une recherche groupée des questions fréquentes
+    et une courte génération, sans passer par le cache sémantique ni le contrôle d'admission.
+
+    Args:
+        service (RagService): Le service à préchauffer.
+        question (str): La question utilisée pour l'embedding et la recherche.
+        readiness (Optional[Readiness]): L'état à mettre à jour (créé si absent).
+        batch_questions (Sequence[str]): Les questions recherchées en un seul appel
+            (`abatch_search` du retriever) ; l'étape est omise si elle est vide.
+
+    Returns:
+        Readiness: L'état de préchauffage, avec la durée de chaque étape.
+    """
+    readiness = readiness or Readiness()
+    qa_chain = service.qa_chain
+    stages = [
+        ("embedding", lambda: service.query_embeddings.aembed_query(question)),
+        ("retrieval", lambda: qa_chain.retriever.ainvoke(question)),
+    ]
+    if batch_questions:
+        stages.append(("batch_retrieval", lambda: qa_chain.retriever.abatch_search(list(batch_questions))))
+    stages += [
+        ("generation", lambda: qa_chain.combine_documents_chain.llm_chain.llm.ainvoke(WARMUP_PROMPT)),
+    ]
+    try:
+        for stage, run in stages:
+            start = time.perf_counter()
+            result = await run()
+            readiness.timings[stage] = time.perf_counter() - start
+            if stage == "retrieval" and not result:
+                logging.warning("Préchauffage : aucun document trouvé pour la question de préchauffage.")
+        readiness.ready = True
+        logging.info(f"Préchauffage terminé : {readiness.as_dict()['timings_ms']}")
+    except Exception as e:
+        readiness.error = f"{stage} : {e}"
+        logging.error(f"Échec du préchauffage à l'étape {stage} : {e}")
+    return readiness
+
+
+async def warm_up_with_retry(
+    service,
+    question: str,
+    readiness: Optional[Readiness] = None,
+    batch_questions: Sequence[str] = (),
+    attempts: int = 3,
+    delay: float = 5.0,
+    max_delay: float = 300.0,
+) -> Readiness:
+    """
+    Préchauffe la chaîne QA (`warm_up`) et recommence en cas d'échec, après `delay` secondes
+    doublées à chaque nouvel échec (au plus `max_delay`).
+
+    Args:
+        service (RagService): Le service à préchauffer.
+        question (str): La question utilisée pour l'embedding et la recherche.
+        readiness (Optional[Readiness]): L'état à mettre à jour (créé si absent).
+        batch_questions (Sequence[str]): Les questions recherchées en un seul appel.
+        attempts (int): Le nombre maximal de tentatives (0 pour réessayer indéfiniment).
+        delay (float): L'attente avant la deuxième tentative, en secondes.
+        max_delay (float): L'attente maximale entre deux tentatives, en secondes.
+
+    Returns:
+        Readiness: L'état de la dernière tentative.
+    """
+    readiness = readiness or Readiness()
+    while True:
+        readiness.attempts += 1
+        readiness.error = None
+        await warm_up(service, question, readiness, batch_questions)
+        if readiness.ready or (attempts and readiness.attempts >= attempts):
+            return readiness
+        logging.warning(f"Nouvelle tentative de préchauffage dans {delay:.1f}s (tentative {readiness.attempts}).")
+        await asyncio.sleep(delay)
+        delay = min(2 * delay, max_delay)
@@ -0,0 +1,206 @@
+"""
+Test de charge du service HTTP de la chaîne QA (`api.py`).
+
+Envoie des questions en parallèle à `/ask` ou `/ask/stream` et affiche le débit, les
+codes de réponse et les latences (p50/p95, et temps jusqu'au premier token en streaming).
+Avec `--stand-in`, le service est démarré dans le processus avec le vrai `RagService`
+(cache sémantique, single-flight, contrôle d'admission) mais des substituts locaux de
+Vertex AI et Cloud SQL, aux latences simulées : aucune dépendance GCP n'est appelée.
+
+Usage (depuis src/chatbot) :
+    python load_test.py --stand-in --concurrency 50 --requests 500
+    python load_test.py --url http://localhost:8000 --stream --concurrency 20
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+import hashlib
+from collections import Counter
+from typing import List, Optional
+
+import aiohttp
+from aiohttp import web
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessageChunk
+
+QUESTIONS = [
+    "Quels sont les symptômes du cancer du sein ?",
+    "Qu'est-ce qu'une mammographie ?",
+    "Quels sont les traitements du cancer du poumon ?",
+    "Quelle est la différence entre une tumeur bénigne et maligne ?",
+    "Quels sont les effets secondaires de la chimiothérapie ?",
+    "Comment se déroule le dépistage du cancer colorectal ?",
+    "Quels sont les facteurs de risque du cancer de la prostate ?",
+    "Qu'est-ce que l'immunothérapie ?",
+]
+
+
+class StandInEmbeddings(Embeddings):
+    """
+    Substitut du modèle d'embedding Vertex AI : un vecteur déterministe par texte, après `latency` secondes.
+    """
+
+    def __init__(self, latency: float, dimension: int = 64):
+        self.latency = latency
+        self.dimension = dimension
+
+    def _vector(self, text: str) -> List[float]:
+        rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+        return [rng.gauss(0, 1) for _ in range(self.dimension)]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return self._vector(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        return self._vector(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+
+class StandInChain:
+    """
+    Substitut de la chaîne QA : une recherche Cloud SQL de `search_latency` secondes,
+    puis `tokens` tokens générés toutes les `token_latency` secondes.
+    """
+
+    def __init__(self, search_latency: float, token_latency: float, tokens: int):
+        self.search_latency = search_latency
+        self.token_latency = token_latency
+        self.tokens = tokens
+
+    def _response(self, query: str) -> dict:
+        document = Document(
+            page_content="Contenu d'un document médical.",
+            metadata={"source": "stand-in", "focus_area": "test", "similarity_score": 0.9},
+        )
+        return {"query": query, "result": " ".join(["mot"] * self.tokens), "source_documents": [document]}
+
+    async def ainvoke(self, inputs: dict) -> dict:
+        await asyncio.sleep(self.search_latency + self.tokens * self.token_latency)
+        return self._response(inputs["query"])
+
+    async def astream_events(self, inputs: dict, version: str = "v2"):
+        await asyncio.sleep(self.search_latency)
+        for _ in range(self.tokens):
+            await asyncio.sleep(self.token_latency)
+            yield {"event": "on_chat_model_stream", "data": {"chunk": AIMessageChunk(content="mot ")}}
+        yield {"event": "on_chain_end", "parent_ids": [], "data": {"output": self._response(inputs["query"])}}
+
+
+def create_stand_in_app(args) -> web.Application:
+    from api import create_app
+    from lib.service import RagService, build_semantic_cache, build_admission_controller
+    from lib.single_flight import SingleFlight
+
+    service = RagService(
+        StandInChain(args.search_latency, args.token_latency, args.tokens),
+        StandInEmbeddings(args.embedding_latency),
+        build_semantic_cache(),
+        SingleFlight(),
+        build_admission_controller(),
+    )
+    return create_app(service)
+
+
+def percentile(values: List[float], share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else 0.0
+
+
+async def send(session: aiohttp.ClientSession, url: str, question: str, stream: bool) -> dict:
+    start = time.perf_counter()
+    first_token: Optional[float] = None
+    try:
+        path = "/ask/stream" if stream else "/ask"
+        async with session.post(f"{url}{path}", json={"question": question}) as resp:
+            if stream and resp.status == 200:
+                async for line in resp.content:
+                    if first_token is None and "token" in json.loads(line):
+                        first_token = time.perf_counter() - start
+            else:
+                await resp.read()
+            status = resp.status
+    except aiohttp.ClientError as e:
+        status = type(e).__name__
+    return {"status": status, "seconds": time.perf_counter() - start, "first_token": first_token}
+
+
+async def run_load(url: str, questions: List[str], requests: int, concurrency: int, stream: bool) -> List[dict]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        async def worker(i: int) -> dict:
+            async with semaphore:
+                return await send(session, url, questions[i % len(questions)], stream)
+
+        return await asyncio.gather(*(worker(i) for i in range(requests)))
+
+
+def report(results: List[dict], seconds: float) -> None:
+    ok = [result for result in results if result["status"] == 200]
+    latencies = [result["seconds"] for result in ok]
+    first_tokens = [result["first_token"] for result in ok if result["first_token"] is not None]
+
+    print(f"Requêtes : {len(results)} en {seconds:.2f} s ({len(results) / seconds:.1f} req/s)")
+    print("Statuts : " + ", ".join(f"{status} x{count}" for status, count in Counter(r["status"] for r in results).items()))
+    print(f"Latence (200) : p50 {1000 * percentile(latencies, 0.5):.0f} ms, p95 {1000 * percentile(latencies, 0.95):.0f} ms")
+    if first_tokens:
+        print(
+            f"Premier token : p50 {1000 * percentile(first_tokens, 0.5):.0f} ms, "
+            f"p95 {1000 * percentile(first_tokens, 0.95):.0f} ms"
+        )
+
+
+async def main_async(args) -> None:
+    runner = None
+    url = args.url.rstrip("/")
+    if args.stand_in:
+        runner = web.AppRunner(create_stand_in_app(args))
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        url = f"http://127.0.0.1:{port}"
+        print(f"Service de substitution démarré sur {url}")
+
+    # Un suffixe par requête évite que toutes les questions soient servies par le cache sémantique
+    questions = QUESTIONS if args.repeat else [
+        f"{QUESTIONS[i % len(QUESTIONS)]} ({i})" for i in range(args.requests)
+    ]
+    try:
+        start = time.perf_counter()
+        results = await run_load(url, questions, args.requests, args.concurrency, args.stream)
+        report(results, time.perf_counter() - start)
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge du service HTTP de la chaîne QA.")
+    parser.add_argument("--url", default="http://localhost:8000", help="URL du service (ignorée avec --stand-in).")
+    parser.add_argument("--stand-in", action="store_true", help="Démarre le service avec des substituts locaux.")
+    parser.add_argument("--requests", type=int, default=200, help="Nombre total de requêtes.")
+    parser.add_argument("--concurrency", type=int, default=20, help="Nombre de requêtes simultanées.")
+    parser.add_argument("--stream", action="store_true", help="Utilise /ask/stream au lieu de /ask.")
+    parser.add_argument("--repeat", action="store_true", help="Répète les mêmes questions (cache et single-flight).")
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="Latence simulée de l'embedding (s).")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="Latence simulée de Cloud SQL (s).")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="Durée simulée par token généré (s).")
+    parser.add_argument("--tokens", type=int, default=50, help="Nombre de tokens par réponse simulée.")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Rapport du temps d'import au démarrage du chatbot.
+
+Importe les modules chargés par `app.py` au démarrage dans un processus Python neuf
+lancé avec `-X importtime`, puis agrège le temps d'import par package.
+
+Usage (depuis src/chatbot) :
+    python startup_report.py
+    python startup_report.py --top 30 eval
+"""
+import os
+import re
+import sys
+import argparse
+import subprocess
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# Modules importés par app.py avant l'affichage de la première page
+STARTUP_MODULES = [
+    "streamlit",
+    "vertexai",
+    "google.cloud.aiplatform",
+    "lib.feedback",
+    "lib.callbacks",
+    "lib.source_retriever",
+]
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def measure_imports(modules: List[str]) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """
+    Mesure le temps d'import de modules dans un interpréteur neuf.
+
+    Returns:
+        Tuple[Dict[str, int], Dict[str, int]]: Le temps propre par package de premier niveau
+        et le temps cumulé de chaque module demandé, en microsecondes.
+    """
+    code = "\n".join(f"import {module}" for module in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"L'import a échoué :\n{result.stderr[-2000:]}")
+
+    self_by_package: Dict[str, int] = defaultdict(int)
+    cumulative_by_module: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = int(match[1]), int(match[2]), match[3], match[4]
+        self_by_package[name.split(".")[0]] += self_us
+        # Les modules demandés sont ceux importés au premier niveau (indentation minimale)
+        if len(indent) == 1 and name in modules:
+            cumulative_by_module[name] = cumulative_us
+    return self_by_package, cumulative_by_module
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps d'import au démarrage du chatbot.")
+    parser.add_argument("modules", nargs="*", default=STARTUP_MODULES, help="Modules à importer.")
+    parser.add_argument("--top", type=int, default=20, help="Nombre de packages affichés.")
+    args = parser.parse_args()
+
+    self_by_package, cumulative_by_module = measure_imports(args.modules)
+    total = sum(self_by_package.values())
+
+    print(f"Temps d'import total : {total / 1e6:.2f} s\n")
+    print("Par module importé (cumulé) :")
+    for module in args.modules:
+        print(f"  {module:<40} {cumulative_by_module.get(module, 0) / 1e3:>10.1f} ms")
+    print(f"\nPackages les plus coûteux (temps propre, top {args.top}) :")
+    for package, self_us in sorted(self_by_package.items(), key=lambda item: item[1], reverse=True)[: args.top]:
+        print(f"  {package:<40} {self_us / 1e3:>10.1f} ms  {100 * self_us / total:5.1f} %")
+
+
+if __name__ == "__main__":
+    main()
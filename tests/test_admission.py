@@ -0,0 +1,52 @@
+import asyncio
+import unittest
+from src.chatbot.lib.admission import AdmissionController, AdmissionRejected
+
+
+class TestAdmissionController(unittest.TestCase):
+    def test_excess_requests_are_queued_then_shed(self):
+        """
+        Teste que les requêtes au-delà de la capacité attendent, puis sont rejetées quand la file est pleine.
+        """
+        controller = AdmissionController(max_in_flight=2, max_queue=1, queue_timeout=1.0)
+        order = []
+
+        async def request(name, duration):
+            async with controller.admit():
+                order.append(name)
+                await asyncio.sleep(duration)
+            return name
+
+        async def scenario():
+            tasks = [asyncio.ensure_future(request(f"r{i}", 0.05)) for i in range(4)]
+            return await asyncio.gather(*tasks, return_exceptions=True)
+
+        results = asyncio.run(scenario())
+
+        self.assertEqual(results[:3], ["r0", "r1", "r2"])
+        self.assertIsInstance(results[3], AdmissionRejected)
+        self.assertEqual(order, ["r0", "r1", "r2"])
+        stats = controller.stats()
+        self.assertEqual((stats["admitted"], stats["rejected"], stats["in_flight"], stats["queue_depth"]), (3, 1, 0, 0))
+
+    def test_queue_timeout_rejects_without_leaking_slots(self):
+        """
+        Teste qu'une requête en attente au-delà du délai est rejetée et que les places restent cohérentes.
+        """
+        controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=0.05)
+
+        async def scenario():
+            await controller.acquire()
+            with self.assertRaises(AdmissionRejected):
+                await controller.acquire()
+            controller.release()
+            async with controller.admit():
+                pass
+
+        asyncio.run(scenario())
+        stats = controller.stats()
+        self.assertEqual((stats["timed_out"], stats["in_flight"], stats["queue_depth"]), (1, 0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+import os
+import sys
+import json
+import asyncio
+import unittest
+from unittest.mock import patch
+from aiohttp.test_utils import TestClient, TestServer
+from langchain_core.documents import Document
+
+# api.py importe les modules du chatbot comme le fait `python api.py` (depuis src/chatbot)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "chatbot"))
+for name in ("PROJECT_ID", "REGION", "INSTANCE", "DATABASE", "DB_PASSWORD", "TABLE_NAME", "DB_USER"):
+    os.environ.setdefault(name, "test")
+
+import api  # noqa: E402
+from api import INITIALIZATION_KEY, create_app  # noqa: E402
+from lib.admission import AdmissionRejected  # noqa: E402
+
+
+class FakeRagService:
+    """
+    Service RAG de substitution : réponses fixes, tokens émis toutes les `token_delay` secondes.
+    """
+
+    def __init__(self, tokens=("Bonjour", " !"), token_delay=0.0, rejected=False):
+        self.tokens = list(tokens)
+        self.token_delay = token_delay
+        self.rejected = rejected
+        self.cancelled = asyncio.Event()
+        self.regenerated = []
+
+    def _response(self, question, documents=None):
+        documents = documents or [Document(page_content="contexte", metadata={"source": "doc.pdf"})]
+        return {"query": question, "result": "".join(self.tokens), "source_documents": documents}
+
+    async def answer(self, question):
+        if self.rejected:
+            raise AdmissionRejected("file pleine")
+        return self._response(question)
+
+    async def astream_answer(self, question, on_token):
+        if self.rejected:
+            raise AdmissionRejected("file pleine")
+        try:
+            for token in self.tokens:
+                await asyncio.sleep(self.token_delay)
+                on_token(token)
+        except asyncio.CancelledError:
+            self.cancelled.set()
+            raise
+        return self._response(question)
+
+    async def regenerate(self, question, source_documents):
+        self.regenerated.append((question, source_documents))
+        return self._response(question, source_documents)
+
+    def stats(self):
+        return {"admission": {"in_flight": 0}}
+
+
+class TestApi(unittest.IsolatedAsyncioTestCase):
+    async def make_client(self, service):
+        client = TestClient(TestServer(create_app(service)))
+        await client.start_server()
+        self.addAsyncCleanup(client.close)
+        return client
+
+    async def test_ask_returns_answer_and_sources(self):
+        """
+        Teste que /ask retourne la réponse et ses sources en JSON.
+        """
+        client = await self.make_client(FakeRagService())
+
+        resp = await client.post("/ask", json={"question": "  Qu'est-ce qu'une biopsie ?  "})
+
+        self.assertEqual(resp.status, 200)
+        body = await resp.json()
+        self.assertEqual(body["query"], "Qu'est-ce qu'une biopsie ?")
+        self.assertEqual(body["result"], "Bonjour !")
+        self.assertEqual(body["source_documents"], [{"page_content": "contexte", "metadata": {"source": "doc.pdf"}}])
+
+    async def test_ask_validates_question_and_sheds_load(self):
+        """
+        Teste qu'une question absente donne 400 et qu'une requête délestée donne 503 avec Retry-After.
+        """
+        client = await self.make_client(FakeRagService(rejected=True))
+
+        self.assertEqual((await client.post("/ask", json={"question": " "})).status, 400)
+        self.assertEqual((await client.post("/ask", data="pas du json")).status, 400)
+        resp = await client.post("/ask", json={"question": "question"})
+        self.assertEqual(resp.status, 503)
+        self.assertIn("Retry-After", resp.headers)
+        self.assertEqual((await client.post("/ask/stream", json={"question": "question"})).status, 503)
+
+    async def test_ask_stream_sends_tokens_then_response(self):
+        """
+        Teste que /ask/stream envoie une ligne JSON par token, puis la réponse complète.
+        """
+        client = await self.make_client(FakeRagService())
+
+        resp = await client.post("/ask/stream", json={"question": "question"})
+
+        self.assertEqual(resp.status, 200)
+        events = [json.loads(line) for line in (await resp.text()).splitlines()]
+        self.assertEqual(events[:2], [{"token": "Bonjour"}, {"token": " !"}])
+        self.assertEqual(events[2]["response"]["result"], "Bonjour !")
+
+    async def test_ask_stream_cancels_generation_when_client_disconnects(self):
+        """
+        Teste que la génération est interrompue lorsque le client se déconnecte en cours de streaming.
+        """
+        service = FakeRagService(tokens=["mot "] * 1000, token_delay=0.005)
+        client = await self.make_client(service)
+
+        resp = await client.post("/ask/stream", json={"question": "question"})
+        self.assertEqual(json.loads(await resp.content.readline()), {"token": "mot "})
+        resp.close()
+
+        await asyncio.wait_for(service.cancelled.wait(), timeout=5)
+
+    async def test_regenerate_uses_given_documents(self):
+        """
+        Teste que /regenerate répond sur les documents envoyés par le client, sans nouvelle recherche.
+        """
+        service = FakeRagService()
+        client = await self.make_client(service)
+        documents = [{"page_content": "déjà récupéré", "metadata": {"source": "a.pdf"}}]
+
+        resp = await client.post("/regenerate", json={"question": "question", "source_documents": documents})
+
+        self.assertEqual(resp.status, 200)
+        self.assertEqual((await resp.json())["source_documents"], documents)
+        question, source_documents = service.regenerated[0]
+        self.assertEqual(question, "question")
+        self.assertEqual(source_documents[0].page_content, "déjà récupéré")
+
+    async def test_health_and_ready(self):
+        """
+        Teste que /health expose la readiness et les métriques du service, et que /ready répond 200.
+        """
+        client = await self.make_client(FakeRagService())
+
+        health = await (await client.get("/health")).json()
+        self.assertEqual(health["status"], "ok")
+        self.assertEqual(health["readiness"]["status"], "ready")
+        self.assertEqual(health["admission"], {"in_flight": 0})
+        self.assertEqual((await client.get("/ready")).status, 200)
+
+    async def test_initialization_is_retried_until_ready(self):
+        """
+        Teste qu'un échec de création du service est réessayé, et que /ready passe à 200 une fois le service créé.
+        """
+        from lib.service import RagService
+
+        attempts = []
+
+        async def create():
+            attempts.append(None)
+            if len(attempts) < 3:
+                raise RuntimeError("Cloud SQL indisponible")
+            return FakeRagService()
+
+        with patch.object(RagService, "create", side_effect=create), \
+                patch.object(api, "WARMUP_ENABLED", False), patch.object(api, "WARMUP_RETRY_SECONDS", 0.01):
+            client = TestClient(TestServer(create_app()))
+            await client.start_server()
+            self.addAsyncCleanup(client.close)
+            await asyncio.wait_for(client.app[INITIALIZATION_KEY], timeout=5)
+
+            resp = await client.get("/ready")
+
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(resp.status, 200)
+        self.assertIsNone((await resp.json())["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
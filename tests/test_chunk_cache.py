@@ -0,0 +1,55 @@
+import unittest
+from src.chatbot.lib.chunk_cache import ChunkContentCache
+
+
+class TestChunkContentCache(unittest.TestCase):
+    def test_hits_and_misses(self):
+        """
+        Teste que seuls les chunks présents sont retournés et que les succès et échecs sont comptés.
+        """
+        cache = ChunkContentCache()
+        cache.put("a", "contenu a", {"source": "a.pdf"})
+
+        self.assertEqual(cache.get_many(["a", "b"]), {"a": ("contenu a", {"source": "a.pdf"})})
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_eviction_is_bounded_in_bytes(self):
+        """
+        Teste que les chunks les moins récemment utilisés sont évincés dès que la taille en octets est dépassée.
+        """
+        entry_size = ChunkContentCache._entry_size("x" * 10, {})
+        cache = ChunkContentCache(max_bytes=2 * entry_size)
+        cache.put("a", "x" * 10, {})
+        cache.put("b", "y" * 10, {})
+        cache.get_many(["a"])
+        cache.put("c", "z" * 10, {})
+
+        self.assertEqual(set(cache.get_many(["a", "b", "c"])), {"a", "c"})
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.size_bytes, 2 * entry_size)
+
+    def test_multibyte_content_and_replacement(self):
+        """
+        Teste que la taille compte les octets UTF-8 et qu'un chunk remplacé n'est compté qu'une fois.
+        """
+        cache = ChunkContentCache(max_bytes=1000)
+        cache.put("a", "é" * 10, {})
+        self.assertEqual(cache.size_bytes, 20 + len("{}"))
+
+        cache.put("a", "e" * 10, {})
+        self.assertEqual(cache.size_bytes, 10 + len("{}"))
+        self.assertEqual(len(cache), 1)
+
+    def test_oversized_chunk_is_not_cached(self):
+        """
+        Teste qu'un chunk plus grand que le cache n'est pas ajouté et n'évince rien.
+        """
+        cache = ChunkContentCache(max_bytes=50)
+        cache.put("a", "petit", {})
+        cache.put("b", "x" * 100, {})
+
+        self.assertEqual(set(cache.get_many(["a", "b"])), {"a"})
+
+
+if __name__ == "__main__":
+    unittest.main()
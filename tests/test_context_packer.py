@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+
+# Les modules du chatbot s'importent entre eux en `lib.*`, comme dans l'application (depuis src/chatbot)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "chatbot"))
+for name in ("PROJECT_ID", "REGION", "INSTANCE", "DATABASE", "DB_PASSWORD", "TABLE_NAME", "DB_USER"):
+    os.environ.setdefault(name, "test")
+
+from lib.context_packer import find_overlap, merge_overlapping_chunks, pack_context  # noqa: E402
+
+
+def make_doc(content, source="cancer_sein.pdf", score=0.8):
+    return {
+        "content": content,
+        "metadata": {"source": source},
+        "similarity_score": score,
+        "similarity_type": "cosine",
+    }
+
+
+class TestContextPacker(unittest.TestCase):
+    def test_find_overlap(self):
+        """
+        Teste la détection du chevauchement entre la fin d'un chunk et le début du suivant.
+        """
+        self.assertEqual(find_overlap("abcdef", "defgh", min_overlap=2), 3)
+        self.assertEqual(find_overlap("abcdef", "xyz", min_overlap=2), 0)
+
+    def test_merge_overlapping_chunks_of_same_source(self):
+        """
+        Teste que deux chunks consécutifs d'une même source sont fusionnés sans répéter le texte commun.
+        """
+        shared = "La mammographie est recommandée tous les deux ans."
+        first = make_doc("Le dépistage sauve des vies. " + shared, score=0.7)
+        second = make_doc(shared + " Une IRM est proposée aux femmes à haut risque.", score=0.9)
+        other_source = make_doc(shared + " Autre document.", source="autre.pdf", score=0.6)
+
+        merged = merge_overlapping_chunks([second, first, other_source])
+
+        self.assertEqual(len(merged), 2)
+        self.assertEqual(
+            merged[0]["content"],
+            "Le dépistage sauve des vies. " + shared + " Une IRM est proposée aux femmes à haut risque.",
+        )
+        self.assertEqual(merged[0]["similarity_score"], 0.9)
+        self.assertEqual(merged[1]["metadata"]["source"], "autre.pdf")
+
+    def test_pack_context_respects_token_budget(self):
+        """
+        Teste que le contexte est limité au budget de tokens, en gardant les documents les plus pertinents.
+        """
+        docs = [make_doc("a" * 400, source="1"), make_doc("b" * 400, source="2"), make_doc("c" * 40, source="3")]
+        packed = pack_context(docs, max_tokens=120)
+        self.assertEqual([doc["metadata"]["source"] for doc in packed], ["1", "3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
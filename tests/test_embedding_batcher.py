@@ -0,0 +1,116 @@
+import time
+import asyncio
+import threading
+import unittest
+from typing import List
+from langchain_core.embeddings import Embeddings
+from src.chatbot.lib.embedding_batcher import EmbeddingMicroBatcher
+
+
+class RecordingEmbeddings(Embeddings):
+    """
+    Faux modèle d'embedding : le vecteur d'un texte est sa longueur, et chaque appel groupé est enregistré.
+    """
+
+    def __init__(self, error=None, drop_last=False, delay=0.0):
+        self.error = error
+        self.drop_last = drop_last
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.calls.append(list(texts))
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        vectors = [[float(len(text))] for text in texts]
+        return vectors[:-1] if self.drop_last else vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class TestEmbeddingMicroBatcher(unittest.TestCase):
+    def gather(self, batcher, texts):
+        async def scenario():
+            return await asyncio.gather(*(batcher.aembed_query(text) for text in texts), return_exceptions=True)
+
+        return asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+
+    def test_concurrent_queries_share_one_call(self):
+        """
+        Teste que des requêtes concurrentes sont vectorisées en un seul appel, chacune recevant son propre vecteur.
+        """
+        embeddings = RecordingEmbeddings()
+        batcher = EmbeddingMicroBatcher(embeddings, max_wait_ms=100, max_batch_size=16)
+        texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+
+        vectors = self.gather(batcher, texts)
+
+        self.assertEqual(vectors, [[1.0], [2.0], [3.0], [4.0], [5.0]])
+        self.assertEqual(embeddings.calls, [texts])
+        self.assertEqual((batcher.batches, batcher.requests), (1, 5))
+
+    def test_batch_size_is_bounded(self):
+        """
+        Teste qu'un lot ne dépasse pas `max_batch_size` requêtes.
+        """
+        embeddings = RecordingEmbeddings()
+        batcher = EmbeddingMicroBatcher(embeddings, max_wait_ms=100, max_batch_size=2)
+
+        vectors = self.gather(batcher, ["a", "bb", "ccc"])
+
+        self.assertEqual(vectors, [[1.0], [2.0], [3.0]])
+        self.assertEqual([len(call) for call in embeddings.calls], [2, 1])
+
+    def test_error_is_raised_to_every_caller(self):
+        """
+        Teste qu'une erreur du modèle est transmise à chaque requête du lot, et que le suivant est traité.
+        """
+        embeddings = RecordingEmbeddings(error=RuntimeError("quota dépassé"))
+        batcher = EmbeddingMicroBatcher(embeddings, max_wait_ms=100)
+
+        results = self.gather(batcher, ["a", "bb"])
+
+        self.assertEqual(len(embeddings.calls), 1)
+        for result in results:
+            self.assertIsInstance(result, RuntimeError)
+        embeddings.error = None
+        self.assertEqual(batcher.embed_query("ccc"), [3.0])
+
+    def test_missing_vectors_fail_instead_of_blocking(self):
+        """
+        Teste qu'un nombre de vecteurs différent du nombre de requêtes lève une erreur au lieu de bloquer les appelants.
+        """
+        batcher = EmbeddingMicroBatcher(RecordingEmbeddings(drop_last=True), max_wait_ms=100)
+
+        results = self.gather(batcher, ["a", "bb"])
+
+        for result in results:
+            self.assertIsInstance(result, ValueError)
+
+
+    def test_cancelled_caller_does_not_stop_worker(self):
+        """
+        Teste qu'un appelant annulé (en attente du lot ou pendant la vectorisation) n'arrête pas
+        le thread de regroupement : les lots suivants sont toujours traités.
+        """
+        embeddings = RecordingEmbeddings(delay=0.05)
+        batcher = EmbeddingMicroBatcher(embeddings, max_wait_ms=30)
+
+        async def scenario():
+            # Annulé avant le départ du lot, puis pendant l'appel au modèle
+            for timeout in (0.01, 0.05):
+                with self.assertRaises(asyncio.TimeoutError):
+                    await asyncio.wait_for(batcher.aembed_query("annulée"), timeout=timeout)
+            await asyncio.sleep(0.1)
+            return await asyncio.wait_for(batcher.aembed_query("suivante"), timeout=5)
+
+        self.assertEqual(asyncio.run(scenario()), [8.0])
+        self.assertTrue(batcher._worker.is_alive())
+        self.assertEqual(embeddings.calls, [["annulée"], ["suivante"]])
+
+if __name__ == "__main__":
+    unittest.main()
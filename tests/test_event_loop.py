@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from src.chatbot.lib.event_loop import get_event_loop, run_async, submit
+
+
+class TestEventLoop(unittest.TestCase):
+    def test_exception_is_raised_to_caller(self):
+        """
+        Teste qu'une exception levée dans la coroutine est transmise à l'appelant, et que la boucle reste utilisable.
+        """
+        async def failing():
+            raise ValueError("échec")
+
+        with self.assertRaises(ValueError):
+            run_async(failing())
+        with self.assertRaises(ValueError):
+            submit(failing()).result(timeout=5)
+        self.assertEqual(run_async(asyncio.sleep(0, result="ok"), timeout=5), "ok")
+
+    def test_calls_from_many_threads_share_one_loop(self):
+        """
+        Teste que des appels depuis plusieurs threads s'exécutent tous sur la même boucle, sans se bloquer.
+        """
+        lock = run_async(self.create_lock())
+        barrier = asyncio.Event()
+        loops, threads = [], []
+
+        async def work(i):
+            loops.append(asyncio.get_running_loop())
+            threads.append(threading.current_thread())
+            async with lock:
+                await asyncio.sleep(0.001)
+            if len(loops) == 8:
+                barrier.set()
+            await asyncio.wait_for(barrier.wait(), timeout=5)
+            return i
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda i: run_async(work(i), timeout=5), range(8)))
+
+        self.assertEqual(results, list(range(8)))
+        self.assertEqual({id(loop) for loop in loops}, {id(get_event_loop())})
+        self.assertEqual(len(set(threads)), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    @staticmethod
+    async def create_lock():
+        return asyncio.Lock()
+
+    def test_timeout_and_reentrant_call(self):
+        """
+        Teste le dépassement du délai d'attente et le refus d'un appel bloquant depuis la boucle elle-même.
+        """
+        with self.assertRaises(TimeoutError):
+            run_async(asyncio.sleep(1), timeout=0.01)
+
+        async def nested():
+            run_async(asyncio.sleep(0))
+
+        with self.assertRaises(RuntimeError):
+            run_async(nested(), timeout=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
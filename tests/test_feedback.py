@@ -0,0 +1,52 @@
+import os
+import csv
+import tempfile
+import unittest
+from unittest.mock import patch
+from src.chatbot.lib import feedback
+
+
+class TestFeedback(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.path = os.path.join(directory, "feedbacks.csv")
+        patcher = patch.object(feedback, "FEEDBACK_FILE", self.path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        feedback.migrate_feedback_file.clear()
+
+    def read_rows(self):
+        with open(self.path, newline="", encoding="utf-8") as file:
+            return list(csv.reader(file))
+
+    def test_old_file_is_migrated_once_then_appended(self):
+        """
+        Teste que les colonnes manquantes d'un ancien fichier sont ajoutées au démarrage, puis que les feedbacks y sont ajoutés.
+        """
+        with open(self.path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(feedback.CSV_HEADERS[:-1])
+            writer.writerow(["2024-01-01 10:00:00", "positive", "q", "r", "", "1.5", "5"])
+
+        feedback.migrate_feedback_file()
+        feedback.save_feedback("question", "réponse", "merci", 2.0, 4, 0.3)
+
+        rows = self.read_rows()
+        self.assertEqual(rows[0], feedback.CSV_HEADERS)
+        self.assertEqual(rows[1][-1], "")
+        self.assertEqual(rows[2][1:], ["positive", "question", "réponse", "merci", "2.0", "4", "0.3"])
+
+    def test_missing_file_is_created_with_headers(self):
+        """
+        Teste que la migration ignore un fichier absent et que le premier feedback crée le fichier avec ses en-têtes.
+        """
+        feedback.migrate_feedback_file()
+        feedback.save_feedback("question", "réponse", "", 1.0, 2)
+
+        rows = self.read_rows()
+        self.assertEqual(rows[0], feedback.CSV_HEADERS)
+        self.assertEqual(rows[1][1], "negative")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import sys
+import asyncio
+import unittest
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+# Les modules du chatbot s'importent entre eux en `lib.*`, comme dans l'application (depuis src/chatbot)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "chatbot"))
+for name in ("PROJECT_ID", "REGION", "INSTANCE", "DATABASE", "DB_PASSWORD", "TABLE_NAME", "DB_USER"):
+    os.environ.setdefault(name, "test")
+
+from lib.few_shot import FEW_SHOT_EXAMPLES, EmbeddingExampleSelector  # noqa: E402
+from lib.embedding_batcher import QueryEmbeddingCache  # noqa: E402
+from lib.prompt import get_prompt  # noqa: E402
+
+KEYWORDS = ["symptômes", "risque", "traitements", "dépistage", "symptoms", "treated"]
+
+
+class KeywordEmbeddings(Embeddings):
+    """
+    Faux modèle d'embedding : une dimension par mot-clé présent dans le texte.
+    """
+
+    def __init__(self):
+        self.query_calls = 0
+
+    def _embed(self, text: str) -> List[float]:
+        return [1.0 if keyword in text else 0.0 for keyword in KEYWORDS] + [0.1]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.query_calls += 1
+        return self._embed(text)
+
+
+class TestEmbeddingExampleSelector(unittest.TestCase):
+    def test_selects_closest_examples_within_budget(self):
+        """
+        Teste que seuls les exemples les plus proches de la question sont retenus, dans le budget de tokens.
+        """
+        selector = EmbeddingExampleSelector(FEW_SHOT_EXAMPLES, KeywordEmbeddings(), k=2, max_tokens=450)
+        asyncio.run(selector.aprepare())
+
+        examples = asyncio.run(selector.aselect_examples({"question": "Quels traitements après une chirurgie ?"}))
+
+        self.assertEqual(examples[0]["question"], "Quels sont les traitements disponibles pour le cancer du sein ?")
+        self.assertLessEqual(len(examples), 2)
+
+    def test_prompt_contains_only_selected_examples(self):
+        """
+        Teste que le prompt n'inclut que les exemples sélectionnés, contre tous sans sélecteur.
+        """
+        embeddings = QueryEmbeddingCache(KeywordEmbeddings())
+        selector = EmbeddingExampleSelector(FEW_SHOT_EXAMPLES, embeddings, k=1)
+        selector.prepare()
+        question = "Comment fonctionne le dépistage ?"
+        # Vecteur déjà calculé pour la recherche : la sélection ne rappelle pas le modèle
+        embeddings.embed_query(question)
+
+        dynamic_prompt = get_prompt(selector).format(context="contexte", question=question)
+        static_prompt = get_prompt().format(context="contexte", question=question)
+
+        self.assertIn("Mammographie", dynamic_prompt)
+        self.assertNotIn("BRCA1", dynamic_prompt)
+        self.assertIn("BRCA1", static_prompt)
+        self.assertLess(len(dynamic_prompt), len(static_prompt) / 2)
+        self.assertEqual(embeddings.embeddings.query_calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
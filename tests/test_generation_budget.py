@@ -0,0 +1,112 @@
+import os
+import sys
+import asyncio
+import unittest
+from typing import Any, List
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Les modules du chatbot s'importent entre eux en `lib.*`, comme dans l'application (depuis src/chatbot)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "chatbot"))
+for name in ("PROJECT_ID", "REGION", "INSTANCE", "DATABASE", "DB_PASSWORD", "TABLE_NAME", "DB_USER"):
+    os.environ.setdefault(name, "test")
+
+from lib.generation_budget import (  # noqa: E402
+    BudgetedChatModel,
+    GenerationStats,
+    classify_question,
+    question_class_scope
+)
+from lib.prompt import get_prompt  # noqa: E402
+
+
+class RecordingChatModel(BaseChatModel):
+    """
+    Faux modèle de chat qui enregistre le budget de génération reçu.
+    """
+    tokens: List[str]
+    generation_configs: List[Any] = []
+    max_output_tokens_seen: List[Any] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(self.tokens)))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        self.generation_configs.append(kwargs.get("generation_config"))
+        self.max_output_tokens_seen.append(kwargs.get("max_output_tokens"))
+        for token in self.tokens:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+class TestClassifyQuestion(unittest.TestCase):
+    def test_question_classes(self):
+        """
+        Teste la classe attribuée aux formulations courantes.
+        """
+        cases = {
+            "Qu'est-ce qu'une mammographie ?": "definition",
+            "C'est quoi le HER2 ?": "definition",
+            "Quels sont les traitements du cancer du sein ?": "list",
+            "Quelle est la différence entre tumorectomie et mastectomie ?": "comparison",
+            "Et pour les hommes ?": "follow_up",
+            "Est-ce que c'est héréditaire ?": "follow_up",
+            "Comment vivre après une mastectomie quand on a des enfants ?": "general",
+            "Pourquoi le cancer du sein touche-t-il surtout les femmes de plus de 50 ans ?": "general",
+            "La mammographie est-elle douloureuse ?": "follow_up",
+        }
+        for question, expected in cases.items():
+            self.assertEqual(classify_question(question).name, expected, question)
+
+
+class TestBudgetedChatModel(unittest.TestCase):
+    def test_budget_and_stats_follow_question_class(self):
+        """
+        Teste que le budget de la classe est transmis au modèle et que la génération est mesurée par classe.
+        """
+        model = RecordingChatModel(tokens=["Oui, ", "dans de rares cas."], generation_configs=[], max_output_tokens_seen=[])
+        stats = GenerationStats()
+        budgeted = BudgetedChatModel(model=model, stats=stats)
+
+        async def scenario():
+            with question_class_scope("Et pour les hommes ?") as question_class:
+                message = await budgeted.ainvoke("question")
+            return question_class, message
+
+        question_class, message = asyncio.run(scenario())
+
+        self.assertEqual(message.content, "Oui, dans de rares cas.")
+        self.assertEqual(model.max_output_tokens_seen, [question_class.max_output_tokens])
+        self.assertEqual(model.generation_configs, [{"max_output_tokens": question_class.max_output_tokens}])
+        self.assertEqual(stats.stats()["follow_up"]["calls"], 1)
+
+    def test_no_class_keeps_model_budget(self):
+        """
+        Teste que sans classe fixée, le budget du modèle n'est pas modifié.
+        """
+        model = RecordingChatModel(tokens=["ok"], generation_configs=[], max_output_tokens_seen=[])
+        asyncio.run(BudgetedChatModel(model=model, stats=GenerationStats()).ainvoke("question"))
+        self.assertEqual(model.max_output_tokens_seen, [None])
+        self.assertEqual(model.generation_configs, [None])
+
+    def test_prompt_uses_response_format_of_class(self):
+        """
+        Teste que la structure de réponse demandée dans le prompt dépend de la classe de la question.
+        """
+        with question_class_scope("Et pour les hommes ?"):
+            follow_up = get_prompt().format(context="contexte", question="Et pour les hommes ?")
+        listing = get_prompt().format(context="contexte", question="Quels sont les symptômes ?")
+        explicit = get_prompt().format(context="contexte", question="question", response_format="Format imposé.")
+
+        self.assertIn("sans introduction ni conclusion", follow_up)
+        self.assertIn("**Introduction**", listing)
+        self.assertIn("4. Format imposé.", explicit)
+
+
+if __name__ == "__main__":
+    unittest.main()
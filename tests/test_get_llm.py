@@ -1,7 +1,15 @@
+import os
+import sys
 import unittest
 from unittest.mock import patch
 from langchain_google_genai import ChatGoogleGenerativeAI
-from src.chatbot.lib.model import get_llm  
+
+# Les modules du chatbot s'importent entre eux en `lib.*`, comme dans l'application (depuis src/chatbot)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "chatbot"))
+for name in ("PROJECT_ID", "REGION", "INSTANCE", "DATABASE", "DB_PASSWORD", "TABLE_NAME", "DB_USER"):
+    os.environ.setdefault(name, "test")
+
+from lib.model import get_llm  # noqa: E402
 
 class TestGetLLM(unittest.TestCase):
     @patch('langchain_google_genai.ChatGoogleGenerativeAI')
@@ -0,0 +1,99 @@
+import os
+import sys
+import asyncio
+import unittest
+from typing import Any, List
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Les modules du chatbot s'importent entre eux en `lib.*`, comme dans l'application (depuis src/chatbot)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "chatbot"))
+for name in ("PROJECT_ID", "REGION", "INSTANCE", "DATABASE", "DB_PASSWORD", "TABLE_NAME", "DB_USER"):
+    os.environ.setdefault(name, "test")
+
+from lib.hedging import HedgedChatModel  # noqa: E402
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Faux modèle de chat dont la latence du premier token est scriptée.
+    """
+    tokens: List[str]
+    first_token_delay: float = 0.0
+    fail: bool = False
+    cancelled: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(self.tokens)))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        try:
+            await asyncio.sleep(self.first_token_delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.fail:
+            raise RuntimeError("modèle indisponible")
+        for token in self.tokens:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+class TestHedgedChatModel(unittest.TestCase):
+    def test_fast_primary_is_not_hedged(self):
+        """
+        Teste que le modèle de repli n'est pas interrogé si le principal répond avant le délai.
+        """
+        primary = ScriptedChatModel(tokens=["Le ", "dépistage"])
+        fallback = ScriptedChatModel(tokens=["repli"])
+        model = HedgedChatModel(primary=primary, fallback=fallback, hedge_delay=0.5)
+
+        self.assertEqual(asyncio.run(model.ainvoke("question")).content, "Le dépistage")
+        self.assertEqual(model.stats.as_dict()["hedged"], 0)
+        self.assertEqual(model.stats.primary_wins, 1)
+
+    def test_slow_primary_loses_to_fallback(self):
+        """
+        Teste que la requête de repli est envoyée après le délai et que le modèle perdant est annulé.
+        """
+        primary = ScriptedChatModel(tokens=["lent"], first_token_delay=2.0)
+        fallback = ScriptedChatModel(tokens=["rapide"], first_token_delay=0.01)
+        model = HedgedChatModel(primary=primary, fallback=fallback, hedge_delay=0.05)
+
+        self.assertEqual(asyncio.run(model.ainvoke("question")).content, "rapide")
+        self.assertTrue(primary.cancelled)
+        stats = model.stats.as_dict()
+        self.assertEqual((stats["hedged"], stats["fallback_wins"], stats["primary_wins"]), (1, 1, 0))
+        self.assertLess(stats["p50_first_token_ms"], 1000)
+
+    def test_primary_still_wins_after_hedge(self):
+        """
+        Teste que le modèle principal est conservé s'il produit son premier token avant le modèle de repli.
+        """
+        primary = ScriptedChatModel(tokens=["principal"], first_token_delay=0.1)
+        fallback = ScriptedChatModel(tokens=["repli"], first_token_delay=2.0)
+        model = HedgedChatModel(primary=primary, fallback=fallback, hedge_delay=0.05)
+
+        self.assertEqual(asyncio.run(model.ainvoke("question")).content, "principal")
+        self.assertTrue(fallback.cancelled)
+        self.assertEqual(model.stats.primary_wins, 1)
+
+    def test_failing_primary_falls_back_immediately(self):
+        """
+        Teste qu'une erreur du modèle principal déclenche le repli sans attendre le délai.
+        """
+        primary = ScriptedChatModel(tokens=[], fail=True)
+        fallback = ScriptedChatModel(tokens=["repli"])
+        model = HedgedChatModel(primary=primary, fallback=fallback, hedge_delay=10)
+
+        self.assertEqual(asyncio.run(asyncio.wait_for(model.ainvoke("question"), 1)).content, "repli")
+        self.assertEqual(model.stats.fallback_wins, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
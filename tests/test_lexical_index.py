@@ -0,0 +1,78 @@
+import unittest
+from src.chatbot.lib.lexical_index import BM25Index, tokenize, reciprocal_rank_fusion
+
+ROWS = [
+    {"langchain_id": "1", "content": "La tumorectomie consiste à retirer la tumeur.", "langchain_metadata": {}},
+    {"langchain_id": "2", "content": "Les mutations des gènes BRCA1 et BRCA2 augmentent le risque.", "langchain_metadata": {}},
+    {"langchain_id": "3", "content": "Le cancer du sein triple négatif est plus agressif.", "langchain_metadata": {}},
+]
+
+
+class TestLexicalIndex(unittest.TestCase):
+    def test_tokenize_folds_accents_and_removes_stop_words(self):
+        """
+        Teste la normalisation des termes français.
+        """
+        self.assertEqual(tokenize("L'hormonothérapie des cancers"), ["hormonotherapie", "cancer"])
+        self.assertEqual(tokenize("Est-ce que c'est grave ?"), ["grave"])
+
+    def test_search_exact_medical_terms(self):
+        """
+        Teste que les termes médicaux exacts sont retrouvés, avec ou sans accents.
+        """
+        index = BM25Index()
+        index.add_documents(ROWS)
+
+        self.assertEqual(index.get(index.search("brca1")[0][0])[0], "2")
+        self.assertEqual(index.get(index.search("Tumorectomie")[0][0])[0], "1")
+        results = index.search("triple negatif")
+        self.assertEqual(index.get(results[0][0])[0], "3")
+        self.assertTrue(index.is_confident("triple negatif", results, min_margin=2.0))
+
+    def test_term_coverage(self):
+        """
+        Teste la part des termes de la requête présents dans un chunk.
+        """
+        index = BM25Index()
+        index.add_documents(ROWS)
+
+        self.assertEqual(index.term_coverage("triple négatif", 2), 1.0)
+        self.assertEqual(index.term_coverage("cancer triple BRCA1 tumeur", 2), 0.5)
+        self.assertEqual(index.term_coverage("de la", 2), 0.0)
+        self.assertFalse(index.is_confident("triple BRCA1", index.search("triple BRCA1"), min_margin=2.0))
+
+    def test_incremental_updates_skip_known_chunks(self):
+        """
+        Teste que seuls les nouveaux chunks sont ajoutés à l'index.
+        """
+        index = BM25Index()
+        self.assertEqual(index.add_documents(ROWS[:2]), 2)
+        self.assertEqual(index.add_documents(ROWS), 1)
+        self.assertEqual(len(index), 3)
+
+    def test_sync_removes_deleted_and_updated_chunks(self):
+        """
+        Teste que la synchronisation retire les chunks supprimés et remplace les chunks modifiés.
+        """
+        index = BM25Index()
+        index.add_documents(ROWS)
+        updated = {"langchain_id": "1", "content": "La mastectomie retire tout le sein.", "langchain_metadata": {}}
+
+        index.sync_documents([updated, ROWS[2]])
+
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.search("brca1"), [])
+        self.assertEqual(index.search("tumorectomie"), [])
+        self.assertEqual(index.get(index.search("mastectomie")[0][0])[0], "1")
+        self.assertEqual(index.total_length, len(tokenize(updated["content"])) + len(tokenize(ROWS[2]["content"])))
+
+    def test_reciprocal_rank_fusion(self):
+        """
+        Teste qu'un document bien classé dans les deux listes arrive en tête.
+        """
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]])
+        self.assertEqual(fused[0][0], "b")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import tempfile
+import unittest
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+from sentence_transformers import SentenceTransformer
+from sentence_transformers.models import StaticEmbedding
+from src.chatbot.lib.local_embeddings import LocalEmbeddings
+
+
+def create_tiny_model(path: str) -> None:
+    """
+    Crée et sauvegarde un minuscule modèle sentence-transformers (embeddings statiques de dimension 8).
+    """
+    vocab = {"[UNK]": 0, "cancer": 1, "sein": 2, "traitement": 3, "symptômes": 4}
+    tokenizer = Tokenizer(WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    model = SentenceTransformer(modules=[StaticEmbedding(tokenizer, embedding_dim=8)])
+    model.save(path)
+
+
+class TestLocalEmbeddings(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.model_dir = tempfile.mkdtemp()
+        create_tiny_model(cls.model_dir)
+
+    def test_embed_documents_and_query(self):
+        """
+        Teste que les embeddings locaux sont normalisés et identiques en mode requête et document.
+        """
+        embeddings = LocalEmbeddings(model_name=self.model_dir, batch_size=2)
+
+        vectors = embeddings.embed_documents(["cancer du sein", "traitement", "symptômes du cancer"])
+        query_vector = embeddings.embed_query("cancer du sein")
+
+        self.assertEqual(len(vectors), 3)
+        self.assertEqual(len(vectors[0]), 8)
+        self.assertAlmostEqual(sum(x * x for x in vectors[0]), 1.0, places=5)
+        for a, b in zip(query_vector, vectors[0]):
+            self.assertAlmostEqual(a, b, places=5)
+        self.assertEqual(embeddings.embed_documents([]), [])
+
+    def test_model_is_loaded_once(self):
+        """
+        Teste que le modèle est partagé entre les instances.
+        """
+        first = LocalEmbeddings(model_name=self.model_dir)
+        second = LocalEmbeddings(model_name=self.model_dir)
+        self.assertIs(first.model, second.model)
+
+    def test_dimension(self):
+        """
+        Teste que la taille des vecteurs est celle du modèle, pour créer la table avec la bonne dimension.
+        """
+        self.assertEqual(LocalEmbeddings(model_name=self.model_dir).dimension, 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
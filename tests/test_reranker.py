@@ -0,0 +1,125 @@
+import time
+import asyncio
+import threading
+import unittest
+from src.chatbot.lib.reranker import CrossEncoderReranker
+
+
+class FakeCrossEncoder:
+    """
+    Faux cross-encoder : le score d'un document est le nombre de mots de la question qu'il contient.
+    """
+
+    def __init__(self, delay=0.0, pair_delay=0.0):
+        self.delay = delay
+        self.pair_delay = pair_delay
+        self.batches = []
+        self.threads = []
+
+    def predict(self, pairs):
+        self.batches.append(len(pairs))
+        self.threads.append(threading.current_thread())
+        time.sleep(self.delay + self.pair_delay * len(pairs))
+        return [len(set(query.split()) & set(content.split())) for query, content in pairs]
+
+
+def make_docs(contents):
+    return [{"content": content, "metadata": {}, "similarity_score": 0.5} for content in contents]
+
+
+class TestCrossEncoderReranker(unittest.TestCase):
+    def test_rerank_orders_by_score_in_batches(self):
+        """
+        Teste que les candidats sont scorés par lots et que seuls les `top_n` meilleurs sont gardés.
+        """
+        model = FakeCrossEncoder()
+        reranker = CrossEncoderReranker(top_n=2, batch_size=2, model=model)
+        docs = make_docs(["rien", "cancer du sein", "cancer", "dépistage du cancer du sein"])
+
+        selected = reranker.rerank("dépistage du cancer du sein", docs)
+
+        self.assertEqual([doc["content"] for doc in selected], ["dépistage du cancer du sein", "cancer du sein"])
+        self.assertEqual(model.batches, [2, 2])
+        self.assertEqual(reranker.stats.as_dict()["kept"], 2)
+
+    def test_time_budget_keeps_unscored_documents_last(self):
+        """
+        Teste qu'au-delà du budget de temps, les documents non scorés restent après les autres.
+        """
+        model = FakeCrossEncoder(delay=0.05)
+        reranker = CrossEncoderReranker(top_n=4, batch_size=1, time_budget=0.01, model=model)
+        docs = make_docs(["a", "b", "sein", "cancer du sein"])
+
+        selected = reranker.rerank("cancer du sein", docs)
+
+        self.assertEqual(len(model.batches), 1)
+        self.assertEqual([doc["content"] for doc in selected], ["a", "b", "sein", "cancer du sein"])
+        self.assertEqual(reranker.stats.timeouts, 1)
+
+    def test_batches_shrink_to_fit_time_budget(self):
+        """
+        Teste qu'une fois la durée par paire mesurée, les lots sont réduits pour tenir dans le budget de temps.
+        """
+        model = FakeCrossEncoder(pair_delay=0.01)
+        reranker = CrossEncoderReranker(top_n=4, batch_size=16, time_budget=0.1, model=model)
+        docs = make_docs([f"document {i}" for i in range(40)])
+        reranker.rerank("cancer", docs)
+        model.batches.clear()
+
+        start = time.perf_counter()
+        reranker.rerank("cancer", docs)
+        elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 0.15)
+        self.assertLess(model.batches[0], 16)
+        self.assertLess(sum(model.batches), 16)
+        self.assertEqual(reranker.stats.timeouts, 2)
+
+    def test_arerank_falls_back_to_search_order(self):
+        """
+        Teste qu'au-delà du budget de temps, le reranking asynchrone retourne les documents dans l'ordre de la recherche.
+        """
+        model = FakeCrossEncoder(delay=0.3)
+        reranker = CrossEncoderReranker(top_n=2, time_budget=0.05, model=model)
+
+        async def scenario():
+            start = time.perf_counter()
+            selected = await reranker.arerank("cancer du sein", make_docs(["a", "b", "cancer du sein"]))
+            return selected, time.perf_counter() - start
+
+        selected, elapsed = asyncio.run(scenario())
+
+        self.assertEqual([doc["content"] for doc in selected], ["a", "b"])
+        self.assertLess(elapsed, 0.2)
+        self.assertGreaterEqual(reranker.stats.timeouts, 1)
+
+    def test_skip_truncates_without_scoring(self):
+        """
+        Teste qu'avec `skip`, les candidats sont tronqués sans appeler le modèle.
+        """
+        model = FakeCrossEncoder()
+        reranker = CrossEncoderReranker(top_n=2, skip=True, model=model)
+
+        selected = reranker.rerank("cancer", make_docs(["a", "b", "cancer"]))
+
+        self.assertEqual([doc["content"] for doc in selected], ["a", "b"])
+        self.assertEqual(model.batches, [])
+        self.assertEqual(reranker.stats.skipped, 1)
+        reranker.rerank("cancer", make_docs(["a", "cancer"]), skip=False)
+        self.assertEqual(model.batches, [2])
+
+    def test_arerank_scores_outside_event_loop(self):
+        """
+        Teste que le reranking asynchrone score les candidats hors du thread de la boucle d'événements.
+        """
+        model = FakeCrossEncoder()
+        reranker = CrossEncoderReranker(top_n=1, model=model)
+
+        selected = asyncio.run(reranker.arerank("cancer", make_docs(["a", "cancer"])))
+
+        self.assertEqual(selected[0]["content"], "cancer")
+        self.assertIsNot(model.threads[0], threading.main_thread())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import os
+import sys
+import time
+import asyncio
+import unittest
+from typing import Any, List
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Les modules du chatbot s'importent entre eux en `lib.*`, comme dans l'application (depuis src/chatbot)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "chatbot"))
+for name in ("PROJECT_ID", "REGION", "INSTANCE", "DATABASE", "DB_PASSWORD", "TABLE_NAME", "DB_USER"):
+    os.environ.setdefault(name, "test")
+
+from lib.resilience import (  # noqa: E402
+    CircuitBreaker,
+    CircuitOpen,
+    DeadlineExceeded,
+    DependencyError,
+    GuardedChatModel,
+    request_deadline
+)
+
+
+class FlakyChatModel(BaseChatModel):
+    """
+    Faux modèle de chat qui échoue lors des `failures` premiers appels.
+    """
+    tokens: List[str]
+    failures: int = 0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "flaky"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(self.tokens)))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("Vertex AI indisponible")
+        for token in self.tokens:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+async def fail():
+    raise RuntimeError("Cloud SQL indisponible")
+
+
+async def succeed():
+    return "ok"
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_trips_then_fails_fast_until_probe_succeeds(self):
+        """
+        Teste que le disjoncteur s'ouvre après trop d'échecs, rejette sans appeler la dépendance,
+        puis se referme après un appel de test réussi.
+        """
+        breaker = CircuitBreaker("cloud_sql", failure_rate=0.5, min_calls=2, window=4, open_seconds=0.05)
+
+        for _ in range(2):
+            with self.assertRaises(DependencyError):
+                asyncio.run(breaker.call(fail))
+        self.assertEqual(breaker.state, "open")
+
+        called = []
+
+        async def record_call():
+            called.append(True)
+            return "ok"
+
+        with self.assertRaises(CircuitOpen):
+            asyncio.run(breaker.call(record_call))
+        self.assertEqual(called, [])
+
+        time.sleep(0.06)
+        self.assertEqual(asyncio.run(breaker.call(succeed)), "ok")
+        self.assertEqual(breaker.state, "closed")
+        self.assertEqual(breaker.stats()["trips"], 1)
+
+    def test_slow_calls_count_as_failures(self):
+        """
+        Teste qu'un appel réussi mais plus lent que le seuil est compté comme un échec.
+        """
+        breaker = CircuitBreaker("embedding", min_calls=1, window=1, slow_call_seconds=0.01)
+
+        async def slow():
+            await asyncio.sleep(0.03)
+            return "ok"
+
+        self.assertEqual(asyncio.run(breaker.call(slow)), "ok")
+        self.assertEqual(breaker.state, "open")
+
+
+class TestDeadline(unittest.TestCase):
+    def test_stage_is_cut_to_its_share_of_the_budget(self):
+        """
+        Teste qu'une étape est interrompue à sa part du budget et n'est pas réessayée sans budget restant.
+        """
+        breaker = CircuitBreaker("embedding", min_calls=10)
+        calls = []
+
+        async def hang():
+            calls.append(True)
+            await asyncio.sleep(1)
+
+        async def scenario():
+            with request_deadline(0.2):
+                await breaker.call(hang, share=0.6, retries=3)
+
+        start = time.perf_counter()
+        with self.assertRaises(DependencyError):
+            asyncio.run(scenario())
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(len(calls), 1)
+
+    def test_exhausted_budget_fails_without_calling(self):
+        """
+        Teste qu'aucun appel n'est fait une fois l'échéance dépassée.
+        """
+        breaker = CircuitBreaker("cloud_sql")
+
+        async def scenario():
+            with request_deadline(0.01):
+                await asyncio.sleep(0.02)
+                await breaker.call(succeed)
+
+        with self.assertRaises(DeadlineExceeded):
+            asyncio.run(scenario())
+        self.assertEqual(breaker.stats()["calls"], 0)
+
+
+class TestGuardedChatModel(unittest.TestCase):
+    def test_failure_before_first_token_is_retried(self):
+        """
+        Teste qu'une génération en échec avant son premier token est réessayée s'il reste du budget.
+        """
+        model = FlakyChatModel(tokens=["Le ", "dépistage"], failures=1)
+        guarded = GuardedChatModel(model=model, breaker=CircuitBreaker("vertex_llm", min_calls=10), max_retries=1)
+
+        async def scenario():
+            with request_deadline(5):
+                return await guarded.ainvoke("question")
+
+        self.assertEqual(asyncio.run(scenario()).content, "Le dépistage")
+        self.assertEqual(model.calls, 2)
+
+    def test_open_breaker_fails_fast(self):
+        """
+        Teste que le modèle n'est pas appelé lorsque son disjoncteur est ouvert.
+        """
+        model = FlakyChatModel(tokens=["ok"])
+        breaker = CircuitBreaker("vertex_llm", min_calls=1, window=1)
+        with self.assertRaises(DependencyError):
+            asyncio.run(breaker.call(fail))
+        guarded = GuardedChatModel(model=model, breaker=breaker)
+
+        with self.assertRaises(CircuitOpen):
+            asyncio.run(guarded.ainvoke("question"))
+        self.assertEqual(model.calls, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,284 @@
+import os
+import sys
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from langchain_core.documents import Document
+
+# retriever.py importe les modules du chatbot comme le fait l'application (depuis src/chatbot)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "chatbot"))
+for name in ("PROJECT_ID", "REGION", "INSTANCE", "DATABASE", "DB_PASSWORD", "TABLE_NAME", "DB_USER"):
+    os.environ.setdefault(name, "test")
+
+from lib.chain import CustomRetriever  # noqa: E402
+from lib.chunk_cache import ChunkContentCache  # noqa: E402
+from lib.lexical_index import BM25Index  # noqa: E402
+from lib.resilience import CircuitBreaker  # noqa: E402
+from lib.retriever import adaptive_cutoff, get_relevant_documents, get_relevant_documents_hybrid  # noqa: E402
+from lib.source_retriever import format_answer_with_source  # noqa: E402
+from lib.vector_index import NumpyVectorIndex  # noqa: E402
+
+ROWS = [
+    {"langchain_id": "1", "content": "La tumorectomie consiste à retirer la tumeur.", "langchain_metadata": {}},
+    {"langchain_id": "2", "content": "Les mutations des gènes BRCA1 et BRCA2 augmentent le risque.", "langchain_metadata": {}},
+    {"langchain_id": "3", "content": "Le cancer du sein triple négatif est plus agressif.", "langchain_metadata": {}},
+]
+
+
+def vector_doc(content, score):
+    return {"content": content, "metadata": {"source": "a.pdf"}, "similarity_score": score, "similarity_type": "cosine"}
+
+
+class TestAdaptiveCutoff(unittest.TestCase):
+    def test_cutoff_follows_score_distribution(self):
+        """
+        Teste le nombre de documents gardés selon la distribution des scores (marge 0.1, largeur de groupe 0.03).
+        """
+        cases = [
+            # (scores, min_k, attendu)
+            ([], 4, 0),
+            ([0.9], 4, 1),
+            ([0.95, 0.80, 0.79], 4, 1),
+            ([0.75, 0.50], 1, 1),
+            ([0.85, 0.84, 0.70, 0.60, 0.55], 4, 4),
+            ([0.85, 0.84, 0.83, 0.83, 0.825, 0.60], 2, 5),
+            ([0.85, 0.84, 0.83, 0.83, 0.825, 0.60], 6, 6),
+            ([0.80, 0.72, 0.65], 4, 3),
+            ([0.80, 0.79, 0.78, 0.76], 1, 3),
+        ]
+        for scores, min_k, expected in cases:
+            with self.subTest(scores=scores, min_k=min_k):
+                self.assertEqual(
+                    adaptive_cutoff(scores, min_k=min_k, dominance_margin=0.1, cluster_width=0.03), expected
+                )
+
+
+class TestHybridRetrieval(unittest.TestCase):
+    def setUp(self):
+        self.lexical_index = BM25Index()
+        self.lexical_index.add_documents(ROWS)
+
+    def search(self, query, vector_docs, **kwargs):
+        async def vector_search():
+            return vector_docs
+
+        return asyncio.run(get_relevant_documents_hybrid(query, self.lexical_index, vector_search, **kwargs))
+
+    def test_lexical_hits_keep_no_cosine_score(self):
+        """
+        Teste qu'un chunk trouvé par BM25 seul est marqué lexical, sans score cosinus,
+        et qu'un chunk trouvé par les deux recherches garde son score cosinus.
+        """
+        docs = self.search(
+            "tumorectomie triple négatif",
+            [vector_doc(ROWS[2]["content"], 0.81)],
+            fast_path_margin=0,
+            min_term_coverage=0.3,
+        )
+
+        by_content = {doc["content"]: doc for doc in docs}
+        self.assertEqual(by_content[ROWS[2]["content"]]["similarity_score"], 0.81)
+        self.assertEqual(by_content[ROWS[0]["content"]]["similarity_type"], "bm25")
+        self.assertEqual(by_content[ROWS[0]["content"]]["similarity_score"], 0.0)
+
+    def test_lexical_hits_below_term_coverage_are_dropped(self):
+        """
+        Teste qu'un chunk trouvé par BM25 seul est écarté s'il contient trop peu de termes de la question.
+        """
+        docs = self.search("tumorectomie sein BRCA1 mutation", [], fast_path_margin=0, min_term_coverage=0.75)
+        self.assertEqual(docs, [])
+
+        docs = self.search("tumorectomie sein BRCA1 mutation", [], fast_path_margin=0, min_term_coverage=0.5)
+        self.assertEqual([doc["content"] for doc in docs], [ROWS[1]["content"]])
+
+        docs = self.search("tumorectomie sein BRCA1 mutation", [], fast_path_margin=0, min_term_coverage=0.25)
+        self.assertEqual(len(docs), 3)
+
+    def test_lexical_fast_path_is_never_cited(self):
+        """
+        Teste que la réponse obtenue par la recherche lexicale seule n'affiche pas de source.
+        """
+        docs = self.search("triple négatif", [vector_doc("jamais appelé", 0.9)], fast_path_margin=2.0)
+        self.assertEqual([doc["similarity_type"] for doc in docs], ["bm25"])
+
+        source_documents = [
+            Document(page_content=doc["content"], metadata={
+                **doc["metadata"], "similarity_score": doc["similarity_score"], "similarity_type": doc["similarity_type"]
+            })
+            for doc in docs
+        ]
+        response = {"result": "Réponse.", "source_documents": source_documents}
+        self.assertEqual(format_answer_with_source(response), "Réponse.")
+
+
+class SlowEmbeddings:
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def aembed_query(self, text):
+        await asyncio.sleep(self.delay)
+        return [1.0, 0.0]
+
+
+class FakeVectorStore:
+    def __init__(self, embeddings, distances=(0.1,)):
+        self.embeddings = embeddings
+        self.distances = distances
+        self.vectors = []
+        self.options = []
+
+    async def asimilarity_search_with_score_by_vector(self, embedding, k, **options):
+        self.vectors.append(embedding)
+        self.options.append(options)
+        return [
+            (Document(page_content=f"contenu {i}", metadata={"source": "a.pdf"}), distance)
+            for i, distance in enumerate(self.distances[:k])
+        ]
+
+
+class TestSimilarityThreshold(unittest.TestCase):
+    def test_threshold_is_applied_to_returned_distances(self):
+        """
+        Teste que le seuil est appliqué aux distances retournées, sans filtre SQL répétant le vecteur de la requête.
+        """
+        vector_store = FakeVectorStore(SlowEmbeddings(delay=0), distances=[0.1, 0.3, 0.6])
+
+        docs = asyncio.run(get_relevant_documents("question", vector_store, similarity_threshold=0.5))
+
+        self.assertEqual([doc["content"] for doc in docs], ["contenu 0", "contenu 1"])
+        self.assertAlmostEqual(docs[1]["similarity_score"], 0.7)
+        self.assertEqual(vector_store.options, [{}])
+
+
+class TestSqlCircuitBreaker(unittest.TestCase):
+    def test_slow_embedding_does_not_trip_cloud_sql_breaker(self):
+        """
+        Teste que la requête est vectorisée hors du disjoncteur Cloud SQL :
+        un embedding lent n'est pas compté comme un appel Cloud SQL lent.
+        """
+        vector_store = FakeVectorStore(SlowEmbeddings(delay=0.05))
+        breaker = CircuitBreaker("cloud_sql", min_calls=2, slow_call_seconds=0.02)
+        retriever = CustomRetriever.model_construct(
+            vector_store=vector_store, similarity_threshold=0.5, sql_breaker=breaker
+        )
+
+        for _ in range(3):
+            docs = asyncio.run(retriever._vector_search("question", k=4))
+
+        self.assertEqual(docs[0]["similarity_score"], 0.9)
+        self.assertEqual(vector_store.vectors, [[1.0, 0.0]] * 3)
+        self.assertEqual(breaker.stats(), {"state": "closed", "calls": 3, "failures": 0, "rejected": 0, "trips": 0})
+
+
+class AxisEmbeddings:
+    """
+    Faux modèle d'embedding : un axe par mot-clé, et le nombre d'appels groupés reçus.
+    """
+    AXES = {"tumorectomie": [1.0, 0.0, 0.0], "brca": [0.0, 1.0, 0.0], "triple": [0.0, 0.0, 1.0]}
+
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [self.AXES[text] for text in texts]
+
+
+class TestBatchSearch(unittest.TestCase):
+    def test_batch_search_embeds_all_queries_at_once(self):
+        """
+        Teste que la recherche groupée vectorise toutes les requêtes en un appel et retourne leurs documents dans l'ordre.
+        """
+        vector_index = NumpyVectorIndex()
+        vector_index.refresh([
+            {**row, "embedding": embedding} for row, embedding in zip(ROWS, AxisEmbeddings.AXES.values())
+        ])
+        embeddings = AxisEmbeddings()
+        retriever = CustomRetriever.model_construct(
+            vector_store=FakeVectorStore(embeddings), similarity_threshold=0.5, k=2, vector_index=vector_index
+        )
+
+        results = asyncio.run(retriever.abatch_search(["triple", "tumorectomie"]))
+
+        self.assertEqual(embeddings.batches, [["triple", "tumorectomie"]])
+        self.assertEqual([[doc.page_content for doc in docs] for docs in results], [[ROWS[2]["content"]], [ROWS[0]["content"]]])
+        self.assertAlmostEqual(results[0][0].metadata["similarity_score"], 1.0, places=5)
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def mappings(self):
+        return self
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    def __init__(self, engine):
+        self.engine = engine
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, statement, params):
+        self.engine.queries.append(params)
+        if "ids" in params:
+            return FakeResult([row for row in self.engine.rows if row["langchain_id"] in params["ids"]])
+        return FakeResult([
+            {"langchain_id": row["langchain_id"], "distance": row["distance"]} for row in self.engine.rows[:params["k"]]
+        ])
+
+
+class FakeEngine:
+    """
+    Connexion Cloud SQL de substitution : phase 1 (identifiants et distances) puis phase 2 (contenu).
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+        self._pool = SimpleNamespace(connect=lambda: FakeConnection(self))
+
+    async def _run_as_async(self, coro):
+        return await coro
+
+
+class TestTwoPhaseRetrieval(unittest.TestCase):
+    def test_cutoff_applied_once_and_content_cached(self):
+        """
+        Teste que la coupure adaptative n'est appliquée qu'une fois, avant la lecture du contenu,
+        et qu'une seconde recherche lit le contenu depuis le cache.
+        """
+        engine = FakeEngine([
+            {**row, "distance": distance, "langchain_metadata": {"source": "a.pdf"}}
+            for row, distance in zip(ROWS, (0.1, 0.2, 0.3))
+        ])
+        chunk_cache = ChunkContentCache()
+        retriever = CustomRetriever.model_construct(
+            vector_store=FakeVectorStore(SlowEmbeddings(delay=0)),
+            similarity_threshold=0.5,
+            k=2,
+            adaptive_k=True,
+            engine=engine,
+            chunk_cache=chunk_cache,
+        )
+
+        with patch.object(CustomRetriever, "_cutoff", autospec=True, return_value=2) as cutoff:
+            docs = asyncio.run(retriever._vector_search("question", k=3))
+            asyncio.run(retriever._vector_search("question", k=3))
+
+        self.assertEqual(cutoff.call_count, 2)
+        self.assertEqual([doc["content"] for doc in docs], [ROWS[0]["content"], ROWS[1]["content"]])
+        self.assertEqual(engine.queries[1]["ids"], ["1", "2"])
+        self.assertEqual(len(engine.queries), 3)
+        self.assertEqual((chunk_cache.hits, chunk_cache.misses), (2, 2))
+
+if __name__ == "__main__":
+    unittest.main()
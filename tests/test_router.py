@@ -0,0 +1,54 @@
+import os
+import sys
+import unittest
+
+# Les modules du chatbot s'importent entre eux en `lib.*`, comme dans l'application (depuis src/chatbot)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "chatbot"))
+for name in ("PROJECT_ID", "REGION", "INSTANCE", "DATABASE", "DB_PASSWORD", "TABLE_NAME", "DB_USER"):
+    os.environ.setdefault(name, "test")
+
+from lib.router import (  # noqa: E402
+    GREETING_RESPONSE,
+    NON_FRENCH_RESPONSE,
+    UNCLEAR_RESPONSE,
+    detect_language,
+    route_query,
+)
+
+
+class TestRouter(unittest.TestCase):
+    def test_detect_language(self):
+        """
+        Teste l'identification de la langue sur des questions courtes.
+        """
+        self.assertEqual(detect_language("Quels sont les symptômes du cancer du sein ?"), "fr")
+        self.assertEqual(detect_language("What are the symptoms of breast cancer?"), "en")
+        self.assertEqual(detect_language("Was sind die Symptome von Brustkrebs?"), "de")
+        self.assertEqual(detect_language("mammographie"), "unknown")
+
+    def test_trivial_inputs_get_canned_responses(self):
+        """
+        Teste que les salutations, saisies inexploitables et questions en anglais ne passent pas par la chaîne QA.
+        """
+        self.assertEqual(route_query("hi").response, GREETING_RESPONSE)
+        self.assertEqual(route_query("Comment ça va ?").intent, "greeting")
+        self.assertEqual(route_query("f").response, UNCLEAR_RESPONSE)
+        self.assertEqual(route_query("How is breast cancer treated?").response, NON_FRENCH_RESPONSE)
+
+    def test_medical_questions_go_to_the_chain(self):
+        """
+        Teste que les questions médicales en français sont transmises à la chaîne QA.
+        """
+        for question in [
+            "Qu'est-ce que la mammographie ?",
+            "chimiothérapie effets secondaires",
+            "Est-ce que le cancer du sein est héréditaire ?",
+            "BRCA1",
+        ]:
+            route = route_query(question)
+            self.assertEqual(route.intent, "question", question)
+            self.assertIsNone(route.response)
+
+
+if __name__ == "__main__":
+    unittest.main()
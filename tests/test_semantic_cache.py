@@ -0,0 +1,67 @@
+import time
+import unittest
+from unittest.mock import patch
+from src.chatbot.lib.semantic_cache import SemanticCache
+
+
+class TestSemanticCache(unittest.TestCase):
+    def test_lookup_returns_response_for_similar_question(self):
+        """
+        Teste qu'une question proche d'une question en cache récupère la réponse en cache.
+        """
+        cache = SemanticCache(similarity_threshold=0.9)
+        response = {"result": "Réponse", "source_documents": []}
+        cache.store("Quels sont les symptômes ?", [1.0, 0.0, 0.0], response)
+
+        self.assertEqual(cache.lookup([0.99, 0.05, 0.0]), response)
+        self.assertIsNone(cache.lookup([0.0, 1.0, 0.0]))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_lru_eviction_and_ttl(self):
+        """
+        Teste l'éviction de l'entrée la moins récemment utilisée et l'expiration des entrées.
+        """
+        cache = SemanticCache(similarity_threshold=0.9, max_size=2, ttl=10)
+        with patch("src.chatbot.lib.semantic_cache.time.time", return_value=0):
+            cache.store("a", [1.0, 0.0, 0.0], {"result": "a"})
+            cache.store("b", [0.0, 1.0, 0.0], {"result": "b"})
+            cache.lookup([1.0, 0.0, 0.0])
+            cache.store("c", [0.0, 0.0, 1.0], {"result": "c"})
+
+            self.assertIsNone(cache.lookup([0.0, 1.0, 0.0]))
+            self.assertEqual(cache.lookup([1.0, 0.0, 0.0]), {"result": "a"})
+
+        with patch("src.chatbot.lib.semantic_cache.time.time", return_value=11):
+            self.assertIsNone(cache.lookup([1.0, 0.0, 0.0]))
+            self.assertEqual(len(cache), 0)
+
+    def test_index_version_change_invalidates_cache(self):
+        """
+        Teste que le changement de version de l'index vide le cache.
+        """
+        cache = SemanticCache(index_version="v1")
+        cache.store("a", [1.0, 0.0], {"result": "a"})
+        cache.set_index_version("v1")
+        self.assertEqual(len(cache), 1)
+        cache.set_index_version("v2")
+        self.assertEqual(len(cache), 0)
+
+    def test_index_version_watch_invalidates_cache(self):
+        """
+        Teste que la surveillance de la version de l'index vide le cache lorsque la table change.
+        """
+        versions = iter(["10:10", "10:10", "11:12"])
+        cache = SemanticCache(index_version="10:10")
+        cache.store("a", [1.0, 0.0], {"result": "a"})
+
+        cache.start_index_version_watch(lambda: next(versions, "11:12"), 0.01)
+
+        deadline = time.monotonic() + 5
+        while len(cache) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.index_version, "11:12")
+
+
+if __name__ == "__main__":
+    unittest.main()
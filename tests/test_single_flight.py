@@ -0,0 +1,140 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import unittest
+
+# Les modules du chatbot s'importent entre eux en `lib.*`, comme dans l'application (depuis src/chatbot)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "chatbot"))
+for name in ("PROJECT_ID", "REGION", "INSTANCE", "DATABASE", "DB_PASSWORD", "TABLE_NAME", "DB_USER"):
+    os.environ.setdefault(name, "test")
+
+from lib.single_flight import SingleFlight, normalize_question  # noqa: E402
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_normalize_question(self):
+        """
+        Teste que la casse, les accents, les espaces et la ponctuation finale sont ignorés.
+        """
+        self.assertEqual(
+            normalize_question("  Quels sont les symptômes   du cancer ? "),
+            normalize_question("quels sont les symptomes du cancer"),
+        )
+
+    def test_concurrent_identical_questions_share_one_call(self):
+        """
+        Teste que des questions identiques posées depuis plusieurs threads ne déclenchent qu'un calcul.
+        """
+        single_flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        results = []
+
+        async def compute():
+            started.set()
+            await asyncio.to_thread(release.wait)
+            return {"result": "réponse"}
+
+        def ask(question):
+            results.append(asyncio.run(single_flight.do(question, compute)))
+
+        leader = threading.Thread(target=ask, args=("Qu'est-ce que le cancer du sein ?",))
+        leader.start()
+        started.wait()
+        followers = [threading.Thread(target=ask, args=("qu'est-ce que le cancer du sein",)) for _ in range(3)]
+        for thread in followers:
+            thread.start()
+        # Attendre que les trois questions suivantes aient rejoint l'appel en cours (sans bloquer indéfiniment)
+        deadline = time.monotonic() + 5
+        while single_flight.stats()["saved_calls"] < 3 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+
+        self.assertEqual(results, [{"result": "réponse"}] * 4)
+        stats = single_flight.stats()
+        self.assertEqual(stats["calls"], 1)
+        self.assertEqual(stats["saved_calls"], 3)
+        self.assertEqual(stats["saved_calls_by_question"], {"qu'est-ce que le cancer du sein": 3})
+
+    def test_exception_is_shared_and_key_released(self):
+        """
+        Teste qu'une erreur n'est pas mise en cache : l'appel suivant recalcule la réponse.
+        """
+        single_flight = SingleFlight()
+
+        async def failing():
+            raise RuntimeError("indisponible")
+
+        async def working():
+            return "ok"
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(single_flight.do("question", failing))
+        self.assertEqual(asyncio.run(single_flight.do("question", working)), "ok")
+        self.assertEqual(single_flight.stats()["calls"], 2)
+
+    def test_cancelled_leader_does_not_cancel_followers(self):
+        """
+        Teste que l'annulation de la première requête n'annule pas le calcul attendu par une requête identique.
+        """
+        single_flight = SingleFlight()
+
+        async def scenario():
+            release = asyncio.Event()
+
+            async def compute():
+                await release.wait()
+                return "réponse"
+
+            leader = asyncio.create_task(single_flight.do("question", compute))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(single_flight.do("question", compute))
+            while single_flight.stats()["saved_calls"] < 1:
+                await asyncio.sleep(0)
+            leader.cancel()
+            await asyncio.sleep(0)
+            release.set()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await follower
+
+        self.assertEqual(asyncio.run(scenario()), "réponse")
+        self.assertEqual(single_flight.stats()["calls"], 1)
+
+    def test_cancelled_leader_alone_stops_computation(self):
+        """
+        Teste que l'annulation d'une requête sans requête identique en attente interrompt le calcul et libère la question.
+        """
+        single_flight = SingleFlight()
+        cancelled = []
+
+        async def scenario():
+            async def compute():
+                try:
+                    await asyncio.Event().wait()
+                except asyncio.CancelledError:
+                    cancelled.append(True)
+                    raise
+
+            async def working():
+                return "ok"
+
+            leader = asyncio.create_task(single_flight.do("question", compute))
+            await asyncio.sleep(0)
+            leader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            await asyncio.sleep(0)
+            return await single_flight.do("question", working)
+
+        self.assertEqual(asyncio.run(scenario()), "ok")
+        self.assertEqual(cancelled, [True])
+        self.assertEqual(single_flight.stats()["calls"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
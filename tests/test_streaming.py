@@ -0,0 +1,114 @@
+import os
+import sys
+import asyncio
+import unittest
+from typing import List
+from langchain.chains import RetrievalQA
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.retrievers import BaseRetriever
+
+# chain.py et service.py importent les modules du chatbot comme le fait l'application (depuis src/chatbot)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "chatbot"))
+for name in ("PROJECT_ID", "REGION", "INSTANCE", "DATABASE", "DB_PASSWORD", "TABLE_NAME", "DB_USER"):
+    os.environ.setdefault(name, "test")
+
+from lib.chain import astream_response  # noqa: E402
+from lib.prompt import get_prompt  # noqa: E402
+from lib.semantic_cache import SemanticCache  # noqa: E402
+from lib.service import RagService  # noqa: E402
+from lib.single_flight import SingleFlight  # noqa: E402
+
+ANSWER = "Le dépistage réduit la mortalité."
+DOCUMENTS = [Document(page_content="Le dépistage par mammographie.", metadata={"source": "a.pdf"})]
+
+
+class StaticRetriever(BaseRetriever):
+    documents: List[Document]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.documents
+
+
+class LexicalRetriever(StaticRetriever):
+    """
+    Retriever dont toutes les requêtes sont traitées par la seule recherche lexicale.
+    """
+
+    def is_lexical_fast_path(self, query: str) -> bool:
+        return True
+
+
+class FixedEmbeddings:
+    def __init__(self):
+        self.calls = 0
+
+    async def aembed_query(self, text):
+        self.calls += 1
+        return [1.0, 0.0]
+
+
+def make_qa_chain(answers):
+    return RetrievalQA.from_chain_type(
+        llm=GenericFakeChatModel(messages=iter([AIMessage(content=answer) for answer in answers])),
+        chain_type="stuff",
+        retriever=StaticRetriever(documents=DOCUMENTS),
+        chain_type_kwargs={"prompt": get_prompt()},
+        return_source_documents=True,
+    )
+
+
+class TestStreaming(unittest.TestCase):
+    def test_astream_response_yields_tokens_then_response(self):
+        """
+        Teste que les tokens sont transmis dans l'ordre, suivis d'une seule réponse complète avec ses sources.
+        """
+        async def collect():
+            return [event async for event in astream_response(make_qa_chain([ANSWER]), "Le dépistage est-il utile ?")]
+
+        events = asyncio.run(collect())
+
+        tokens = [event["token"] for event in events if "token" in event]
+        responses = [event["response"] for event in events if "response" in event]
+        self.assertEqual("".join(tokens), ANSWER)
+        self.assertGreater(len(tokens), 1)
+        self.assertEqual(len(responses), 1)
+        self.assertEqual(events[-1], {"response": responses[0]})
+        self.assertEqual(responses[0]["result"], ANSWER)
+        self.assertEqual(responses[0]["source_documents"], DOCUMENTS)
+
+    def test_stream_answer_fills_semantic_cache(self):
+        """
+        Teste que la réponse streamée est mise en cache : la même question est ensuite servie sans génération.
+        """
+        service = RagService(make_qa_chain([ANSWER]), FixedEmbeddings(), SemanticCache(), SingleFlight())
+        tokens = []
+
+        first = asyncio.run(service.astream_answer("Le dépistage est-il utile ?", tokens.append))
+        second = asyncio.run(service.astream_answer("Le dépistage est-il utile ?", tokens.append))
+
+        self.assertEqual("".join(tokens), ANSWER)
+        self.assertEqual(first["result"], ANSWER)
+        self.assertEqual(second["result"], ANSWER)
+        self.assertEqual((service.semantic_cache.hits, len(service.semantic_cache)), (1, 1))
+
+    def test_lexical_fast_path_skips_semantic_cache(self):
+        """
+        Teste qu'une question traitée par la seule recherche lexicale n'est pas embeddée pour le cache sémantique.
+        """
+        qa_chain = make_qa_chain([ANSWER])
+        qa_chain.retriever = LexicalRetriever(documents=DOCUMENTS)
+        embeddings = FixedEmbeddings()
+        service = RagService(qa_chain, embeddings, SemanticCache(), SingleFlight())
+
+        response = asyncio.run(service.answer("Le dépistage est-il utile ?"))
+
+        self.assertEqual(response["result"], ANSWER)
+        self.assertEqual(embeddings.calls, 0)
+        self.assertEqual((service.semantic_cache.misses, len(service.semantic_cache)), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+import os
+import time
+import tempfile
+import threading
+import unittest
+import numpy as np
+from src.chatbot.lib.vector_index import NumpyVectorIndex, parse_embedding
+
+
+def make_rows(embeddings, prefix="chunk"):
+    return [
+        {
+            "langchain_id": f"{prefix}-{i}",
+            "content": f"{prefix} {i}",
+            "embedding": embedding,
+            "langchain_metadata": {"source": f"{prefix}-{i}.pdf"},
+        }
+        for i, embedding in enumerate(embeddings)
+    ]
+
+
+class TestNumpyVectorIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = NumpyVectorIndex()
+        self.index.refresh(make_rows([[1.0, 0.0, 0.0], "[0.0, 2.0, 0.0]", [1.0, 1.0, 0.0]]))
+
+    def test_parse_embedding(self):
+        """
+        Teste la conversion d'un embedding pgvector (chaîne ou liste) en vecteur float32.
+        """
+        np.testing.assert_array_equal(parse_embedding("[0.5,1,2]"), np.array([0.5, 1, 2], dtype=np.float32))
+        self.assertEqual(parse_embedding([1, 2]).dtype, np.float32)
+
+    def test_search_returns_rows_sorted_by_cosine_score(self):
+        """
+        Teste que la recherche retourne le contenu et les métadonnées des k chunks les plus proches.
+        """
+        results = self.index.search([2.0, 0.1, 0.0], k=2)
+
+        self.assertEqual([row[:3] for row in results], [
+            ("chunk-0", "chunk 0", {"source": "chunk-0.pdf"}),
+            ("chunk-2", "chunk 2", {"source": "chunk-2.pdf"}),
+        ])
+        self.assertAlmostEqual(results[0][3], 2.0 / np.linalg.norm([2.0, 0.1]), places=5)
+        self.assertGreater(results[0][3], results[1][3])
+        self.assertEqual(len(self.index.search([0.0, 1.0, 0.0], k=10)), 3)
+        self.assertEqual(NumpyVectorIndex().search([1.0, 0.0, 0.0]), [])
+
+    def test_search_batch_matches_single_searches(self):
+        """
+        Teste que la recherche groupée retourne, pour chaque requête, les résultats de `search`.
+        """
+        queries = [[2.0, 0.1, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 0.0]]
+
+        results = self.index.search_batch(queries, k=2)
+
+        self.assertEqual(len(results), 3)
+        for query, matches in zip(queries, results):
+            expected = self.index.search(query, k=2)
+            self.assertEqual([row[:3] for row in matches], [row[:3] for row in expected])
+            for (*_, score), (*_, expected_score) in zip(matches, expected):
+                self.assertAlmostEqual(score, expected_score, places=5)
+        self.assertEqual(self.index.search_batch([], k=2), [])
+        self.assertEqual(NumpyVectorIndex().search_batch(queries), [[], [], []])
+
+    def test_refresh_replaces_all_rows(self):
+        """
+        Teste qu'après un rafraîchissement, les résultats proviennent uniquement des nouvelles lignes.
+        """
+        self.index.refresh(make_rows([[0.0, 0.0, 1.0]], prefix="nouveau"))
+
+        self.assertEqual(len(self.index), 1)
+        self.assertEqual([row[:2] for row in self.index.search([1.0, 0.0, 0.0], k=4)], [("nouveau-0", "nouveau 0")])
+
+    def test_search_is_consistent_during_refresh(self):
+        """
+        Teste qu'une recherche concurrente d'un rafraîchissement retourne toujours le contenu de son score.
+        """
+        axes = {"x": [1.0, 0.0, 0.0], "y": [0.0, 1.0, 0.0], "z": [0.0, 0.0, 1.0]}
+        stop = threading.Event()
+
+        def refresh(names):
+            self.index.refresh([
+                {"langchain_id": name, "content": name, "embedding": axes[name], "langchain_metadata": {}}
+                for name in names
+            ])
+
+        def refresh_forever():
+            rng = np.random.default_rng(0)
+            while not stop.is_set():
+                refresh(rng.permutation(list(axes))[: rng.integers(1, 4)])
+
+        refresh(axes)
+        thread = threading.Thread(target=refresh_forever)
+        thread.start()
+        try:
+            for _ in range(2000):
+                for identifier, content, _, score in self.index.search(axes["x"], k=3):
+                    self.assertEqual(identifier, content)
+                    self.assertAlmostEqual(score, 1.0 if content == "x" else 0.0, places=5)
+        finally:
+            stop.set()
+            thread.join()
+
+    def test_save_and_load_round_trip(self):
+        """
+        Teste qu'un index sauvegardé puis rechargé en memory-map donne les mêmes résultats.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            self.index.save(directory)
+            loaded = NumpyVectorIndex.load(directory)
+
+            self.assertEqual(len(loaded), 3)
+            self.assertIsInstance(loaded.matrix, np.memmap)
+            self.assertEqual(loaded.search([1.0, 1.0, 0.0], k=3), self.index.search([1.0, 1.0, 0.0], k=3))
+
+            # Une nouvelle sauvegarde remplace la copie sans invalider la matrice déjà mappée
+            self.index.refresh(make_rows([[0.0, 0.0, 1.0]], prefix="nouveau"))
+            self.index.save(directory)
+            self.assertEqual(loaded.search([1.0, 0.0, 0.0], k=1)[0][0], "chunk-0")
+            self.assertEqual(NumpyVectorIndex.load(directory).ids, ["nouveau-0"])
+            self.assertEqual(sorted(os.listdir(directory)), [NumpyVectorIndex.EMBEDDINGS_FILE, NumpyVectorIndex.ROWS_FILE])
+
+    def test_load_rejects_inconsistent_copy(self):
+        """
+        Teste qu'une copie dont la matrice et les lignes ne correspondent pas est refusée.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            self.index.save(directory)
+            np.save(os.path.join(directory, NumpyVectorIndex.EMBEDDINGS_FILE), np.ones((2, 3), dtype=np.float32))
+
+            with self.assertRaises(ValueError):
+                NumpyVectorIndex.load(directory)
+
+    def test_background_refresh_saves_the_new_copy(self):
+        """
+        Teste qu'une copie chargée depuis le disque est rafraîchie sans attendre, puis sauvegardée.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            self.index.save(directory)
+            loaded = NumpyVectorIndex.load(directory)
+
+            loaded.start_background_refresh(
+                lambda: make_rows([[0.0, 0.0, 1.0]], prefix="nouveau"), 0, directory=directory, refresh_now=True
+            )
+            loaded._refresh_thread.join(timeout=5)
+
+            self.assertEqual(loaded.ids, ["nouveau-0"])
+            self.assertEqual(NumpyVectorIndex.load(directory).ids, ["nouveau-0"])
+            self.assertLessEqual(loaded.last_refresh, time.time())
+
+
+if __name__ == "__main__":
+    unittest.main()
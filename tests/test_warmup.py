@@ -0,0 +1,106 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from src.chatbot.lib.warmup import warm_up, warm_up_with_retry
+
+
+class FakeRunnable:
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.calls = []
+
+    async def ainvoke(self, value):
+        self.calls.append(value)
+        if self.error:
+            raise self.error
+        return self.result
+
+    async def abatch_search(self, values):
+        self.calls.append(values)
+        return [self.result for _ in values]
+
+
+class FakeEmbeddings:
+    async def aembed_query(self, text):
+        return [0.1, 0.2]
+
+
+def make_service(llm):
+    retriever = FakeRunnable(result=["doc"])
+    qa_chain = SimpleNamespace(
+        retriever=retriever,
+        combine_documents_chain=SimpleNamespace(llm_chain=SimpleNamespace(llm=llm)),
+    )
+    return SimpleNamespace(qa_chain=qa_chain, query_embeddings=FakeEmbeddings()), retriever
+
+
+class TestWarmUp(unittest.TestCase):
+    def test_ready_after_all_stages(self):
+        """
+        Teste que le service est prêt une fois l'embedding, la recherche et la génération exécutés.
+        """
+        llm = FakeRunnable(result="OK")
+        service, retriever = make_service(llm)
+
+        readiness = asyncio.run(warm_up(service, "Qu'est-ce que le cancer du sein ?"))
+
+        self.assertTrue(readiness.ready)
+        self.assertEqual(list(readiness.timings), ["embedding", "retrieval", "generation"])
+        self.assertEqual(retriever.calls, ["Qu'est-ce que le cancer du sein ?"])
+        self.assertEqual(readiness.as_dict()["status"], "ready")
+
+    def test_failed_stage_is_reported(self):
+        """
+        Teste qu'un échec de génération laisse le service non prêt, avec l'étape en erreur.
+        """
+        service, _ = make_service(FakeRunnable(error=RuntimeError("quota dépassé")))
+
+        readiness = asyncio.run(warm_up(service, "question"))
+
+        self.assertFalse(readiness.ready)
+        self.assertEqual(readiness.as_dict()["status"], "failed")
+        self.assertIn("generation", readiness.error)
+
+    def test_batch_questions_are_searched_together(self):
+        """
+        Teste que les questions fréquentes sont recherchées en un seul appel groupé pendant le préchauffage.
+        """
+        service, retriever = make_service(FakeRunnable(result="OK"))
+
+        readiness = asyncio.run(warm_up(service, "question", batch_questions=["a", "b"]))
+
+        self.assertTrue(readiness.ready)
+        self.assertEqual(list(readiness.timings), ["embedding", "retrieval", "batch_retrieval", "generation"])
+        self.assertEqual(retriever.calls, ["question", ["a", "b"]])
+
+
+    def test_failed_warm_up_is_retried(self):
+        """
+        Teste qu'un préchauffage en échec est relancé jusqu'à réussir, dans la limite des tentatives.
+        """
+        llm = FakeRunnable(error=RuntimeError("indisponible"))
+        service, _ = make_service(llm)
+
+        readiness = asyncio.run(warm_up_with_retry(service, "question", attempts=2, delay=0))
+        self.assertFalse(readiness.ready)
+        self.assertEqual(readiness.attempts, 2)
+        self.assertEqual(len(llm.calls), 2)
+
+        async def recover():
+            await asyncio.sleep(0.01)
+            llm.error = None
+
+        async def scenario():
+            recovery = asyncio.ensure_future(recover())
+            readiness = await warm_up_with_retry(service, "question", attempts=0, delay=0.005, max_delay=0.005)
+            await recovery
+            return readiness
+
+        readiness = asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+        self.assertTrue(readiness.ready)
+        self.assertIsNone(readiness.error)
+        self.assertGreater(readiness.attempts, 1)
+
+if __name__ == "__main__":
+    unittest.main()